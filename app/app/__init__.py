@@ -2,9 +2,11 @@
 Application factory for Nexora.
 
 This module sets up the Flask application, database, migrations,
-login manager, CSRF protection, and background scheduler.  Blueprints
-for authentication, public lead capture, client portal, and admin
-console are registered here.
+login manager, CSRF protection, background scheduler, and email outbox
+workers.  Blueprints for authentication, public lead capture, client
+portal, and admin console are registered here.  Background threads are
+only started here when ``RUN_BACKGROUND_IN_WEB`` is set; otherwise they
+run in the worker process (see :mod:`app.worker`).
 """
 
 import logging
@@ -20,7 +22,12 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from apscheduler.schedulers.background import BackgroundScheduler
-from .utils.seed_automations import seed_automation_templates
+from .automations import supervisor
+from .utils.bootstrap import ensure_bootstrapped
+from .utils.leader import SchedulerLeader
+from .utils.lead_import import ImportRunner
+from .utils.outbox import OutboxWorkerPool
+from .utils import counters, dedupe, follow_up, log_sink, sqlite_pragmas, user_cache, versioned_cache
 
 # Initialize other extensions without application context.  Note that
 # ``db`` is imported from ``app.extensions`` above and thus defined
@@ -31,6 +38,9 @@ migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 scheduler = BackgroundScheduler(daemon=True)
+scheduler_leader = SchedulerLeader()
+outbox_workers = OutboxWorkerPool()
+import_runner = ImportRunner()
 
 
 def create_app(config_object: str | None = None) -> Flask:
@@ -56,10 +66,19 @@ def create_app(config_object: str | None = None) -> Flask:
 
     # Initialize extensions
     db.init_app(app)
+    sqlite_pragmas.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
-    scheduler.configure(timezone="UTC")
+    outbox_workers.init_app(app)
+    import_runner.init_app(app)
+    log_sink.init_app(app)
+    counters.init_app(app)
+    follow_up.init_app(app)
+    dedupe.init_app(app)
+    versioned_cache.init_app(app)
+    user_cache.init_app(app)
+    supervisor.init_app(app)
 
     # Set up logging
     logging.basicConfig(level=logging.INFO)
@@ -68,44 +87,24 @@ def create_app(config_object: str | None = None) -> Flask:
     login_manager.login_view = "auth.login"
     login_manager.login_message = "Please log in to access this page."
 
-    from .models import User, create_default_portfolio
-
-    # User loader for Flask-Login
+    # User loader for Flask-Login (cached per process; see utils/user_cache.py)
     @login_manager.user_loader
-    def load_user(user_id: str) -> User | None:
-        return User.query.get(int(user_id))
+    def load_user(user_id: str) -> user_cache.SessionUser | None:
+        return user_cache.load_user(user_id)
 
     # Application context initialisation
     with app.app_context():
-        # Create database tables if they do not exist
-        db.create_all()
-        # Ensure the default portfolio exists
-        create_default_portfolio()
-        # Seed default automation templates.  Pass the database instance
-        # explicitly to avoid circular import issues.  See
-        # app/app/utils/seed_automations.py for details.
-        seed_automation_templates(db)
-
-        # Ensure at least one administrator exists.  If no admin users are
-        # present, create a default admin account using environment
-        # variables.  This allows the portal to be accessed immediately
-        # after deployment without requiring manual database seeding.
-        from .models import User  # imported here to avoid circular imports
-        if User.query.filter_by(role="admin").count() == 0:
-            import os as _os
-            admin_email = _os.getenv("DEFAULT_ADMIN_EMAIL", "admin@example.com").lower()
-            admin_password = _os.getenv("DEFAULT_ADMIN_PASSWORD", "changeme")
-            admin = User(email=admin_email, role="admin")
-            admin.set_password(admin_password)
-            db.session.add(admin)
-            db.session.commit()
-
+        # Tables and seed data are created once per schema/seed version by
+        # ``flask nexora bootstrap``; here we only compare the stored
+        # fingerprint (and bootstrap a stale database unless disabled).
+        ensure_bootstrapped(app)
 
         # Register blueprints
         from .auth import auth_bp
         from .public import public_bp
         from .client.routes import client_bp
         from .admin.routes import admin_bp
+        from .api import api_bp
         from .routes.automations import bp as automations_bp
 
 
@@ -118,20 +117,39 @@ def create_app(config_object: str | None = None) -> Flask:
         app.register_blueprint(public_bp)
         app.register_blueprint(client_bp)
         app.register_blueprint(admin_bp)
+        # The API authenticates requests by signature, not by session.
+        csrf.exempt(api_bp)
+        app.register_blueprint(api_bp)
+
+        # Cursor links for keyset-paginated list views
+        from .utils.pagination import page_url
+
+        app.jinja_env.globals["page_url"] = page_url
+
+        # Register ``flask nexora`` maintenance commands
+        from .cli import nexora_cli
+
+        app.cli.add_command(nexora_cli)
   
      
 
 
-        # Schedule background jobs
-        from .utils.scheduler import schedule_jobs
-
-        schedule_jobs(scheduler)
+        from .utils.scheduler import init_app as init_scheduler
 
-        # Start scheduler
-        if not scheduler.running:
-            scheduler.start()
+        init_scheduler(app)
+        scheduler_leader.init_app(app, scheduler)
 
-        # Attach scheduler to app for later access (e.g. rescheduling)
+        # Attach background extensions to the app for the worker and status views
         app.scheduler = scheduler
+        app.scheduler_leader = scheduler_leader
+        app.outbox_workers = outbox_workers
+        app.import_runner = import_runner
+
+    # Web processes normally leave the scheduler and outbox workers to the
+    # dedicated worker process (``flask nexora worker``).
+    if app.config.get("RUN_BACKGROUND_IN_WEB"):
+        from .worker import start_background
+
+        start_background(app)
 
     return app
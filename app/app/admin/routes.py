@@ -2,7 +2,7 @@
 Admin console blueprint.
 
 Provides routes for Nexora administrators to manage clients, users,
-automation instances, and view logs or errors.  Access is
+automation instances and lead imports, and view logs or errors.  Access is
 restricted to authenticated admin users.
 """
 
@@ -15,12 +15,14 @@ from flask import (
     url_for,
     flash,
     request,
-    current_app,
+    jsonify,
+    abort,
 )
 from flask_login import login_required, current_user
 from wtforms import StringField, PasswordField, SubmitField, BooleanField
 from wtforms.validators import DataRequired, Email, Optional
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 
 from ..models import (
     Client,
@@ -29,12 +31,18 @@ from ..models import (
     AutomationTemplate,
     AutomationInstance,
     Lead,
+    LeadImport,
     Job,
-    LogEntry,
 )
 from .. import db
 from ..utils.automations import run_follow_up_sequence, run_daily_digest
-from ..utils.scheduler import schedule_jobs
+from ..utils.export import EXPORTS, export_response
+from ..utils.log_archive import log_count, recent_logs
+from ..utils.lead_import import create_import, import_status, queue_import
+from ..utils.pagination import keyset_page
+from ..utils.search import SEARCH_INDEXES, search as run_search
+from ..utils.stats import client_stats, client_stats_for
+from ..utils.worker_status import background_status
 
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
@@ -66,26 +74,36 @@ class UserForm(FlaskForm):
     submit = SubmitField("Add User")
 
 
+class LeadImportForm(FlaskForm):
+    file = FileField(
+        "CSV or JSONL file",
+        validators=[FileRequired(), FileAllowed(["csv", "jsonl", "ndjson"], "Upload a .csv or .jsonl file.")],
+    )
+    source = StringField("Source", validators=[Optional()], default="import")
+    run_automations = BooleanField("Run automations (follow-ups and one lead-capture notification)")
+    submit = SubmitField("Import Leads")
+
+
+def _wants_json() -> bool:
+    return request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
+
+
 @admin_bp.route("/")
 @login_required
 @admin_required
 def dashboard():
-    # Overview: list clients with basic stats
-    clients = Client.query.all()
-    client_stats = []
-    for client in clients:
-        leads_count = Lead.query.filter_by(client_id=client.id).count()
-        jobs_count = Job.query.filter_by(client_id=client.id).count()
-        user_count = len(client.users)
-        client_stats.append({
-            "client": client,
-            "leads": leads_count,
-            "jobs": jobs_count,
-            "users": user_count,
-        })
-    # Count errors
-    error_logs = LogEntry.query.filter_by(entry_type="error").count()
-    return render_template("admin/dashboard.html", client_stats=client_stats, error_logs=error_logs)
+    # Overview: list clients with basic stats, computed with grouped aggregates
+    stats = client_stats(
+        page=request.args.get("page", 1, type=int),
+        per_page=request.args.get("per_page", 50, type=int),
+        sort=request.args.get("sort", "name"),
+        direction=request.args.get("dir", "asc"),
+    )
+    # Count errors, live and archived
+    error_logs = log_count(entry_type="error")
+    return render_template(
+        "admin/dashboard.html", client_stats=stats["items"], stats=stats, error_logs=error_logs
+    )
 
 
 @admin_bp.route("/clients", methods=["GET", "POST"])
@@ -113,13 +131,13 @@ def clients():
         client = Client(name=form.name.data, slug=slug, portfolio=portfolio)
         db.session.add(client)
         db.session.commit()
-        # Create automation instances for each template in the portfolio
+        # Create automation instances for each template in the portfolio.
+        # Periodic automations are picked up by the fan-in batch jobs, so
+        # no scheduler changes are needed.
         for template in portfolio.templates:
             ai = AutomationInstance(client=client, template=template, enabled=True)
             db.session.add(ai)
         db.session.commit()
-        # Reschedule jobs after creating new instances
-        schedule_jobs(current_app.scheduler)  # type: ignore
         flash("Client created successfully.", "success")
         return redirect(url_for("admin.clients"))
     clients = Client.query.all()
@@ -150,17 +168,30 @@ def client_detail(client_id: int):
 
     # Fetch automation instances for the client
     automations = AutomationInstance.query.filter_by(client_id=client.id).all()
-    leads = Lead.query.filter_by(client_id=client.id).order_by(Lead.created_at.desc()).all()
-    jobs = Job.query.filter_by(client_id=client.id).order_by(Job.created_at.desc()).all()
-    logs = LogEntry.query.filter_by(client_id=client.id).order_by(LogEntry.created_at.desc()).limit(50).all()
+    leads_query = Lead.query.filter_by(client_id=client.id)
+    if request.args.get("lead_status"):
+        leads_query = leads_query.filter(Lead.status == request.args["lead_status"])
+    if request.args.get("lead_source"):
+        leads_query = leads_query.filter(Lead.source == request.args["lead_source"])
+    jobs_query = Job.query.filter_by(client_id=client.id)
+    if request.args.get("job_status"):
+        jobs_query = jobs_query.filter(Job.status == request.args["job_status"])
+    leads_page = keyset_page(leads_query, Lead, request.args.get("leads_cursor"))
+    jobs_page = keyset_page(jobs_query, Job, request.args.get("jobs_cursor"))
+    logs = recent_logs(client.id, 50)
     return render_template(
         "admin/client_detail.html",
         client=client,
+        stats=client_stats_for(client.id),
         automations=automations,
-        leads=leads,
-        jobs=jobs,
+        leads=leads_page["items"],
+        leads_page=leads_page,
+        jobs=jobs_page["items"],
+        jobs_page=jobs_page,
         logs=logs,
         user_form=user_form,
+        import_form=LeadImportForm(),
+        imports=LeadImport.query.filter_by(client_id=client.id).order_by(LeadImport.created_at.desc()).limit(10).all(),
     )
 
 
@@ -171,7 +202,124 @@ def toggle_automation(client_id: int, instance_id: int):
     ai = AutomationInstance.query.filter_by(id=instance_id, client_id=client_id).first_or_404()
     ai.enabled = not ai.enabled
     db.session.commit()
-    # Reschedule jobs when automations are toggled
-    schedule_jobs(current_app.scheduler)  # type: ignore
     flash(f"Automation '{ai.template.name}' toggled {'on' if ai.enabled else 'off'}.", "info")
     return redirect(url_for("admin.client_detail", client_id=client_id))
+
+
+@admin_bp.route("/clients/<int:client_id>/export/<kind>")
+@login_required
+@admin_required
+def export_client_data(client_id: int, kind: str):
+    if kind not in EXPORTS:
+        abort(404)
+    return export_response(kind, Client.query.get_or_404(client_id))
+
+
+@admin_bp.route("/clients/<int:client_id>/imports", methods=["POST"])
+@login_required
+@admin_required
+def import_leads(client_id: int):
+    """Upload a bulk lead import and queue it for the background worker.
+
+    Answers ``202 Accepted`` with the import's status URL when the client
+    asks for JSON.
+    """
+    client = Client.query.get_or_404(client_id)
+    form = LeadImportForm()
+    if not form.validate_on_submit():
+        errors = [error for field_errors in form.errors.values() for error in field_errors]
+        if _wants_json():
+            return jsonify({"errors": errors}), 400
+        flash(" ".join(errors) or "Invalid import.", "danger")
+        return redirect(url_for("admin.client_detail", client_id=client.id))
+    try:
+        lead_import = create_import(
+            client.id,
+            form.file.data.stream,
+            form.file.data.filename,
+            source=form.source.data or "import",
+            run_automations=form.run_automations.data,
+        )
+    except ValueError as e:
+        if _wants_json():
+            return jsonify({"errors": [str(e)]}), 400
+        flash(str(e), "danger")
+        return redirect(url_for("admin.client_detail", client_id=client.id))
+    return _queued_response(lead_import)
+
+
+@admin_bp.route("/imports/<int:import_id>")
+@login_required
+@admin_required
+def import_detail(import_id: int):
+    """Progress and row errors of a lead import as JSON."""
+    return jsonify(import_status(LeadImport.query.get_or_404(import_id)))
+
+
+@admin_bp.route("/imports/<int:import_id>/resume", methods=["POST"])
+@login_required
+@admin_required
+def resume_import(import_id: int):
+    """Queue a failed import again; it continues from its last committed row."""
+    lead_import = LeadImport.query.get_or_404(import_id)
+    if not queue_import(lead_import.id):
+        message = f"Import {lead_import.id} is {lead_import.status}; nothing to resume."
+        if _wants_json():
+            return jsonify({"errors": [message], "status": lead_import.status}), 409
+        flash(message, "warning")
+        return redirect(url_for("admin.client_detail", client_id=lead_import.client_id))
+    return _queued_response(lead_import)
+
+
+def _queued_response(lead_import: LeadImport):
+    status_url = url_for("admin.import_detail", import_id=lead_import.id)
+    if _wants_json():
+        return jsonify({**import_status(lead_import), "status_url": status_url}), 202, {"Location": status_url}
+    flash(f"Import of {lead_import.filename} queued; its progress is shown below.", "info")
+    return redirect(url_for("admin.client_detail", client_id=lead_import.client_id))
+
+
+@admin_bp.route("/search")
+@login_required
+@admin_required
+def search():
+    q = request.args.get("q", "")
+    scope = request.args.get("scope", "logs")
+    if scope not in SEARCH_INDEXES:
+        scope = "logs"
+    client_id = request.args.get("client_id", type=int)
+    results = run_search(
+        scope,
+        q,
+        client_id=client_id,
+        page=request.args.get("page", 1, type=int),
+        per_page=request.args.get("per_page", 20, type=int),
+        sort=request.args.get("sort"),
+    )
+    if _wants_json():
+        fields = ("name", "email", "phone", "source", "status") if scope == "leads" else ("entry_type", "message")
+        return jsonify(
+            {
+                "items": [
+                    {
+                        "id": item.id,
+                        "client_id": item.client_id,
+                        "client": item.client.name,
+                        **{field: getattr(item, field) for field in fields},
+                        "created_at": item.created_at.isoformat() if item.created_at else None,
+                    }
+                    for item in results["items"]
+                ],
+                **{key: results[key] for key in ("page", "per_page", "has_next", "sort", "engine")},
+            }
+        )
+    client = db.session.get(Client, client_id) if client_id else None
+    return render_template("admin/search.html", q=q, scope=scope, results=results, client=client)
+
+
+@admin_bp.route("/status")
+@login_required
+@admin_required
+def worker_status():
+    """Background work status (outbox depth, in-flight work, scheduler) as JSON."""
+    return jsonify(background_status())
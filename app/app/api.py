@@ -0,0 +1,135 @@
+"""
+Machine-to-machine API blueprint (``/api/v1``).
+
+Ad platforms and website widgets post leads here instead of through the
+HTML form.  Requests are authenticated by an HMAC signature and may
+carry an ``Idempotency-Key`` (see ``utils.webhooks``), so the blueprint is
+exempt from CSRF protection.
+
+``POST /api/v1/clients/<slug>/leads`` accepts a single lead object, a list
+of leads or ``{"leads": [...]}`` (at most ``WEBHOOK_MAX_BATCH``), with the
+same fields as the bulk import.  Either every lead is valid and all of
+them are stored, or nothing is.  A lead whose email already belongs to
+one of the client's leads is merged into it (see ``utils.dedupe``) and
+does not trigger lead capture again.  The leads, their counters and
+follow-up enrollment, the queued lead-capture emails and the idempotency
+record are written in one transaction.  The endpoint answers ``202
+Accepted`` with the lead id of each submitted lead (the existing lead's
+id for merged ones); the emails are delivered by the outbox workers.
+"""
+
+import json
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .utils.automation_cache import enabled_automation
+from .utils.automations import run_lead_capture_many
+from .utils.lead_import import insert_leads, normalize_row
+from .utils.log_sink import get_log_sink
+from .utils.public_cache import client_snapshot
+from .utils.webhooks import (
+    IDEMPOTENCY_HEADER,
+    body_hash,
+    find_idempotent_response,
+    store_idempotent_response,
+    verify_signature,
+)
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def _error(status: int, message: str, **extra):
+    return jsonify({"error": message, **extra}), status
+
+
+def _replay(stored, request_hash: str):
+    if stored.request_hash != request_hash:
+        return _error(422, f"{IDEMPOTENCY_HEADER} was already used with a different request body")
+    return jsonify(stored.response), stored.status_code, {"Idempotent-Replayed": "true"}
+
+
+@api_bp.route("/clients/<client_slug>/leads", methods=["POST"])
+def ingest_leads(client_slug: str):
+    client = client_snapshot(client_slug)
+    if client is None:
+        return _error(404, "unknown client")
+    max_body = current_app.config.get("WEBHOOK_MAX_BODY", 1024 * 1024)
+    if (request.content_length or 0) > max_body:
+        return _error(413, f"request body larger than {max_body} bytes")
+    body = request.get_data(cache=False)
+    if len(body) > max_body:
+        return _error(413, f"request body larger than {max_body} bytes")
+    reason = verify_signature(client.id, request.headers, body)
+    if reason:
+        return _error(401, reason)
+
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is not None and not 0 < len(key) <= 255:
+        return _error(400, f"{IDEMPOTENCY_HEADER} must be 1-255 characters")
+    request_hash = body_hash(body)
+    if key:
+        stored = find_idempotent_response(client.id, key)
+        if stored is not None:
+            return _replay(stored, request_hash)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return _error(400, "request body is not valid JSON")
+    records = payload["leads"] if isinstance(payload, dict) and "leads" in payload else payload
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list) or not records:
+        return _error(400, 'expected a lead object, a list of leads or {"leads": [...]}')
+    max_batch = current_app.config.get("WEBHOOK_MAX_BATCH", 500)
+    if len(records) > max_batch:
+        return _error(413, f"at most {max_batch} leads per request")
+
+    now = datetime.utcnow()
+    source = request.args.get("src") or "api"
+    leads, errors = [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({"index": index, "error": "expected a JSON object"})
+            continue
+        try:
+            leads.append(normalize_row({str(k).strip().lower(): v for k, v in record.items()}, source, now))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    if errors:
+        return _error(400, "invalid leads; nothing was stored", errors=errors)
+
+    try:
+        ids, created = insert_leads(client.id, leads)
+    except IntegrityError:
+        # A concurrent request stored a lead for one of these contacts
+        # first; the retry finds it and merges into it.
+        db.session.rollback()
+        ids, created = insert_leads(client.id, leads)
+    ai = enabled_automation(client.id, "lead_capture")
+    new_leads = [lead for lead, is_new in zip(leads, created) if is_new]
+    if ai and new_leads:
+        run_lead_capture_many(ai, new_leads)
+    response = {
+        "accepted": len(ids),
+        "created": len(new_leads),
+        "merged": len(ids) - len(new_leads),
+        "lead_ids": ids,
+    }
+    if key:
+        store_idempotent_response(client.id, key, request_hash, 202, response)
+    try:
+        # Logs land in the same transaction as the leads and the key.
+        get_log_sink().write()
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request with the same key committed first.
+        db.session.rollback()
+        stored = find_idempotent_response(client.id, key) if key else None
+        if stored is None:
+            raise
+        return _replay(stored, request_hash)
+    return jsonify(response), 202
@@ -13,6 +13,7 @@ from flask_wtf import FlaskForm
 
 from .models import User
 from . import db
+from .utils.user_cache import stamp_session
 
 
 auth_bp = Blueprint("auth", __name__, url_prefix="")
@@ -39,6 +40,7 @@ def login():
         user = User.query.filter_by(email=form.email.data.lower()).first()
         if user and user.check_password(form.password.data) and user.active:
             login_user(user)
+            stamp_session(user)
             flash("Logged in successfully.", "success")
             next_url = request.args.get("next")
             return redirect(next_url or (url_for("admin.dashboard") if user.is_admin() else url_for("client.dashboard")))
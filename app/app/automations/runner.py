@@ -1,18 +1,41 @@
 """
 Nexora Automation Runner
 
-- Dynamically imports each automation module
+- Resolves each automation slug once (lazily, on first use) and caches
+  its ``run`` callable together with a specialised argument adapter
 - Passes client + payload + credentials
 - Returns a normalized result dict
 
 Each automation package must expose:
   automation.py with a function: run(**kwargs) -> dict
+
+Plugins can add automations through the ``nexora.automations`` entry
+point group; the entry point name is the slug and its value is either a
+module exposing ``run`` or the callable itself::
+
+    [project.entry-points."nexora.automations"]
+    hvac-quote = "nexora_hvac.automation"
+
+Unused automations are never imported: entry points are only listed, and
+a module is imported the first time its slug is run.
+
+:func:`run_automation_many` runs one automation over many (client,
+payload) pairs on a thread or process pool, or on the supervised pool
+(see :mod:`.supervisor`), and streams the results back.
 """
 
 from __future__ import annotations
 
 import importlib
-from typing import Any, Dict, Optional
+import inspect
+import logging
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from importlib.metadata import entry_points
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
 
 AUTOMATION_SLUG_TO_MODULE = {
     "lead-capture": "app.app.automations.lead_capture.automation",
@@ -22,59 +45,156 @@ AUTOMATION_SLUG_TO_MODULE = {
     "smart-booking": "app.app.automations.smart_booking.automation",
 }
 
+ENTRY_POINT_GROUP = "nexora.automations"
+
+# Standardized inputs: each automation only receives the ones its ``run``
+# declares.  Builders take (client, payload, credentials).
+ARGUMENT_BUILDERS: Dict[str, Callable[[Any, Dict[str, Any], Dict[str, Any]], Any]] = {
+    # base context
+    "client_name": lambda client, payload, credentials: getattr(client, "name", None),
+    "client_slug": lambda client, payload, credentials: getattr(client, "slug", None),
+    # raw passthroughs (some automations use these)
+    "payload": lambda client, payload, credentials: payload,
+    "credentials": lambda client, payload, credentials: credentials,
+    # --- common lead fields (mapped from payload) ---
+    "lead_name": lambda client, payload, credentials: payload.get("lead_name")
+    or payload.get("name")
+    or payload.get("full_name"),
+    "lead_email": lambda client, payload, credentials: payload.get("lead_email") or payload.get("email"),
+    "lead_phone": lambda client, payload, credentials: payload.get("lead_phone") or payload.get("phone"),
+    "source": lambda client, payload, credentials: payload.get("source") or payload.get("lead_source"),
+    # --- common job fields ---
+    "job_title": lambda client, payload, credentials: payload.get("job_title")
+    or payload.get("job")
+    or payload.get("service")
+    or payload.get("title"),
+    "job_id": lambda client, payload, credentials: payload.get("job_id"),
+}
+
+# A lightweight, picklable stand-in for a Client (what the adapters read).
+ClientRef = namedtuple("ClientRef", ["name", "slug"])
+
+# "supervised" fans out on threads, each waiting on the default supervised pool.
+EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor, "supervised": ThreadPoolExecutor}
+
+Adapter = Callable[[Any, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+
+class AutomationError(Exception):
+    """An automation slug could not be resolved to a runnable callable."""
+
+    def __init__(self, message: str, module: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.module = module
+
+
+def build_adapter(func: Callable[..., Any]) -> Adapter:
+    """Return a function mapping (client, payload, credentials) to ``func``'s kwargs.
+
+    The accepted parameter set is computed once, so each call only builds
+    the arguments the automation declares.
+    """
+    allowed = set(inspect.signature(func).parameters)
+    builders: Tuple[Tuple[str, Callable], ...] = tuple(
+        (name, build) for name, build in ARGUMENT_BUILDERS.items() if name in allowed
+    )
+
+    def adapter(client: Any, payload: Dict[str, Any], credentials: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: build(client, payload, credentials) for name, build in builders}
+
+    return adapter
+
+
+class AutomationRegistry:
+    """Slug -> (callable, adapter) registry with lazy, cached resolution."""
+
+    def __init__(self, modules: Optional[Dict[str, str]] = None) -> None:
+        self._targets: Dict[str, Any] = dict(modules or {})
+        self._resolved: Dict[str, Tuple[Callable[..., Any], Adapter]] = {}
+        self._entry_points_loaded = False
+        self._lock = threading.Lock()
+
+    def register(self, slug: str, target: Union[str, Callable[..., Any]]) -> None:
+        """Register a module path (``"pkg.mod"``) or a callable under ``slug``."""
+        with self._lock:
+            self._targets[slug] = target
+            self._resolved.pop(slug, None)
+
+    def _load_entry_points(self) -> None:
+        # Only the metadata is read here; plugins are imported on first run.
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            if ep.name in self._targets:
+                logger.warning("Ignoring entry point %s: slug %r is already registered", ep.value, ep.name)
+                continue
+            self._targets[ep.name] = ep
+        self._entry_points_loaded = True
+
+    def target(self, slug: str) -> Any:
+        """Return what ``slug`` is registered as (module path, entry point or callable)."""
+        with self._lock:
+            if slug not in self._targets and not self._entry_points_loaded:
+                self._load_entry_points()
+            return self._targets.get(slug)
+
+    def slugs(self):
+        with self._lock:
+            if not self._entry_points_loaded:
+                self._load_entry_points()
+            return sorted(self._targets)
+
+    def resolve(self, slug: str) -> Tuple[Callable[..., Any], Adapter]:
+        """Return the cached ``(run, adapter)`` for ``slug``, importing it on first use."""
+        cached = self._resolved.get(slug)
+        if cached is not None:
+            return cached
+        with self._lock:
+            if slug not in self._targets and not self._entry_points_loaded:
+                self._load_entry_points()
+            if slug not in self._targets:
+                raise KeyError(slug)
+            target = self._targets[slug]
+            module_path = target if isinstance(target, str) else getattr(target, "value", None)
+            try:
+                if isinstance(target, str):
+                    loaded = importlib.import_module(target, package=__package__)
+                elif hasattr(target, "load"):  # importlib.metadata.EntryPoint
+                    loaded = target.load()
+                else:
+                    loaded = target
+            except Exception as e:
+                raise AutomationError(f"Import failed: {e}", module_path) from e
+            func = loaded if inspect.isroutine(loaded) else getattr(loaded, "run", None)
+            if func is None:
+                raise AutomationError("Module missing run() function", module_path)
+            try:
+                adapter = build_adapter(func)
+            except (TypeError, ValueError) as e:
+                raise AutomationError(f"Cannot inspect run(): {e}", module_path) from e
+            resolved = self._resolved[slug] = (func, adapter)
+            return resolved
+
+
+registry = AutomationRegistry(AUTOMATION_SLUG_TO_MODULE)
+
+
+def register_automation(slug: str, target: Union[str, Callable[..., Any]]) -> None:
+    """Register an automation on the default registry."""
+    registry.register(slug, target)
+
 
 def run_automation(slug: str, *, client: Any, payload: Optional[Dict[str, Any]] = None, credentials: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     payload = payload or {}
     credentials = credentials or {}
 
-    if slug not in AUTOMATION_SLUG_TO_MODULE:
-        return {"ok": False, "slug": slug, "error": f"Unknown automation slug: {slug}"}
-
-    module_path = AUTOMATION_SLUG_TO_MODULE[slug]
     try:
-        mod = importlib.import_module(module_path, package=__package__)
-    except Exception as e:
-        return {"ok": False, "slug": slug, "error": f"Import failed: {e}", "module": module_path}
-
-    if not hasattr(mod, "run"):
-        return {"ok": False, "slug": slug, "error": "Module missing run() function", "module": module_path}
+        func, adapter = registry.resolve(slug)
+    except KeyError:
+        return {"ok": False, "slug": slug, "error": f"Unknown automation slug: {slug}"}
+    except AutomationError as e:
+        return {"ok": False, "slug": slug, "error": str(e), "module": e.module}
 
     try:
-        import inspect
-
-        # Standardized inputs (only pass what the automation supports)
-        candidate_kwargs = {
-            # base context
-            "client_name": getattr(client, "name", None),
-            "client_slug": getattr(client, "slug", None),
-
-            # raw passthroughs (some automations use these)
-            "payload": payload,
-            "credentials": credentials,
-
-            # --- common lead fields (mapped from payload) ---
-            "lead_name": payload.get("lead_name") or payload.get("name") or payload.get("full_name"),
-            "lead_email": payload.get("lead_email") or payload.get("email"),
-            "lead_phone": payload.get("lead_phone") or payload.get("phone"),
-            "source": payload.get("source") or payload.get("lead_source"),
-
-            # --- common job fields ---
-            "job_title": payload.get("job_title") or payload.get("job") or payload.get("service") or payload.get("title"),
-            "job_id": payload.get("job_id"),
-        }
-
-        # If this is a test run and required fields are missing,
-        # provide safe placeholder values so tests always execute.
-        if payload.get("test") is True:
-            candidate_kwargs.setdefault("lead_name", candidate_kwargs["lead_name"] or "Test Lead")
-            candidate_kwargs.setdefault("lead_email", candidate_kwargs["lead_email"] or "test@example.com")
-            candidate_kwargs.setdefault("job_title", candidate_kwargs["job_title"] or "Test Job")
-
-        sig = inspect.signature(mod.run)
-        allowed = set(sig.parameters.keys())
-        safe_kwargs = {k: v for k, v in candidate_kwargs.items() if k in allowed}
-
-        result = mod.run(**safe_kwargs)
+        result = func(**adapter(client, payload, credentials))
 
         if isinstance(result, dict):
             result.setdefault("ok", True)
@@ -82,4 +202,93 @@ def run_automation(slug: str, *, client: Any, payload: Optional[Dict[str, Any]]
             return result
         return {"ok": True, "slug": slug, "result": result}
     except Exception as e:
-        return {"ok": False, "slug": slug, "error": str(e)}
+        return {"ok": False, "slug": slug, "error": str(e) or type(e).__name__}
+
+
+def _run_item(slug: str, client: Any, payload: Optional[Dict[str, Any]], credentials: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Module-level so process pools can pickle it; each worker process
+    # resolves the slug through its own registry.
+    return run_automation(slug, client=client, payload=payload, credentials=credentials)
+
+
+def _run_item_supervised(
+    slug: str, client: Any, payload: Optional[Dict[str, Any]], credentials: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    from .supervisor import run_automation_isolated
+
+    return run_automation_isolated(slug, client=client, payload=payload, credentials=credentials)
+
+
+def run_automation_many(
+    slug: str,
+    items: Iterable[Tuple[Any, Optional[Dict[str, Any]]]],
+    *,
+    credentials: Optional[Dict[str, Any]] = None,
+    executor: str = "thread",
+    max_workers: int = 4,
+    ordered: bool = True,
+    max_pending: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Run ``slug`` for each ``(client, payload)`` pair and yield normalized results.
+
+    Args:
+        slug: Automation to run.
+        items: Iterable of ``(client, payload)`` pairs; consumed lazily.
+        credentials: Passed to every run.
+        executor: ``"thread"``, ``"process"`` or ``"supervised"``.  Process
+            pools need picklable clients (see :class:`ClientRef`) and
+            resolve slugs in each worker, so callables registered at
+            runtime are only visible there when the platform forks.
+            ``"supervised"`` runs each item in the default supervised pool
+            (per-slug timeouts, memory limit, worker recycling); at most
+            ``max_workers`` items wait on it at once.
+        max_workers: Pool size.
+        ordered: Yield results in input order; otherwise as they finish.
+        max_pending: At most this many items are in flight
+            (default ``2 * max_workers``); ``items`` is not read further
+            until a result has been yielded.
+
+    Each result is the :func:`run_automation` dict plus ``index``, the
+    position of its item.  Failures (including ones raised by the pool,
+    such as pickling errors or a crashed worker process) are reported as
+    ``{"ok": False, "error": ...}`` for that item only.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor {executor!r}; expected one of {sorted(EXECUTORS)}")
+    max_pending = max(max_pending or 2 * max_workers, 1)
+
+    def _collect(index: int, future) -> Dict[str, Any]:
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"ok": False, "slug": slug, "error": f"{type(e).__name__}: {e}"}
+        result["index"] = index
+        return result
+
+    run_item = _run_item_supervised if executor == "supervised" else _run_item
+    pool = EXECUTORS[executor](max_workers=max_workers)
+    in_order: deque = deque()  # (index, future), used when ordered
+    in_flight: Dict[Any, int] = {}  # future -> index, used when unordered
+
+    def _drain(limit: int) -> Iterator[Dict[str, Any]]:
+        if ordered:
+            while len(in_order) > limit:
+                yield _collect(*in_order.popleft())
+        else:
+            while len(in_flight) > limit:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _collect(in_flight.pop(future), future)
+
+    try:
+        for index, (client, payload) in enumerate(items):
+            future = pool.submit(run_item, slug, client, payload, credentials)
+            if ordered:
+                in_order.append((index, future))
+            else:
+                in_flight[future] = index
+            yield from _drain(max_pending - 1)
+        yield from _drain(0)
+    finally:
+        # Also reached when the consumer stops early: drop queued work.
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,305 @@
+"""
+Nexora Automation Supervisor
+
+- Runs automations in a pool of separate worker processes
+- Enforces a per-slug timeout: a run that does not answer in time is
+  killed together with its worker and reported as
+  ``{"ok": False, "error": "timeout"}``
+- Caps each worker's address space (``RLIMIT_AS``) so a runaway
+  automation fails with ``MemoryError`` instead of exhausting the host
+- Recycles workers after a fixed number of tasks and replaces crashed
+  ones
+
+The timeout covers the whole call, including waiting for a free worker,
+so the caller (a web request or scheduler thread) never waits longer
+than the slug's timeout.  Workers resolve slugs through their own
+registry.  The supervisor sends the parent's registration with each task
+(module path, entry point or module-level function), so automations
+registered at runtime work as long as they are picklable.
+
+:func:`init_app` creates the default pool from the ``AUTOMATION_*``
+settings when ``AUTOMATION_EXECUTOR`` is ``"supervised"``.
+:func:`execute_automation` is what the application calls: it uses the
+default pool when one is configured and runs the automation inline
+otherwise.  Worker processes are spawned on first use.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .runner import registry, run_automation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30.0  # seconds
+DEFAULT_MAX_TASKS_PER_WORKER = 100
+_LIVENESS_INTERVAL = 0.1  # seconds between worker liveness checks while waiting
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]) -> None:
+    """Worker process loop: run tasks from ``conn`` until told to stop."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor decides when we stop
+    if memory_limit_mb:
+        import resource
+
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        slug, target, client, payload, credentials = task
+        if target is not None and registry.target(slug) != target:
+            registry.register(slug, target)
+        conn.send(run_automation(slug, client=client, payload=payload, credentials=credentials))
+
+
+class _Worker:
+    def __init__(self, context, memory_limit_mb: Optional[int]) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_mb), name="automation-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def retire(self) -> None:
+        """Ask the worker to exit after its current task; kill it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+
+class SupervisedPool:
+    """A bounded pool of automation worker processes.
+
+    Args:
+        max_workers: Maximum number of worker processes (spawned on demand).
+        default_timeout: Seconds allowed per run when the slug has no entry
+            in ``timeouts``.
+        timeouts: Per-slug timeouts in seconds.
+        memory_limit_mb: Address-space limit per worker, or None.
+        max_tasks_per_worker: Worker is replaced after this many runs.
+        start_method: ``multiprocessing`` start method.  The default
+            ``"forkserver"`` is safe for multi-threaded parents such as web
+            servers and, once its server has imported this module, starts
+            replacement workers without re-importing the application.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        default_timeout: float = DEFAULT_TIMEOUT,
+        timeouts: Optional[Dict[str, float]] = None,
+        memory_limit_mb: Optional[int] = None,
+        max_tasks_per_worker: int = DEFAULT_MAX_TASKS_PER_WORKER,
+        start_method: str = "forkserver",
+    ) -> None:
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            self._context.set_forkserver_preload([__name__])
+        self._idle: List[_Worker] = []
+        self._live = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def timeout_for(self, slug: str) -> float:
+        return self.timeouts.get(slug, self.default_timeout)
+
+    def start(self) -> None:
+        """Spawn all workers up front so the first runs do not pay the start-up cost."""
+        with self._cond:
+            missing = self.max_workers - self._live
+            self._live += missing
+        workers = [_Worker(self._context, self.memory_limit_mb) for _ in range(missing)]
+        with self._cond:
+            self._idle.extend(workers)
+            self._cond.notify_all()
+
+    def _acquire(self, deadline: float) -> Optional[_Worker]:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("SupervisedPool is shut down")
+                if self._idle:
+                    return self._idle.pop()
+                if self._live < self.max_workers:
+                    self._live += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        try:
+            return _Worker(self._context, self.memory_limit_mb)
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        with self._cond:
+            if healthy and worker.tasks < self.max_tasks_per_worker and not self._closed:
+                self._idle.append(worker)
+                self._cond.notify()
+                return
+            self._live -= 1
+            self._cond.notify()
+        if healthy:
+            worker.retire()
+        else:
+            worker.kill()
+
+    def run(
+        self,
+        slug: str,
+        *,
+        client: Any,
+        payload: Optional[Dict[str, Any]] = None,
+        credentials: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Run ``slug`` in a worker process; always returns a normalized result dict."""
+        timeout = timeout if timeout is not None else self.timeout_for(slug)
+        deadline = time.monotonic() + timeout
+        timed_out = {"ok": False, "slug": slug, "error": "timeout", "timeout": timeout}
+
+        worker = self._acquire(deadline)
+        if worker is None:
+            return timed_out
+        try:
+            worker.conn.send((slug, registry.target(slug), client, payload, credentials))
+        except Exception as e:
+            # Pickling fails before anything is written, so the worker is still usable.
+            self._release(worker, healthy=not isinstance(e, OSError))
+            return {"ok": False, "slug": slug, "error": f"Cannot send task: {type(e).__name__}: {e}"}
+        worker.tasks += 1
+
+        exited = False
+        try:
+            # Poll in slices: a worker that dies before it has picked up its
+            # end of the pipe never produces EOF, so also watch the process.
+            while worker.process.is_alive():
+                if worker.conn.poll(min(max(deadline - time.monotonic(), 0), _LIVENESS_INTERVAL)):
+                    result = worker.conn.recv()
+                    self._release(worker, healthy=True)
+                    return result
+                if time.monotonic() >= deadline:
+                    break
+        except (EOFError, OSError):
+            exited = True
+        if not exited and worker.process.is_alive():
+            logger.warning("Automation %s timed out after %.1fs; killing worker %s", slug, timeout, worker.process.pid)
+            self._release(worker, healthy=False)
+            return timed_out
+        worker.process.join(1)
+        exitcode = worker.process.exitcode
+        self._release(worker, healthy=False)
+        return {"ok": False, "slug": slug, "error": f"worker exited with code {exitcode}"}
+
+    def shutdown(self) -> None:
+        """Stop idle workers; busy ones are stopped when their run returns."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.retire()
+
+
+_default_pool: Optional[SupervisedPool] = None
+_default_lock = threading.Lock()
+
+
+def configure(**options: Any) -> SupervisedPool:
+    """(Re)create the default pool used by :func:`run_automation_isolated`."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.shutdown()
+        else:
+            atexit.register(lambda: _default_pool and _default_pool.shutdown())
+        _default_pool = SupervisedPool(**options)
+        return _default_pool
+
+
+def run_automation_isolated(slug: str, **kwargs: Any) -> Dict[str, Any]:
+    """Like :func:`~.runner.run_automation`, but in the default supervised pool.
+
+    Accepts the same keyword arguments plus ``timeout``.
+    """
+    pool = _default_pool or configure()
+    return pool.run(slug, **kwargs)
+
+
+def default_pool() -> Optional[SupervisedPool]:
+    """The default pool, or None if automations run inline."""
+    return _default_pool
+
+
+def execute_automation(slug: str, **kwargs: Any) -> Dict[str, Any]:
+    """Run ``slug`` the configured way: in the default pool if there is one, else inline."""
+    pool = _default_pool
+    if pool is None:
+        return run_automation(slug, **kwargs)
+    return pool.run(slug, **kwargs)
+
+
+def pool_options(config: Dict[str, Any], **overrides: Any) -> Dict[str, Any]:
+    """:class:`SupervisedPool` arguments from the ``AUTOMATION_*`` settings."""
+    options = {
+        "max_workers": config.get("AUTOMATION_WORKERS", 2),
+        "default_timeout": config.get("AUTOMATION_TIMEOUT", DEFAULT_TIMEOUT),
+        "timeouts": config.get("AUTOMATION_TIMEOUTS") or {},
+        "memory_limit_mb": config.get("AUTOMATION_MEMORY_LIMIT_MB") or None,
+        "max_tasks_per_worker": config.get("AUTOMATION_MAX_TASKS_PER_WORKER", DEFAULT_MAX_TASKS_PER_WORKER),
+    }
+    options.update(overrides)
+    return options
+
+
+def shutdown() -> None:
+    """Shut the default pool down; later calls run inline until it is configured again."""
+    global _default_pool
+    with _default_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def init_app(app) -> None:
+    """Configure the default pool from ``app.config`` (or run inline)."""
+    executor = app.config.get("AUTOMATION_EXECUTOR", "inline")
+    if executor not in ("inline", "supervised"):
+        raise ValueError(f"AUTOMATION_EXECUTOR must be 'inline' or 'supervised', not {executor!r}")
+    if executor == "supervised":
+        configure(**pool_options(app.config))
+    else:
+        shutdown()
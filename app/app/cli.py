@@ -0,0 +1,336 @@
+"""
+Command-line interface for Nexora.
+
+Commands are grouped under ``flask nexora`` and registered on the app
+by the application factory, e.g.::
+
+    flask nexora rebuild-stats --dry-run
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import click
+from flask.cli import AppGroup
+
+nexora_cli = AppGroup("nexora", help="Nexora maintenance commands.")
+
+
+@nexora_cli.command("bootstrap")
+def bootstrap_command() -> None:
+    """Create tables and seed data, and record the schema/seed fingerprint."""
+    from .utils.bootstrap import bootstrap, stored_fingerprint
+
+    previous = stored_fingerprint()
+    current = bootstrap()
+    if previous == current:
+        click.echo(f"Database already bootstrapped (fingerprint {current}); seed data re-checked.")
+    else:
+        click.echo(f"Database bootstrapped (fingerprint {previous} -> {current}).")
+
+
+@nexora_cli.command("startup-benchmark")
+@click.option("--runs", default=5, show_default=True)
+@click.option("--cold-budget-ms", type=float, help="Budget for create_app on an empty database (default STARTUP_COLD_BUDGET_MS).")
+@click.option("--warm-budget-ms", type=float, help="Budget for create_app on a bootstrapped database (default STARTUP_WARM_BUDGET_MS).")
+def startup_benchmark(runs: int, cold_budget_ms: Optional[float], warm_budget_ms: Optional[float]) -> None:
+    """Time cold and warm create_app against scratch SQLite databases and enforce budgets."""
+    from flask import current_app
+
+    from . import create_app
+    from .utils.bootstrap import measure_startup
+
+    cold_budget_ms = cold_budget_ms or current_app.config["STARTUP_COLD_BUDGET_MS"]
+    warm_budget_ms = warm_budget_ms or current_app.config["STARTUP_WARM_BUDGET_MS"]
+
+    result = measure_startup(create_app, current_app.config, runs=runs)
+    click.echo(
+        f"cold: {result['cold_ms']:.1f} ms ({result['cold_statements']} statements), "
+        f"warm: {result['warm_ms']:.1f} ms ({result['warm_statements']} statements)"
+    )
+    over = []
+    if result["cold_ms"] > cold_budget_ms:
+        over.append(f"cold {result['cold_ms']:.1f} ms > {cold_budget_ms:.0f} ms")
+    if result["warm_ms"] > warm_budget_ms:
+        over.append(f"warm {result['warm_ms']:.1f} ms > {warm_budget_ms:.0f} ms")
+    if over:
+        raise click.ClickException("Startup over budget: " + "; ".join(over))
+
+
+@nexora_cli.command("rebuild-stats")
+@click.option("--dry-run", is_flag=True, help="Only report drift; do not rewrite the counters.")
+def rebuild_stats(dry_run: bool) -> None:
+    """Recompute the per-client KPI counters from the base tables."""
+    from .utils.counters import rebuild_counters
+
+    drift = rebuild_counters(dry_run=dry_run)
+    for line in drift:
+        click.echo(line)
+    if drift:
+        action = "found" if dry_run else "repaired"
+        click.echo(f"{len(drift)} drifted counter(s) {action}.")
+    else:
+        click.echo("Counters are consistent with the base tables.")
+
+
+@nexora_cli.command("check-query-plans")
+def check_query_plans_command() -> None:
+    """Fail if a tenant-scoped hot query regresses to a full table scan (SQLite)."""
+    from .utils.query_plans import check_query_plans
+
+    results = check_query_plans()
+    if not results:
+        click.echo("Query plan checks only run against SQLite; skipped.")
+        return
+    failed = 0
+    for name, plan, problems in results:
+        status = "FAIL" if problems else "ok"
+        click.echo(f"[{status}] {name}: {' / '.join(plan)}")
+        for problem in problems:
+            click.echo(f"       {problem}")
+        failed += bool(problems)
+    if failed:
+        raise click.ClickException(f"{failed} hot quer{'y' if failed == 1 else 'ies'} regressed.")
+
+
+@nexora_cli.command("backfill-follow-ups")
+@click.option("--batch-size", default=1000, show_default=True)
+def backfill_follow_ups(batch_size: int) -> None:
+    """Enroll existing 'new' leads in the follow-up cadence."""
+    from .utils.follow_up import backfill
+
+    click.echo(f"Enrolled {backfill(batch_size)} lead(s).")
+
+
+@nexora_cli.command("worker")
+def worker() -> None:
+    """Run the scheduler and email outbox workers until interrupted."""
+    from flask import current_app
+
+    from .worker import run_worker
+
+    run_worker(current_app._get_current_object())
+
+
+@nexora_cli.command("status")
+def status() -> None:
+    """Print background work status as JSON; exits non-zero if no scheduler leader is alive."""
+    import json
+
+    from .utils.worker_status import background_status
+
+    report = background_status()
+    click.echo(json.dumps(report, indent=2))
+    if not report["healthy"]:
+        raise SystemExit(1)
+
+
+@nexora_cli.command("run-automations")
+@click.argument("slug")
+@click.argument("input_file", metavar="INPUT", type=click.File("r"), default="-")
+@click.option("-o", "--output", type=click.File("w"), default="-", help="JSONL results (default stdout).")
+@click.option("--client", "default_client", help="Client slug for lines that do not name one.")
+@click.option(
+    "--executor",
+    type=click.Choice(["thread", "process", "supervised"]),
+    default="thread",
+    show_default=True,
+    help="supervised: worker processes with the AUTOMATION_* timeouts and limits.",
+)
+@click.option("--workers", default=4, show_default=True)
+@click.option("--unordered", is_flag=True, help="Write results as they finish instead of in input order.")
+@click.option("--max-pending", type=int, help="Items in flight at once (default 2 x workers).")
+def run_automations(slug, input_file, output, default_client, executor, workers, unordered, max_pending) -> None:
+    """Run an automation over JSONL payloads and write JSONL results.
+
+    Each input line is either ``{"client": "<slug>", "payload": {...}}`` or
+    a bare payload object (used with --client).
+    """
+    import json
+
+    from flask import current_app
+
+    from .automations import supervisor
+    from .automations.runner import ClientRef, run_automation_many
+    from .models import Client
+
+    if executor == "supervised":
+        supervisor.configure(**supervisor.pool_options(current_app.config, max_workers=workers))
+
+    clients = {}
+    bad_lines = 0
+
+    def client_ref(client_slug):
+        if client_slug not in clients:
+            client = Client.query.filter_by(slug=client_slug).first() if client_slug else None
+            clients[client_slug] = ClientRef(client.name, client.slug) if client else ClientRef(None, client_slug)
+        return clients[client_slug]
+
+    def items():
+        nonlocal bad_lines
+        for number, line in enumerate(input_file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                click.echo(f"line {number}: invalid JSON ({e}); skipped", err=True)
+                bad_lines += 1
+                continue
+            if isinstance(record, dict) and isinstance(record.get("payload"), dict):
+                yield client_ref(record.get("client") or default_client), record["payload"]
+            else:
+                yield client_ref(default_client), record if isinstance(record, dict) else {"value": record}
+
+    failed = total = 0
+    for result in run_automation_many(
+        slug, items(), executor=executor, max_workers=workers, ordered=not unordered, max_pending=max_pending
+    ):
+        total += 1
+        failed += not result.get("ok")
+        output.write(json.dumps(result, default=str) + "\n")
+        output.flush()
+    supervisor.shutdown()
+    click.echo(f"{total} run(s), {failed} failed, {bad_lines} invalid line(s).", err=True)
+    if failed or bad_lines:
+        raise SystemExit(1)
+
+
+@nexora_cli.command("import-leads")
+@click.argument("client_slug", required=False)
+@click.argument("path", required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option("--source", default="import", show_default=True, help="Lead source for rows that do not set one.")
+@click.option("--run-automations", is_flag=True, help="Enroll follow-ups and send one lead-capture notification.")
+@click.option("--batch-size", type=int, help="Rows per INSERT/commit (default IMPORT_BATCH_SIZE).")
+@click.option("--resume", "resume_id", type=int, help="Resume the import with this ID instead of starting one.")
+def import_leads(client_slug, path, source, run_automations, batch_size, resume_id) -> None:
+    """Import leads from a CSV or JSONL file, or resume an interrupted import."""
+    import json
+    import os
+
+    from . import db
+    from .models import Client, LeadImport
+    from .utils.lead_import import ImportBusy, create_import, import_status, run_import
+
+    if resume_id is not None:
+        lead_import = db.session.get(LeadImport, resume_id)
+        if lead_import is None:
+            raise click.ClickException(f"No lead import with ID {resume_id}.")
+    else:
+        if not client_slug or not path:
+            raise click.UsageError("CLIENT_SLUG and PATH are required unless --resume is given.")
+        client = Client.query.filter_by(slug=client_slug).first()
+        if client is None:
+            raise click.ClickException(f"No client with slug {client_slug!r}.")
+        try:
+            with open(path, "rb") as fh:
+                lead_import = create_import(
+                    client.id,
+                    fh,
+                    os.path.basename(path),
+                    source=source,
+                    run_automations=run_automations,
+                    claim=True,
+                )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Started lead import {lead_import.id}.", err=True)
+    try:
+        report = import_status(run_import(lead_import, batch_size, claimed=resume_id is None))
+    except ImportBusy as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(report, indent=2))
+    if report["status"] != "completed":
+        raise click.ClickException(f"Import stopped; resume it with --resume {report['id']}.")
+
+
+@nexora_cli.command("dedupe-leads")
+@click.option("--dry-run", is_flag=True, help="Only count the duplicates; change nothing.")
+@click.option("--bucket-rows", type=int, help="Leads per spill bucket (default DEDUPE_BUCKET_ROWS).")
+def dedupe_leads_command(dry_run, bucket_rows) -> None:
+    """Set missing contact keys and merge duplicate leads of each client."""
+    import json
+
+    from .utils.dedupe import dedupe_leads
+
+    report = dedupe_leads(bucket_rows=bucket_rows, dry_run=dry_run)
+    click.echo(json.dumps(report))
+    if report["skipped"]:
+        raise click.ClickException(f"{report['skipped']} duplicate group(s) changed during the run; run it again.")
+
+
+@nexora_cli.command("export")
+@click.argument("client_slug")
+@click.argument("kind", type=click.Choice(["leads", "jobs", "logs"]))
+@click.option("-o", "--output", type=click.File("wb"), default="-", help="Output file (default: stdout).")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default="csv", show_default=True)
+@click.option("--gzip", "compress", is_flag=True, help="Compress the output with gzip.")
+@click.option("--start", help="Only rows created on/after this ISO date or datetime.")
+@click.option("--end", help="Only rows created before this datetime (a date includes that day).")
+@click.option("--status", help="Only rows with this status (entry type for logs).")
+def export(client_slug, kind, output, fmt, compress, start, end, status) -> None:
+    """Stream a client's leads, jobs or logs as CSV or JSONL."""
+    from .models import Client
+    from .utils.export import parse_bound, stream_export
+
+    client = Client.query.filter_by(slug=client_slug).first()
+    if client is None:
+        raise click.ClickException(f"No client with slug {client_slug!r}.")
+    try:
+        start, end = parse_bound(start), parse_bound(end, end=True)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    for chunk in stream_export(kind, client.id, fmt, compress=compress, start=start, end=end, status=status):
+        output.write(chunk)
+
+
+@nexora_cli.command("archive-logs")
+@click.option("--days", type=int, help="Keep this many days in log_entry (default LOG_RETENTION_DAYS).")
+@click.option("--dry-run", is_flag=True, help="Only count the entries that would be archived.")
+def archive_logs_command(days, dry_run) -> None:
+    """Roll up and archive log entries older than the retention window."""
+    import json
+
+    from .utils.log_archive import archive_logs
+
+    try:
+        report = archive_logs(days, dry_run=dry_run)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--days")
+    click.echo(json.dumps(report))
+    if report["failed"]:
+        raise SystemExit(1)
+
+
+@nexora_cli.command("rebuild-search")
+def rebuild_search() -> None:
+    """Re-index leads and log entries for full-text search."""
+    from .utils.search import rebuild_search_indexes
+
+    rebuilt = rebuild_search_indexes()
+    if not rebuilt:
+        raise click.ClickException("Full-text search is not available (needs SQLite with FTS5; run bootstrap).")
+    click.echo(f"Rebuilt {', '.join(rebuilt)}.")
+
+
+@nexora_cli.command("webhook-secret")
+@click.argument("client_slug")
+@click.option("--revoke-others", is_flag=True, help="Delete the client's other webhook secrets (finish a rotation).")
+def webhook_secret(client_slug, revoke_others) -> None:
+    """Create a signing secret for the client's lead ingestion API and print it."""
+    import secrets
+
+    from . import db
+    from .models import Client, IntegrationCredential
+    from .utils.webhooks import SERVICE
+
+    client = Client.query.filter_by(slug=client_slug).first()
+    if client is None:
+        raise click.ClickException(f"No client with slug {client_slug!r}.")
+    if revoke_others:
+        IntegrationCredential.query.filter_by(client_id=client.id, service=SERVICE).delete()
+    secret = secrets.token_urlsafe(32)
+    db.session.add(IntegrationCredential(client_id=client.id, service=SERVICE, token=secret))
+    db.session.commit()
+    click.echo(secret)
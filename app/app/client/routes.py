@@ -16,19 +16,30 @@ from flask import (
     url_for,
     flash,
     request,
+    abort,
 )
 from flask_login import login_required, current_user
 from wtforms import StringField, SubmitField, SelectField, IntegerField, BooleanField
-from wtforms.validators import DataRequired, Optional
+from wtforms.validators import DataRequired, Optional, ValidationError
 from flask_wtf import FlaskForm
 
-from ..models import Client, Lead, Job, AutomationInstance, AutomationTemplate, LogEntry
+from ..models import Client, Lead, Job, AutomationInstance
 from .. import db
+from ..utils.automation_cache import enabled_automation
 from ..utils.automations import run_appointment_helper, run_review_request
+from ..utils.counters import get_kpis
+from ..utils.export import EXPORTS, export_response
+from ..utils.log_archive import log_page, recent_logs
+from ..utils.pagination import DEFAULT_PER_PAGE, keyset_page
+from ..utils.search import SEARCH_INDEXES, search as run_search
 
 
 client_bp = Blueprint("client", __name__, url_prefix="")
 
+# Number of recent leads offered in the "Associated Lead" dropdown.  Any
+# of the client's leads is accepted (see JobForm.validate_lead_id).
+JOB_FORM_LEAD_CHOICES = 200
+
 
 def client_required(f):
     """Decorator to restrict routes to client users only."""
@@ -46,10 +57,22 @@ def client_required(f):
 
 class JobForm(FlaskForm):
     title = StringField("Job Title", validators=[DataRequired()])
-    lead_id = SelectField("Associated Lead", coerce=int, validators=[Optional()])
+    # The dropdown lists only recent leads, so the choice is checked
+    # against the client's leads rather than against the list.
+    lead_id = SelectField("Associated Lead", coerce=int, validate_choice=False, validators=[Optional()])
     scheduled_time = StringField("Scheduled Time (YYYY-MM-DD HH:MM)", validators=[Optional()])
     submit = SubmitField("Create Job")
 
+    def __init__(self, client_id: int, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.client_id = client_id
+
+    def validate_lead_id(self, field) -> None:
+        if field.data in (None, -1):
+            return
+        if Lead.query.filter_by(id=field.data, client_id=self.client_id).first() is None:
+            raise ValidationError("Not a valid lead.")
+
 
 class LayoutForm(FlaskForm):
     # Each module can be hidden or shown; order is determined by index in list
@@ -66,19 +89,17 @@ class LayoutForm(FlaskForm):
 @client_required
 def dashboard():
     client = current_user.client
-    # Calculate KPIs
-    from datetime import datetime
-    now = datetime.utcnow()
-    start_of_day = datetime(now.year, now.month, now.day)
-    leads_today = Lead.query.filter_by(client_id=client.id).filter(Lead.created_at >= start_of_day).count()
-    jobs_scheduled = Job.query.filter_by(client_id=client.id, status="scheduled").count()
-    automations_running = AutomationInstance.query.filter_by(client_id=client.id, enabled=True).count()
+    # KPIs come from the incrementally maintained counter tables
+    kpis = get_kpis(client.id)
+    leads_today = kpis["leads_today"]
+    jobs_scheduled = kpis["jobs_scheduled"]
+    automations_running = kpis["automations_running"]
     # Estimate time saved as number of automations running * 5 minutes per run (placeholder)
     time_saved = automations_running * 5
     # Fetch automation instances
     automations = AutomationInstance.query.filter_by(client_id=client.id).all()
     # Latest logs
-    logs = LogEntry.query.filter_by(client_id=client.id).order_by(LogEntry.created_at.desc()).limit(10).all()
+    logs = recent_logs(client.id, 10)
     # Determine layout visibility
     layout = client.dashboard_layout or {}
     visible = layout.get("visible", {
@@ -106,8 +127,17 @@ def dashboard():
 @client_required
 def leads():
     client = current_user.client
-    leads = Lead.query.filter_by(client_id=client.id).order_by(Lead.created_at.desc()).all()
-    return render_template("client/leads.html", client=client, leads=leads)
+    query = Lead.query.filter_by(client_id=client.id)
+    status = request.args.get("status")
+    source = request.args.get("source")
+    if status:
+        query = query.filter(Lead.status == status)
+    if source:
+        query = query.filter(Lead.source == source)
+    page = keyset_page(query, Lead, request.args.get("cursor"), request.args.get("per_page", DEFAULT_PER_PAGE, type=int))
+    return render_template(
+        "client/leads.html", client=client, leads=page["items"], page=page, status=status, source=source
+    )
 
 
 @client_bp.route("/jobs", methods=["GET", "POST"])
@@ -115,9 +145,15 @@ def leads():
 @client_required
 def jobs():
     client = current_user.client
-    form = JobForm()
-    # Populate lead choices
-    leads = Lead.query.filter_by(client_id=client.id).all()
+    form = JobForm(client.id)
+    # Populate lead choices with the most recent leads only; the full
+    # history is browsable on the leads page.
+    leads = (
+        Lead.query.filter_by(client_id=client.id)
+        .order_by(Lead.created_at.desc(), Lead.id.desc())
+        .limit(JOB_FORM_LEAD_CHOICES)
+        .all()
+    )
     form.lead_id.choices = [(-1, "No Lead")] + [(lead.id, lead.name) for lead in leads]
     if form.validate_on_submit():
         job = Job(
@@ -137,22 +173,20 @@ def jobs():
         db.session.add(job)
         db.session.commit()
         # Invoke appointment helper automation if enabled
-        ai = (
-            AutomationInstance.query.join(AutomationInstance.template)
-            .filter(
-                AutomationInstance.client == client,
-                AutomationInstance.enabled == True,
-                AutomationTemplate.type == "appointment_helper",
-            )
-            .first()
-        )
+        ai = enabled_automation(client.id, "appointment_helper")
         if ai:
             run_appointment_helper(ai, job)
         flash("Job created successfully.", "success")
         return redirect(url_for("client.jobs"))
     # List jobs
-    jobs = Job.query.filter_by(client_id=client.id).order_by(Job.created_at.desc()).all()
-    return render_template("client/jobs.html", client=client, form=form, jobs=jobs)
+    query = Job.query.filter_by(client_id=client.id)
+    status = request.args.get("status")
+    if status:
+        query = query.filter(Job.status == status)
+    page = keyset_page(query, Job, request.args.get("cursor"), request.args.get("per_page", DEFAULT_PER_PAGE, type=int))
+    return render_template(
+        "client/jobs.html", client=client, form=form, jobs=page["items"], page=page, status=status
+    )
 
 
 @client_bp.route("/jobs/<int:job_id>/complete", methods=["POST"])
@@ -164,15 +198,7 @@ def complete_job(job_id: int):
     job.status = "completed"
     db.session.commit()
     # Trigger review request automation if enabled
-    ai = (
-        AutomationInstance.query.join(AutomationInstance.template)
-        .filter(
-            AutomationInstance.client == client,
-            AutomationInstance.enabled == True,
-            AutomationTemplate.type == "review_request",
-        )
-        .first()
-    )
+    ai = enabled_automation(client.id, "review_request")
     if ai:
         run_review_request(ai, job)
     flash("Job marked as completed.", "success")
@@ -184,15 +210,48 @@ def complete_job(job_id: int):
 @client_required
 def logs():
     client = current_user.client
-    logs = LogEntry.query.filter_by(client_id=client.id).order_by(LogEntry.created_at.desc()).limit(50).all()
-    return render_template("client/logs.html", client=client, logs=logs)
+    entry_type = request.args.get("type")
+    page = log_page(
+        client.id,
+        request.args.get("cursor"),
+        request.args.get("per_page", DEFAULT_PER_PAGE, type=int),
+        entry_type=entry_type or None,
+    )
+    return render_template("client/logs.html", client=client, logs=page["items"], page=page, entry_type=entry_type)
+
+
+@client_bp.route("/search")
+@login_required
+@client_required
+def search():
+    q = request.args.get("q", "")
+    scope = request.args.get("scope", "leads")
+    if scope not in SEARCH_INDEXES:
+        scope = "leads"
+    results = run_search(
+        scope,
+        q,
+        client_id=current_user.client_id,
+        page=request.args.get("page", 1, type=int),
+        sort=request.args.get("sort"),
+    )
+    return render_template("client/search.html", q=q, scope=scope, results=results)
+
+
+@client_bp.route("/export/<kind>")
+@login_required
+@client_required
+def export(kind: str):
+    if kind not in EXPORTS:
+        abort(404)
+    return export_response(kind, current_user.client)
 
 
 @client_bp.route("/settings", methods=["GET", "POST"])
 @login_required
 @client_required
 def settings():
-    client = current_user.client
+    client = db.session.get(Client, current_user.client_id)
     layout = client.dashboard_layout or {}
     visible = layout.get("visible", {
         "kpi": True,
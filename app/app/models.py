@@ -35,8 +35,11 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'admin' or 'client'
-    client_id = db.Column(db.Integer, db.ForeignKey("client.id"))
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), index=True)
     active = db.Column(db.Boolean, default=True)
+    # Bumped when password, role, client or active flag change; sessions
+    # stamped with an older value are logged out (see utils/user_cache.py).
+    auth_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     client = db.relationship("Client", back_populates="users")
 
@@ -119,6 +122,7 @@ class AutomationTemplate(db.Model):
 
 class AutomationInstance(db.Model):
     __tablename__ = "automation_instance"
+    __table_args__ = (db.Index("ix_automation_instance_client_enabled", "client_id", "enabled"),)
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     template_id = db.Column(db.Integer, db.ForeignKey("automation_template.id"), nullable=False)
@@ -137,6 +141,15 @@ class AutomationInstance(db.Model):
 
 class Lead(db.Model):
     __tablename__ = "lead"
+    # Tenant-scoped hot paths: list pages (keyset on created_at, id), status
+    # filters and the stale-lead scan.  SQLite appends the rowid (id) to
+    # every index, so the keyset order is served without a sort.  The
+    # contact key finds a person's lead with one probe (see utils.dedupe).
+    __table_args__ = (
+        db.Index("ix_lead_client_created", "client_id", "created_at"),
+        db.Index("ix_lead_client_status_created", "client_id", "status", "created_at"),
+        db.Index("ix_lead_client_contact_key", "client_id", "contact_key", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     name = db.Column(db.String(120), nullable=False)
@@ -144,6 +157,8 @@ class Lead(db.Model):
     phone = db.Column(db.String(40), nullable=True)
     source = db.Column(db.String(120), nullable=True)
     status = db.Column(db.String(40), default="new")  # new, scheduled, stale, etc.
+    # Lowercased email, else E.164 phone; NULL until keyed (see utils.dedupe).
+    contact_key = db.Column(db.String(120), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     client = db.relationship("Client", back_populates="leads")
@@ -155,6 +170,11 @@ class Lead(db.Model):
 
 class Job(db.Model):
     __tablename__ = "job"
+    __table_args__ = (
+        db.Index("ix_job_client_created", "client_id", "created_at"),
+        db.Index("ix_job_client_status_created", "client_id", "status", "created_at"),
+        db.Index("ix_job_lead_id", "lead_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     lead_id = db.Column(db.Integer, db.ForeignKey("lead.id"), nullable=True)
@@ -172,6 +192,10 @@ class Job(db.Model):
 
 class LogEntry(db.Model):
     __tablename__ = "log_entry"
+    __table_args__ = (
+        db.Index("ix_log_entry_client_created", "client_id", "created_at"),
+        db.Index("ix_log_entry_entry_type", "entry_type"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
     automation_instance_id = db.Column(
@@ -187,11 +211,52 @@ class LogEntry(db.Model):
         return f"<LogEntry {self.entry_type} {self.message[:20]}>"
 
 
+class LogDailyStats(db.Model):
+    """Per-client, per-day (UTC), per-type counts of archived log entries.
+
+    Written by ``utils/log_archive.py`` when a day is moved out of
+    ``log_entry``, so counts over the full history do not need the
+    archive files.
+    """
+
+    __tablename__ = "log_daily_stats"
+    __table_args__ = (db.Index("ix_log_daily_stats_entry_type", "entry_type"),)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    entry_type = db.Column(db.String(40), primary_key=True)
+    entries = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<LogDailyStats client={self.client_id} day={self.day} {self.entry_type}={self.entries}>"
+
+
+class LogArchiveSegment(db.Model):
+    """One gzip JSONL file holding a client's archived log entries for one day."""
+
+    __tablename__ = "log_archive_segment"
+    __table_args__ = (db.UniqueConstraint("client_id", "day", name="uq_log_archive_segment_client_day"),)
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    path = db.Column(db.String(255), nullable=False)  # relative to LOG_ARCHIVE_DIR
+    entries = db.Column(db.Integer, nullable=False, default=0)
+    type_counts = db.Column(db.JSON, nullable=False, default=dict)  # entry_type -> entries
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+    min_id = db.Column(db.Integer, nullable=False)
+    max_id = db.Column(db.Integer, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<LogArchiveSegment client={self.client_id} day={self.day} entries={self.entries}>"
+
+
 class IntegrationCredential(db.Model):
     __tablename__ = "integration_credential"
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
-    service = db.Column(db.String(40), nullable=False)  # gmail, calendar, sheets
+    service = db.Column(db.String(40), nullable=False)  # gmail, calendar, sheets, webhook (token = signing secret)
     token = db.Column(db.Text, nullable=True)
     refresh_token = db.Column(db.Text, nullable=True)
     expiry = db.Column(db.DateTime, nullable=True)
@@ -202,6 +267,151 @@ class IntegrationCredential(db.Model):
         return f"<IntegrationCredential {self.service}>"
 
 
+class ClientStats(db.Model):
+    """Running per-client counters maintained by ``utils/counters.py``."""
+
+    __tablename__ = "client_stats"
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), primary_key=True)
+    leads_total = db.Column(db.Integer, nullable=False, default=0)
+    jobs_total = db.Column(db.Integer, nullable=False, default=0)
+    jobs_scheduled = db.Column(db.Integer, nullable=False, default=0)
+    automations_running = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<ClientStats client={self.client_id}>"
+
+
+class ClientDailyStats(db.Model):
+    """Per-client, per-day (UTC) counters maintained by ``utils/counters.py``."""
+
+    __tablename__ = "client_daily_stats"
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    leads_created = db.Column(db.Integer, nullable=False, default=0)
+    jobs_created = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<ClientDailyStats client={self.client_id} day={self.day}>"
+
+
+class FollowUpState(db.Model):
+    """Position of a lead in the follow-up email cadence.
+
+    A row exists only while the lead is enrolled (status ``new`` and the
+    cadence not yet finished), so a run touches nothing but due leads.
+    """
+
+    __tablename__ = "follow_up_state"
+    __table_args__ = (db.Index("ix_follow_up_state_client_due", "client_id", "next_due_at"),)
+    lead_id = db.Column(db.Integer, db.ForeignKey("lead.id"), primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
+    step = db.Column(db.Integer, nullable=False, default=0)  # follow-ups sent so far
+    next_due_at = db.Column(db.DateTime, nullable=False)
+    last_sent_at = db.Column(db.DateTime, nullable=True)
+    lead = db.relationship("Lead")
+
+    def __repr__(self) -> str:
+        return f"<FollowUpState lead={self.lead_id} step={self.step}>"
+
+
+class EmailOutbox(db.Model):
+    """A queued outbound email awaiting delivery by the outbox workers."""
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (db.Index("ix_email_outbox_status_available", "status", "available_at"),)
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=True)
+    recipients = db.Column(db.JSON, nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default="pending")  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    claim_token = db.Column(db.String(32), nullable=True, index=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+    latency_ms = db.Column(db.Integer, nullable=True)  # enqueue-to-delivery latency
+
+    def __repr__(self) -> str:
+        return f"<EmailOutbox {self.id} status={self.status}>"
+
+
+class LeadImport(db.Model):
+    """A bulk lead import from an uploaded CSV or JSONL file.
+
+    ``rows_processed`` counts the data rows consumed so far and is
+    committed together with each batch of leads, so an interrupted import
+    resumes from the first row that was not committed.
+    """
+
+    __tablename__ = "lead_import"
+    __table_args__ = (db.Index("ix_lead_import_client_created", "client_id", "created_at"),)
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(512), nullable=False)  # stored upload, kept until the import completes
+    format = db.Column(db.String(10), nullable=False)  # csv, jsonl
+    source = db.Column(db.String(120), nullable=False, default="import")
+    run_automations = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_imported = db.Column(db.Integer, nullable=False, default=0)
+    rows_merged = db.Column(db.Integer, nullable=False, default=0)  # repeats of an existing lead
+    rows_failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=True)  # first IMPORT_MAX_ERRORS [{"row": n, "error": "..."}]
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    client = db.relationship("Client")
+
+    def __repr__(self) -> str:
+        return f"<LeadImport {self.id} status={self.status} rows={self.rows_processed}>"
+
+
+class IdempotencyKey(db.Model):
+    """The stored response of a keyed API request, replayed when the key is reused."""
+
+    __tablename__ = "idempotency_key"
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey client={self.client_id} key={self.key}>"
+
+
+class SchedulerLease(db.Model):
+    """A named, time-limited lease; its holder is the only process running that role."""
+
+    __tablename__ = "scheduler_lease"
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(128), nullable=False)
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SchedulerLease {self.name} holder={self.holder}>"
+
+
+class AppMeta(db.Model):
+    """Small key/value store for application-level metadata (e.g. bootstrap fingerprint)."""
+
+    __tablename__ = "app_meta"
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<AppMeta {self.key}={self.value}>"
+
+
 def create_default_portfolio() -> None:
     """Ensure that the default 'Home Services Portfolio' and automation templates exist."""
     # Check if the portfolio exists
@@ -4,7 +4,10 @@ Public lead form blueprint.
 This blueprint serves the publicly accessible lead capture form for each
 client.  When a form is submitted, a `Lead` record is created,
 associated with the specified client, and the `lead_capture`
-automation is invoked if enabled.
+automation is invoked if enabled.  A repeat submission from the same
+email address is merged into the existing lead instead (see
+`utils.dedupe`) and does not run lead capture again.  Client lookups and the rendered form
+for anonymous visitors are cached (see `utils.public_cache`).
 """
 
 from flask import Blueprint, render_template, abort, redirect, url_for, flash, request
@@ -12,9 +15,10 @@ from wtforms import StringField, SubmitField
 from wtforms.validators import DataRequired, Email, Optional
 from flask_wtf import FlaskForm
 
-from .models import Client, Lead, AutomationInstance, AutomationTemplate
-from . import db
+from .utils.automation_cache import enabled_automation
 from .utils.automations import run_lead_capture
+from .utils.dedupe import capture_lead
+from .utils.public_cache import can_use_cached_page, client_snapshot, form_page
 
 public_bp = Blueprint("public", __name__, url_prefix="")
 
@@ -33,33 +37,31 @@ class LeadForm(FlaskForm):
 
 @public_bp.route("/lead/<client_slug>", methods=["GET", "POST"])
 def lead_form(client_slug: str):
-    client = Client.query.filter_by(slug=client_slug).first()
+    client = client_snapshot(client_slug)
     if not client:
         abort(404)
 
+    if request.method == "GET" and can_use_cached_page():
+        return form_page(
+            client_slug, lambda: render_template("public/lead_form.html", client=client, form=LeadForm())
+        )
+
     form = LeadForm()
     if form.validate_on_submit():
-        lead = Lead(
-            client=client,
-            name=form.name.data,
-            email=form.email.data.lower(),
-            phone=form.phone.data,
-            source=request.args.get("src") or "public_form",
-        )
-        db.session.add(lead)
-        db.session.commit()
-        # Invoke lead capture automation if enabled
-        ai = (
-            AutomationInstance.query.join(AutomationInstance.template)
-            .filter(
-                AutomationInstance.client == client,
-                AutomationInstance.enabled == True,
-                AutomationTemplate.type == "lead_capture",
-            )
-            .first()
+        lead, created = capture_lead(
+            client.id,
+            {
+                "name": form.name.data,
+                "email": form.email.data.lower(),
+                "phone": form.phone.data,
+                "source": request.args.get("src") or "public_form",
+            },
         )
+        # Invoke lead capture automation if enabled (new leads only)
+        ai = enabled_automation(client.id, "lead_capture") if created else None
         if ai:
             run_lead_capture(ai, lead)
+        # Same message for a repeat, so the form does not reveal who is a lead.
         flash("Thank you! Your information has been submitted.", "success")
         return redirect(url_for("public.lead_form", client_slug=client_slug))
 
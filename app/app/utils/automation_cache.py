@@ -0,0 +1,55 @@
+"""
+In-process cache of enabled automation instances.
+
+Trigger-based automations (lead capture, appointment helper, review
+request) need to know on every event whether the client has the
+automation enabled.  :func:`enabled_automation` answers from a
+per-process cache keyed by ``(client_id, template type)`` instead of
+joining ``automation_instance`` and ``automation_template`` each time.
+Negative answers are cached too.
+
+The cache is a :class:`~.versioned_cache.VersionedCache` on the
+``automation_cache_version`` row: any change to an automation instance
+or template is visible to every process within
+``AUTOMATION_CACHE_CHECK_INTERVAL`` seconds.
+"""
+
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+
+from .. import db
+from ..models import AutomationInstance, AutomationTemplate
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = "automation_cache_version"
+
+# What the trigger handlers read from an instance; safe to share across requests.
+CachedInstance = namedtuple("CachedInstance", ["id", "client_id", "template_type", "config"])
+
+automation_cache = VersionedCache(
+    "automation", VERSION_KEY, (AutomationInstance, AutomationTemplate), config_prefix="AUTOMATION_CACHE"
+)
+
+
+def _load(client_id: int, template_type: str) -> Tuple[CachedInstance, ...]:
+    rows = db.session.execute(
+        select(AutomationInstance.id, AutomationInstance.client_id, AutomationInstance.config)
+        .join(AutomationInstance.template)
+        .where(
+            AutomationInstance.client_id == client_id,
+            AutomationInstance.enabled.is_(True),
+            AutomationTemplate.type == template_type,
+        )
+        .order_by(AutomationInstance.id)
+    ).all()
+    return tuple(CachedInstance(id_, cid, template_type, config) for id_, cid, config in rows)
+
+
+def enabled_automation(client_id: int, template_type: str) -> Optional[CachedInstance]:
+    """Return the client's first enabled instance of ``template_type``, if any."""
+    instances = automation_cache.get((client_id, template_type), lambda: _load(client_id, template_type))
+    return instances[0] if instances else None
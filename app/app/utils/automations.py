@@ -2,58 +2,182 @@
 Automation handlers for Nexora V1.
 
 Each function corresponds to an automation template.  They perform
-actions (e.g. sending emails, updating records) and log results via
-`LogEntry`.  Real integrations (e.g. Google Workspace) can be added by
-expanding these functions.
+actions (e.g. queueing emails, updating records) and log results via
+`LogEntry`.  Emails are queued in the outbox (see ``outbox.py``) and
+delivered by background workers, so handlers never wait on the mail
+transport.
+
+An instance can also name a runner automation in its config
+(``{"integration": "<slug>"}``, see :mod:`app.automations.runner`), e.g.
+to push the lead to a CRM.  It runs after the built-in action, through
+the supervised pool when ``AUTOMATION_EXECUTOR`` is ``"supervised"``, so a
+hanging integration costs the request at most the slug's timeout.
 """
 
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from flask import current_app
+from sqlalchemy import select
 
 from .. import db
+from ..automations.runner import ClientRef, run_automation_many
+from ..automations.supervisor import default_pool, execute_automation
 from ..models import (
     AutomationInstance,
+    Client,
+    IntegrationCredential,
     Lead,
+    LeadImport,
     Job,
-    LogEntry,
     User,
 )
-from .email import send_email
+from .digest import run_daily_digests
+from .follow_up import advance, cadence_days, due_states
+from .log_sink import get_log_sink, log_unit
+from .outbox import enqueue_email, enqueue_emails
 
 
 def _log(client_id: int, automation_instance_id: Optional[int], message: str, entry_type: str = "info") -> None:
-    """Internal helper to create a log entry."""
-    log = LogEntry(
-        client_id=client_id,
-        automation_instance_id=automation_instance_id,
-        entry_type=entry_type,
-        message=message,
+    """Internal helper to buffer a log entry in the current unit of work's sink."""
+    get_log_sink().add(client_id, automation_instance_id, message, entry_type)
+
+
+def _integration_slug(ai: AutomationInstance) -> Optional[str]:
+    return (ai.config or {}).get("integration") if isinstance(ai.config, dict) else None
+
+
+def _client_ref(client_id: int) -> ClientRef:
+    # ``ai`` may be a cached snapshot without relationships (see automation_cache.py).
+    client = db.session.get(Client, client_id)
+    return ClientRef(client.name, client.slug)
+
+
+def _integration_credentials(client_id: int) -> Dict[str, Any]:
+    # The webhook secret signs inbound requests; integrations never need it.
+    rows = db.session.execute(
+        select(IntegrationCredential.service, IntegrationCredential.token).where(
+            IntegrationCredential.client_id == client_id, IntegrationCredential.service != "webhook"
+        )
+    ).all()
+    return {service: token for service, token in rows}
+
+
+def _log_integration(ai: AutomationInstance, result: Dict[str, Any], subject: str) -> None:
+    if result.get("ok"):
+        _log(ai.client_id, ai.id, f"Integration {result['slug']} executed for {subject}")
+    else:
+        _log(ai.client_id, ai.id, f"Integration {result['slug']} failed for {subject}: {result.get('error')}", "error")
+
+
+def run_integration(ai: AutomationInstance, payload: Dict[str, Any], subject: str) -> Optional[Dict[str, Any]]:
+    """Run the instance's configured integration, if any, and log the result.
+
+    ``subject`` names what triggered it in the log line (e.g. ``"lead 12"``).
+    Returns the runner's result dict, or None when no integration is set.
+    """
+    slug = _integration_slug(ai)
+    if not slug:
+        return None
+    result = execute_automation(
+        slug,
+        client=_client_ref(ai.client_id),
+        payload=payload,
+        credentials=_integration_credentials(ai.client_id),
     )
-    db.session.add(log)
-    db.session.commit()
+    _log_integration(ai, result, subject)
+    return result
+
+
+def run_integrations(instances: Iterable[AutomationInstance], payload: Dict[str, Any], subject: str) -> int:
+    """:func:`run_integration` for each instance.  Returns the number that failed."""
+    failed = 0
+    for ai in instances:
+        result = run_integration(ai, payload, subject)
+        failed += result is not None and not result["ok"]
+    return failed
 
 
 def run_lead_capture(ai: AutomationInstance, lead: Lead) -> None:
     """Handle the 'Universal Lead Capture' automation.
 
-    Sends a notification email to client users and logs the event.
+    Queues a notification email to client users and logs the event.
     """
     # Send email to all client users
     recipients = [user.email for user in lead.client.users if user.active]
-    subject = f"New lead captured: {lead.name}"
-    body = f"A new lead has been captured.\n\nName: {lead.name}\nEmail: {lead.email}\nPhone: {lead.phone or 'N/A'}\nSource: {lead.source}"
-    send_email(recipients, subject, body)
+    subject, body = _lead_capture_email(lead.name, lead.email, lead.phone, lead.source)
+    enqueue_email(recipients, subject, body, client_id=lead.client_id)
     _log(lead.client_id, ai.id, f"Lead capture automation executed for lead {lead.id}")
+    run_integration(ai, _lead_payload(lead.id, lead.name, lead.email, lead.phone, lead.source), f"lead {lead.id}")
+
+
+def _lead_payload(lead_id: int, name: str, email: str, phone: Optional[str], source: Optional[str]) -> Dict[str, Any]:
+    return {"lead_id": lead_id, "name": name, "email": email, "phone": phone, "source": source}
+
+
+def _lead_capture_email(name: str, email: str, phone: Optional[str], source: Optional[str]):
+    subject = f"New lead captured: {name}"
+    body = f"A new lead has been captured.\n\nName: {name}\nEmail: {email}\nPhone: {phone or 'N/A'}\nSource: {source}"
+    return subject, body
+
+
+def run_lead_capture_many(ai: AutomationInstance, leads: List[dict]) -> int:
+    """Lead capture for leads inserted in bulk (dicts with id, name, email, phone, source).
+
+    Queues the same per-lead notification as :func:`run_lead_capture` with
+    one outbox insert, without loading the leads as ORM objects.  Returns
+    the number of emails queued.
+    """
+    recipients = db.session.scalars(
+        select(User.email).where(User.client_id == ai.client_id, User.active.is_(True))
+    ).all()
+    messages = []
+    for lead in leads:
+        subject, body = _lead_capture_email(lead["name"], lead["email"], lead.get("phone"), lead.get("source"))
+        messages.append({"recipients": list(recipients), "subject": subject, "body": body, "client_id": ai.client_id})
+        _log(ai.client_id, ai.id, f"Lead capture automation executed for lead {lead['id']}")
+    queued = enqueue_emails(messages)
+    slug = _integration_slug(ai)
+    if slug:
+        # One run per lead, fanned out; the supervised pool bounds each one.
+        client = _client_ref(ai.client_id)
+        items = [
+            (client, _lead_payload(lead["id"], lead["name"], lead["email"], lead.get("phone"), lead.get("source")))
+            for lead in leads
+        ]
+        for result in run_automation_many(
+            slug,
+            items,
+            credentials=_integration_credentials(ai.client_id),
+            executor="supervised" if default_pool() is not None else "thread",
+            max_workers=current_app.config.get("AUTOMATION_WORKERS", 2),
+        ):
+            _log_integration(ai, result, f"lead {leads[result['index']]['id']}")
+    return queued
+
+
+def run_lead_capture_batch(ai: AutomationInstance, lead_import: LeadImport) -> None:
+    """Lead capture for a bulk import: one notification for the whole file.
+
+    Queues a single summary email to client users instead of one per lead.
+    """
+    client = lead_import.client
+    recipients = [user.email for user in client.users if user.active]
+    subject = f"{lead_import.rows_imported} leads imported"
+    body = (
+        f"{lead_import.rows_imported} leads were imported from {lead_import.filename} "
+        f"(source: {lead_import.source}).\n\nRows skipped: {lead_import.rows_failed}"
+    )
+    enqueue_email(recipients, subject, body, client_id=client.id)
+    _log(client.id, ai.id, f"Lead capture automation executed for import {lead_import.id} ({lead_import.rows_imported} leads)")
 
 
 def run_appointment_helper(ai: AutomationInstance, job: Job) -> None:
     """Handle the 'Appointment Helper' automation.
 
-    Sends a confirmation email to the lead (if present) or client users and logs the event.
+    Queues a confirmation email to the lead (if present) or client users and logs the event.
     """
     subject = f"Appointment confirmed: {job.title}"
     body = f"Your appointment '{job.title}' has been scheduled for {job.scheduled_time.strftime('%Y-%m-%d %H:%M') if job.scheduled_time else 'TBD'}."
@@ -62,26 +186,60 @@ def run_appointment_helper(ai: AutomationInstance, job: Job) -> None:
         recipients.append(job.lead.email)
     else:
         recipients.extend([u.email for u in job.client.users if u.active])
-    send_email(recipients, subject, body)
+    enqueue_email(recipients, subject, body, client_id=job.client_id)
     _log(job.client_id, ai.id, f"Appointment helper automation executed for job {job.id}")
+    run_integration(ai, _job_payload(job), f"job {job.id}")
+
+
+def _job_payload(job: Job) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "job_title": job.title,
+        "status": job.status,
+        "scheduled_time": job.scheduled_time.isoformat() if job.scheduled_time else None,
+        "lead_id": job.lead_id,
+        "email": job.lead.email if job.lead else None,
+        "name": job.lead.name if job.lead else None,
+    }
 
 
 def run_follow_up_sequence(ai: AutomationInstance) -> None:
     """Handle the 'Follow‑Up Email Sequence' automation.
 
-    Finds stale leads (status 'new' and older than X days) and sends follow‑up emails.  Stops on status change.
+    Sends the next follow‑up to every lead whose cadence step is due (see
+    ``follow_up.py``).  Leads whose status changed are no longer enrolled,
+    so the sequence stops for them; already-contacted leads are not
+    re-emailed until their next step falls due.
     """
-    stale_days = 3
-    cutoff = datetime.utcnow() - timedelta(days=stale_days)
-    client = ai.client
-    leads = Lead.query.filter_by(client_id=client.id, status="new").filter(Lead.created_at < cutoff).all()
-    for lead in leads:
-        subject = f"Checking in: still interested in our services?"
-        body = f"Hi {lead.name},\n\nWe noticed you reached out but haven't scheduled an appointment yet. Let us know if you have any questions or would like to book a time."
-        send_email(lead.email, subject, body)
-        _log(client.id, ai.id, f"Follow‑up email sent to lead {lead.id}")
-    if not leads:
-        _log(client.id, ai.id, "Follow‑up sequence executed: no stale leads found")
+    cadence = cadence_days(ai.config)
+    now = datetime.utcnow()
+    batch_size = current_app.config.get("FOLLOW_UP_BATCH_SIZE", 500)
+    sent = 0
+    with log_unit():
+        while True:
+            states = due_states(ai.client_id, now, batch_size)
+            if not states:
+                break
+            for state in states:
+                lead = state.lead
+                if lead.status != "new" or state.step >= len(cadence):
+                    # Status changed outside the ORM, or the cadence was shortened.
+                    db.session.delete(state)
+                    continue
+                due = lead.created_at + timedelta(days=cadence[state.step])
+                if due > now:
+                    # The instance uses a slower cadence than the enrollment default.
+                    state.next_due_at = due
+                    continue
+                subject = f"Checking in: still interested in our services?"
+                body = f"Hi {lead.name},\n\nWe noticed you reached out but haven't scheduled an appointment yet. Let us know if you have any questions or would like to book a time."
+                enqueue_email(lead.email, subject, body, client_id=ai.client_id)
+                _log(ai.client_id, ai.id, f"Follow‑up email {state.step + 1}/{len(cadence)} sent to lead {lead.id}")
+                advance(state, cadence, now)
+                sent += 1
+            db.session.flush()
+        if not sent:
+            _log(ai.client_id, ai.id, "Follow‑up sequence executed: no follow‑ups due")
 
 
 def run_review_request(ai: AutomationInstance, job: Job) -> None:
@@ -93,25 +251,16 @@ def run_review_request(ai: AutomationInstance, job: Job) -> None:
         return
     subject = f"How did we do? Please leave a review"
     body = f"Hi {job.lead.name},\n\nYour job '{job.title}' has been completed. We'd love to hear your feedback! Please reply with your review."
-    send_email(job.lead.email, subject, body)
+    enqueue_email(job.lead.email, subject, body, client_id=job.client_id)
     _log(job.client_id, ai.id, f"Review request sent for job {job.id}")
+    run_integration(ai, _job_payload(job), f"job {job.id}")
 
 
 def run_daily_digest(ai: AutomationInstance) -> None:
     """Handle the 'Daily Digest' automation.
 
     Compiles a summary of daily activity and emails it to client users.
+    Scheduled runs process many clients at once through
+    ``digest.run_daily_digests``; this wrapper covers a single instance.
     """
-    client = ai.client
-    now = datetime.utcnow()
-    today_start = datetime(now.year, now.month, now.day)
-    leads_today = Lead.query.filter_by(client_id=client.id).filter(Lead.created_at >= today_start).count()
-    jobs_today = Job.query.filter_by(client_id=client.id).filter(Job.created_at >= today_start).count()
-    automations_running = AutomationInstance.query.filter_by(client_id=client.id, enabled=True).count()
-    summary = (
-        f"Daily Digest:\n\nLeads Today: {leads_today}\nJobs Created Today: {jobs_today}\n"
-        f"Automations Running: {automations_running}\nTime Saved: (estimated)"
-    )
-    recipients = [u.email for u in client.users if u.active]
-    send_email(recipients, "Daily Digest", summary)
-    _log(client.id, ai.id, "Daily digest sent")
\ No newline at end of file
+    run_daily_digests([ai.id])
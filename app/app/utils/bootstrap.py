@@ -0,0 +1,188 @@
+"""
+One-shot database bootstrap.
+
+Creating tables, the default portfolio, the automation templates and the
+first administrator takes dozens of round-trips.  It only needs to happen
+once per schema/seed version, not in every process that creates the app.
+:func:`bootstrap` does all of it and then stores a fingerprint of the
+schema (tables, columns, indexes, search indexes) and seed data in
+``app_meta``.  When that fingerprint changes (a fresh or upgraded
+database) it also recomputes the KPI counters, which are otherwise only
+maintained incrementally (see :mod:`app.utils.counters`).
+:func:`ensure_bootstrapped`, called by the application factory, only
+compares that fingerprint with the running code's.  That is one primary
+key lookup on a bootstrapped database.  It bootstraps automatically when
+they differ, unless ``BOOTSTRAP_ON_STARTUP`` is off.
+
+``flask nexora bootstrap`` runs the bootstrap explicitly (e.g. in a
+release step).  ``flask nexora startup-benchmark`` measures cold and warm
+``create_app`` times against scratch SQLite databases.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import db
+from ..models import AppMeta, User, create_default_portfolio
+from . import automation_cache, public_cache, user_cache  # noqa: F401  (register their version rows)
+from .counters import rebuild_counters
+from .search import install_search_indexes, schema_signature
+from .seed_automations import TEMPLATES, seed_automation_templates
+from .versioned_cache import version_keys
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_KEY = "bootstrap_fingerprint"
+# Bump when the seeding code changes in a way the fingerprint cannot see
+# (e.g. the templates created by ``create_default_portfolio``).
+SEED_VERSION = 3
+
+
+@lru_cache(maxsize=1)
+def fingerprint() -> str:
+    """Hash of the declared schema and seed data for the running code."""
+    digest = hashlib.sha256()
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f"|{column.name}:{column.type!r}:{column.nullable}".encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(f"|{index.name}:{[c.name for c in index.columns]}".encode())
+    digest.update(schema_signature().encode())
+    digest.update(json.dumps([SEED_VERSION, TEMPLATES], sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def stored_fingerprint() -> Optional[str]:
+    """Return the fingerprint recorded by the last bootstrap, or None."""
+    try:
+        return db.session.scalar(select(AppMeta.value).where(AppMeta.key == FINGERPRINT_KEY))
+    except SQLAlchemyError:
+        # Fresh database: app_meta does not exist yet.
+        db.session.rollback()
+        return None
+
+
+def ensure_default_admin() -> None:
+    """Create the first administrator from DEFAULT_ADMIN_* if there is none."""
+    if db.session.scalar(select(User.id).where(User.role == "admin").limit(1)) is not None:
+        return
+    admin = User(email=os.getenv("DEFAULT_ADMIN_EMAIL", "admin@example.com").lower(), role="admin")
+    admin.set_password(os.getenv("DEFAULT_ADMIN_PASSWORD", "changeme"))
+    db.session.add(admin)
+    db.session.commit()
+
+
+def bootstrap() -> str:
+    """Create tables and seed data, then record the fingerprint.  Returns it.
+
+    Also creates the cache version rows (see
+    :mod:`app.utils.versioned_cache`) and the full-text search indexes
+    (see :mod:`app.utils.search`).  If the stored fingerprint differs, the
+    KPI counters are rebuilt from the base tables, so the counter tables
+    of an upgraded database start out correct rather than empty.
+    """
+    previous = stored_fingerprint()
+    db.create_all()
+    install_search_indexes(db.session.connection())
+    create_default_portfolio()
+    seed_automation_templates(db)
+    ensure_default_admin()
+    value = fingerprint()
+    if previous != value:
+        drift = rebuild_counters()
+        if drift:
+            logger.info("Rebuilt KPI counters (%d drifted)", len(drift))
+    for key in version_keys():
+        if db.session.get(AppMeta, key) is None:
+            db.session.add(AppMeta(key=key, value="0"))
+    meta = db.session.get(AppMeta, FINGERPRINT_KEY)
+    if meta is None:
+        db.session.add(AppMeta(key=FINGERPRINT_KEY, value=value))
+    else:
+        meta.value = value
+    db.session.commit()
+    return value
+
+
+def ensure_bootstrapped(app, attempts: int = 3) -> bool:
+    """Bootstrap the database if its fingerprint is stale.  Returns True if it ran."""
+    stored = stored_fingerprint()
+    if stored == fingerprint():
+        return False
+    if not app.config.get("BOOTSTRAP_ON_STARTUP", True):
+        logger.warning(
+            "Database bootstrap fingerprint %s does not match %s; run 'flask nexora bootstrap'.",
+            stored,
+            fingerprint(),
+        )
+        return False
+    logger.info("Bootstrapping database (fingerprint %s -> %s)", stored, fingerprint())
+    for attempt in range(1, attempts + 1):
+        try:
+            bootstrap()
+            return True
+        except SQLAlchemyError:
+            # Several processes starting on a fresh database race to
+            # create the same tables; retry against what the winner made.
+            db.session.rollback()
+            if attempt == attempts:
+                raise
+            time.sleep(0.2 * attempt)
+    return True
+
+
+def measure_startup(create_app, config, runs: int = 5) -> dict:
+    """Time ``create_app`` against scratch SQLite databases.
+
+    *Cold* runs start from an empty database (and so include the
+    bootstrap); *warm* runs reuse a bootstrapped one.  Returns the median
+    milliseconds and the number of SQL statements of each kind of run.
+    """
+    statements = [0]
+
+    def _count(*args) -> None:
+        statements[0] += 1
+
+    def _run(path: str):
+        overrides = {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "RUN_BACKGROUND_IN_WEB": False,
+            "BOOTSTRAP_ON_STARTUP": True,
+        }
+        config_object = type("StartupBenchmarkConfig", (), {**config, **overrides})
+        statements[0] = 0
+        started = time.perf_counter()
+        app = create_app(config_object)
+        elapsed = (time.perf_counter() - started) * 1000
+        with app.app_context():
+            db.engine.dispose()
+        return elapsed, statements[0]
+
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, "before_cursor_execute", _count)
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            cold = [_run(os.path.join(scratch, f"cold-{i}.db")) for i in range(runs)]
+            warm = [_run(os.path.join(scratch, "cold-0.db")) for _ in range(runs)]
+    finally:
+        event.remove(Engine, "before_cursor_execute", _count)
+    return {
+        "cold_ms": statistics.median(ms for ms, _ in cold),
+        "cold_statements": cold[0][1],
+        "warm_ms": statistics.median(ms for ms, _ in warm),
+        "warm_statements": warm[0][1],
+    }
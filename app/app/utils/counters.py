@@ -0,0 +1,278 @@
+"""
+Incrementally maintained per-client counters.
+
+Dashboard KPIs (leads today, jobs scheduled, automations running) used to
+be recomputed with ``COUNT(*)`` scans on every page view and digest run.
+Instead, an ``after_flush`` session hook turns every Lead, Job and
+AutomationInstance insert, update or delete into counter deltas. It
+applies them to ``client_stats`` and ``client_daily_stats`` inside the
+same transaction, so reading the KPIs becomes a primary-key lookup.
+
+Bulk code paths that bypass the ORM unit of work (e.g. ``executemany``
+inserts) must call :func:`apply_deltas` themselves.  If the counters ever
+drift, ``flask nexora rebuild-stats`` recomputes them from the base
+tables (see :func:`rebuild_counters`).
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, event, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .. import db
+from ..models import (
+    AutomationInstance,
+    Client,
+    ClientDailyStats,
+    ClientStats,
+    Job,
+    Lead,
+)
+
+TOTAL_FIELDS = ("leads_total", "jobs_total", "jobs_scheduled", "automations_running")
+DAILY_FIELDS = ("leads_created", "jobs_created")
+
+TotalDeltas = Dict[int, Counter]
+DailyDeltas = Dict[Tuple[int, date], Counter]
+
+
+def _history(obj, attr: str):
+    """Return ``(old, new)`` for an attribute changed in the current flush."""
+    hist = inspect(obj).attrs[attr].history
+    old = hist.deleted[0] if hist.deleted else (hist.unchanged[0] if hist.unchanged else None)
+    new = hist.added[0] if hist.added else old
+    return old, new
+
+
+def _day(value: Optional[datetime]) -> date:
+    return (value or datetime.utcnow()).date()
+
+
+def collect_deltas(session) -> Tuple[TotalDeltas, DailyDeltas]:
+    """Translate the pending changes of a flush into counter deltas."""
+    totals: TotalDeltas = defaultdict(Counter)
+    daily: DailyDeltas = defaultdict(Counter)
+
+    for obj in session.new:
+        if isinstance(obj, Lead):
+            totals[obj.client_id]["leads_total"] += 1
+            daily[(obj.client_id, _day(obj.created_at))]["leads_created"] += 1
+        elif isinstance(obj, Job):
+            totals[obj.client_id]["jobs_total"] += 1
+            totals[obj.client_id]["jobs_scheduled"] += obj.status == "scheduled"
+            daily[(obj.client_id, _day(obj.created_at))]["jobs_created"] += 1
+        elif isinstance(obj, AutomationInstance):
+            totals[obj.client_id]["automations_running"] += bool(obj.enabled)
+
+    for obj in session.dirty:
+        if isinstance(obj, Job):
+            old, new = _history(obj, "status")
+            if old != new:
+                totals[obj.client_id]["jobs_scheduled"] += (new == "scheduled") - (old == "scheduled")
+        elif isinstance(obj, AutomationInstance):
+            old, new = _history(obj, "enabled")
+            if bool(old) != bool(new):
+                totals[obj.client_id]["automations_running"] += bool(new) - bool(old)
+
+    for obj in session.deleted:
+        if isinstance(obj, Lead):
+            totals[obj.client_id]["leads_total"] -= 1
+            daily[(obj.client_id, _day(obj.created_at))]["leads_created"] -= 1
+        elif isinstance(obj, Job):
+            old, _ = _history(obj, "status")
+            totals[obj.client_id]["jobs_total"] -= 1
+            totals[obj.client_id]["jobs_scheduled"] -= old == "scheduled"
+            daily[(obj.client_id, _day(obj.created_at))]["jobs_created"] -= 1
+        elif isinstance(obj, AutomationInstance):
+            old, _ = _history(obj, "enabled")
+            totals[obj.client_id]["automations_running"] -= bool(old)
+
+    # Counters of clients deleted in this flush go away with them.
+    for obj in session.deleted:
+        if isinstance(obj, Client):
+            totals.pop(obj.id, None)
+            for key in [k for k in daily if k[0] == obj.id]:
+                daily.pop(key)
+    return totals, daily
+
+
+def _upsert(connection, model, keys: dict, deltas: Counter) -> None:
+    """Add ``deltas`` to the counter row identified by ``keys``, creating it if needed."""
+    table = model.__table__
+    where = and_(*(table.c[k] == v for k, v in keys.items()))
+    result = connection.execute(
+        update(table).where(where).values({f: table.c[f] + d for f, d in deltas.items()})
+    )
+    if not result.rowcount:
+        connection.execute(table.insert().values(**keys, **deltas))
+
+
+def _upsert_many(connection, model, key_names: Tuple[str, ...], rows: Dict[tuple, Counter]) -> None:
+    """Apply many ``keys -> deltas`` at once: one executemany per set of changed fields."""
+    table = model.__table__
+    groups: Dict[Tuple[str, ...], List[dict]] = defaultdict(list)
+    for keys, deltas in rows.items():
+        deltas = {k: v for k, v in deltas.items() if v}
+        if deltas:
+            groups[tuple(sorted(deltas))].append({**dict(zip(key_names, keys)), **deltas})
+    dialect = connection.dialect.name
+    for fields, params in groups.items():
+        if dialect in ("sqlite", "postgresql"):
+            insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key_names),
+                set_={field: table.c[field] + stmt.excluded[field] for field in fields},
+            )
+            connection.execute(stmt, params)
+            continue
+        for row in params:
+            _upsert(
+                connection,
+                model,
+                {k: row[k] for k in key_names},
+                Counter({f: row[f] for f in fields}),
+            )
+
+
+def apply_deltas(connection, totals: TotalDeltas, daily: DailyDeltas) -> None:
+    """Apply counter deltas using ``connection`` (i.e. in the caller's transaction)."""
+    _upsert_many(connection, ClientStats, ("client_id",), {(cid,): d for cid, d in totals.items()})
+    _upsert_many(connection, ClientDailyStats, ("client_id", "day"), daily)
+
+
+def _after_flush(session, flush_context) -> None:
+    totals, daily = collect_deltas(session)
+    for obj in session.deleted:
+        if isinstance(obj, Client):
+            session.connection().execute(delete(ClientStats).where(ClientStats.client_id == obj.id))
+            session.connection().execute(
+                delete(ClientDailyStats).where(ClientDailyStats.client_id == obj.id)
+            )
+    if totals or daily:
+        apply_deltas(session.connection(), totals, daily)
+
+
+def init_app(app) -> None:
+    """Install the counter maintenance hook on the shared session (once)."""
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+
+
+def get_kpis(client_id: int, day: Optional[date] = None) -> Dict[str, int]:
+    """Read a client's KPIs with one primary-key lookup on the counter tables."""
+    day = day or datetime.utcnow().date()
+    row = db.session.execute(
+        select(
+            ClientStats.jobs_scheduled,
+            ClientStats.automations_running,
+            ClientDailyStats.leads_created,
+            ClientDailyStats.jobs_created,
+        )
+        .outerjoin(
+            ClientDailyStats,
+            and_(ClientDailyStats.client_id == ClientStats.client_id, ClientDailyStats.day == day),
+        )
+        .where(ClientStats.client_id == client_id)
+    ).first()
+    if row is None:
+        return {"leads_today": 0, "jobs_today": 0, "jobs_scheduled": 0, "automations_running": 0}
+    return {
+        "leads_today": row.leads_created or 0,
+        "jobs_today": row.jobs_created or 0,
+        "jobs_scheduled": row.jobs_scheduled,
+        "automations_running": row.automations_running,
+    }
+
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite and a date elsewhere.
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _expected_counters() -> Tuple[Dict[int, dict], Dict[Tuple[int, date], dict]]:
+    totals: Dict[int, dict] = defaultdict(lambda: dict.fromkeys(TOTAL_FIELDS, 0))
+    daily: Dict[Tuple[int, date], dict] = defaultdict(lambda: dict.fromkeys(DAILY_FIELDS, 0))
+
+    for client_id, n in db.session.execute(
+        select(Lead.client_id, func.count()).group_by(Lead.client_id)
+    ):
+        totals[client_id]["leads_total"] = n
+    for client_id, n, scheduled in db.session.execute(
+        select(
+            Job.client_id,
+            func.count(),
+            func.sum(case((Job.status == "scheduled", 1), else_=0)),
+        ).group_by(Job.client_id)
+    ):
+        totals[client_id]["jobs_total"] = n
+        totals[client_id]["jobs_scheduled"] = scheduled or 0
+    for client_id, n in db.session.execute(
+        select(AutomationInstance.client_id, func.count())
+        .where(AutomationInstance.enabled.is_(True))
+        .group_by(AutomationInstance.client_id)
+    ):
+        totals[client_id]["automations_running"] = n
+
+    for model, field in ((Lead, "leads_created"), (Job, "jobs_created")):
+        day = func.date(model.created_at)
+        for client_id, value, n in db.session.execute(
+            select(model.client_id, day, func.count()).group_by(model.client_id, day)
+        ):
+            daily[(client_id, _as_date(value))][field] = n
+    return totals, daily
+
+
+def rebuild_counters(dry_run: bool = False) -> List[str]:
+    """Recompute all counters from the base tables and report any drift.
+
+    Returns one human-readable line per drifted counter.  Unless
+    ``dry_run`` is set, the counter tables are replaced in one transaction.
+    """
+    expected_totals, expected_daily = _expected_counters()
+    current_totals = {
+        row.client_id: {f: getattr(row, f) for f in TOTAL_FIELDS}
+        for row in ClientStats.query.all()
+    }
+    current_daily = {
+        (row.client_id, row.day): {f: getattr(row, f) for f in DAILY_FIELDS}
+        for row in ClientDailyStats.query.all()
+    }
+
+    drift: List[str] = []
+    zero_totals = dict.fromkeys(TOTAL_FIELDS, 0)
+    for client_id in sorted(set(expected_totals) | set(current_totals)):
+        want = expected_totals.get(client_id, zero_totals)
+        have = current_totals.get(client_id, zero_totals)
+        for field in TOTAL_FIELDS:
+            if want[field] != have[field]:
+                drift.append(f"client {client_id} {field}: stored {have[field]}, actual {want[field]}")
+    zero_daily = dict.fromkeys(DAILY_FIELDS, 0)
+    for key in sorted(set(expected_daily) | set(current_daily)):
+        want = expected_daily.get(key, zero_daily)
+        have = current_daily.get(key, zero_daily)
+        for field in DAILY_FIELDS:
+            if want[field] != have[field]:
+                drift.append(
+                    f"client {key[0]} {key[1].isoformat()} {field}: stored {have[field]}, actual {want[field]}"
+                )
+
+    if not dry_run:
+        db.session.execute(delete(ClientDailyStats))
+        db.session.execute(delete(ClientStats))
+        if expected_totals:
+            db.session.execute(
+                ClientStats.__table__.insert(),
+                [{"client_id": cid, **vals} for cid, vals in expected_totals.items()],
+            )
+        if expected_daily:
+            db.session.execute(
+                ClientDailyStats.__table__.insert(),
+                [{"client_id": cid, "day": d, **vals} for (cid, d), vals in expected_daily.items()],
+            )
+        db.session.commit()
+    return drift
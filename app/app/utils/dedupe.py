@@ -0,0 +1,342 @@
+"""
+Lead deduplication by contact key.
+
+Every lead stores a ``contact_key``: its email address, lowercased, or,
+for a lead without a usable email, its phone number in E.164 form
+(``+15551234567``).  ``(client_id, contact_key)`` is a unique index, so
+the lead for a person is found with one index probe:
+
+* Leads added through the ORM session are keyed by a ``before_flush``
+  hook; bulk inserts key their rows themselves.
+* The public form (:func:`capture_lead`), imports and the lead API (see
+  :func:`~.lead_import.insert_leads`) look the key up before inserting.
+  A repeat submission is merged into the existing lead
+  (:func:`merge_values`) instead of creating a second one.  It does not
+  enroll follow-ups or run lead capture again.
+* Leads stored before the key existed have a NULL key.
+  :func:`dedupe_leads` (``flask nexora dedupe-leads``) sets their keys and
+  merges the duplicates among them.  It never holds the lead table in
+  memory.  A first pass streams ``(client_id, key, id)`` into
+  hash-partitioned spill files of about ``DEDUPE_BUCKET_ROWS`` rows each.
+  A second pass groups one bucket at a time and merges each group into
+  its oldest lead.  Jobs move to the surviving lead; the duplicates'
+  follow-up states and rows are deleted; the KPI counters are adjusted.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models import FollowUpState, Job, Lead
+from .counters import apply_deltas
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_CHUNK = 500  # keys or ids per IN (...) list
+MERGE_COLUMNS = ("id", "client_id", "name", "email", "phone", "source", "status", "created_at", "updated_at")
+TEXT_COLUMNS = ("name", "phone", "source")  # also indexed for search (see search.py)
+KEY_COLUMNS = ("status", "contact_key", "updated_at")
+
+_EXTENSION_RE = re.compile(r"\s*(?:ext\.?|x|#)\s*\d+\s*$", re.IGNORECASE)
+_EMAIL_KEY_RE = re.compile(r"[^@\s]+@[^\s]+")
+
+
+def phone_country_code() -> str:
+    """Country calling code assumed for numbers without one (``DEFAULT_PHONE_COUNTRY_CODE``)."""
+    return str(current_app.config.get("DEFAULT_PHONE_COUNTRY_CODE", "1")).lstrip("+")
+
+
+def normalize_phone(value: Optional[str], country_code: Optional[str] = None) -> Optional[str]:
+    """Return a phone number in E.164 form, or None if it is not one.
+
+    Punctuation and a trailing extension are ignored.  Numbers without an
+    international prefix (``+`` or ``00``) get ``country_code`` after
+    dropping a national trunk ``0`` (``555-123-4567`` and
+    ``1 (555) 123-4567`` are both ``+15551234567`` with code 1).
+    """
+    if not value:
+        return None
+    text = _EXTENSION_RE.sub("", str(value).strip())
+    digits = re.sub(r"\D", "", text)
+    if text.startswith("+"):
+        number = digits
+    elif digits.startswith("00"):
+        number = digits[2:]
+    else:
+        country_code = country_code if country_code is not None else phone_country_code()
+        if len(digits) > 10 and digits.startswith(country_code):
+            number = digits
+        else:
+            number = country_code + (digits[1:] if digits.startswith("0") else digits)
+    if not 8 <= len(number) <= 15 or number.startswith("0"):
+        return None
+    return "+" + number
+
+
+def contact_key(
+    email: Optional[str], phone: Optional[str] = None, country_code: Optional[str] = None
+) -> Optional[str]:
+    """The deduplication key of a lead: lowercased email, else E.164 phone, else None."""
+    email = (email or "").strip().lower()
+    if _EMAIL_KEY_RE.fullmatch(email):
+        return email
+    return normalize_phone(phone, country_code)
+
+
+def merge_values(lead: dict, incoming: dict) -> dict:
+    """Changes to ``lead`` when ``incoming`` turns out to be the same person.
+
+    The existing lead wins: a repeat only fills in a missing phone or
+    source, and replaces a name that is just the email address (the
+    import fallback).
+    """
+    changes = {}
+    for field in ("phone", "source"):
+        if not lead.get(field) and incoming.get(field):
+            changes[field] = incoming[field]
+    name = incoming.get("name")
+    if name and name != incoming.get("email") and lead.get("name") in (None, "", lead.get("email")):
+        changes["name"] = name
+    return changes
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    for obj in session.new:
+        if isinstance(obj, Lead) and obj.contact_key is None:
+            obj.contact_key = contact_key(obj.email, obj.phone)
+
+
+def init_app(app) -> None:
+    """Install the contact-key hook on the shared session (once)."""
+    if not event.contains(db.session, "before_flush", _before_flush):
+        event.listen(db.session, "before_flush", _before_flush)
+
+
+def find_leads(client_id: int, keys: Iterable[Optional[str]]) -> Dict[str, dict]:
+    """Existing leads of a client by contact key (one index probe per key)."""
+    keys = sorted({key for key in keys if key})
+    columns = [getattr(Lead, name) for name in MERGE_COLUMNS] + [Lead.contact_key]
+    found: Dict[str, dict] = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[start : start + LOOKUP_CHUNK]
+        rows = db.session.execute(select(*columns).where(Lead.client_id == client_id, Lead.contact_key.in_(chunk)))
+        found.update((row.contact_key, row._asdict()) for row in rows)
+    return found
+
+
+def _find_lead(client_id: int, key: Optional[str]) -> Optional[Lead]:
+    if key is None:
+        return None
+    return db.session.scalar(select(Lead).where(Lead.client_id == client_id, Lead.contact_key == key))
+
+
+def capture_lead(client_id: int, values: dict) -> Tuple[Lead, bool]:
+    """Store a form submission, merging it into the client's lead for the same contact.
+
+    Commits.  Returns ``(lead, created)``; ``created`` is False when the
+    submission was merged into an existing lead.
+    """
+    key = contact_key(values.get("email"), values.get("phone"))
+    lead = _find_lead(client_id, key)
+    if lead is None:
+        lead = Lead(client_id=client_id, contact_key=key, **values)
+        db.session.add(lead)
+        try:
+            db.session.commit()
+            return lead, True
+        except IntegrityError:
+            # A concurrent submission for the same contact committed first.
+            db.session.rollback()
+            lead = _find_lead(client_id, key)
+            if lead is None:
+                raise
+    current = {name: getattr(lead, name) for name in MERGE_COLUMNS}
+    for field, value in merge_values(current, values).items():
+        setattr(lead, field, value)
+    lead.updated_at = datetime.utcnow()
+    db.session.commit()
+    return lead, False
+
+
+def _partition(paths: List[str], country_code: str, chunk_size: int, report: dict) -> List[int]:
+    """Stream every lead's key into its bucket file.  Returns ids whose stored key is stale."""
+    stale: List[int] = []
+    files = [open(path, "w", encoding="utf-8", newline="\n") for path in paths]
+    try:
+        stmt = select(Lead.id, Lead.client_id, Lead.email, Lead.phone, Lead.contact_key).order_by(Lead.id)
+        result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+        try:
+            for rows in result.partitions():
+                for lead_id, client_id, email, phone, stored in rows:
+                    report["leads"] += 1
+                    key = contact_key(email, phone, country_code)
+                    if stored is not None and stored != key:
+                        stale.append(lead_id)
+                    if key is None:
+                        continue
+                    group = f"{client_id}\t{key}"
+                    bucket = files[zlib.crc32(group.encode()) % len(files)]
+                    bucket.write(f"{group}\t{lead_id}\t{int(stored == key)}\n")
+        finally:
+            result.close()
+    finally:
+        for fh in files:
+            fh.close()
+    return stale
+
+
+def _read_bucket(path: str) -> Dict[Tuple[int, str], List[Tuple[int, bool]]]:
+    groups: Dict[Tuple[int, str], List[Tuple[int, bool]]] = defaultdict(list)
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            client_id, key, lead_id, keyed = line.rstrip("\n").split("\t")
+            groups[(int(client_id), key)].append((int(lead_id), keyed == "1"))
+    return groups
+
+
+def _merge_groups(groups: List[Tuple[str, List[int]]]) -> int:
+    """Merge each ``(key, lead ids)`` group into its oldest lead.  Returns leads removed."""
+    ids = [lead_id for _, members in groups for lead_id in members]
+    rows: Dict[int, dict] = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        stmt = select(*(getattr(Lead, name) for name in MERGE_COLUMNS)).where(
+            Lead.id.in_(ids[start : start + LOOKUP_CHUNK])
+        )
+        rows.update((row.id, row._asdict()) for row in db.session.execute(stmt))
+
+    now = datetime.utcnow()
+    rewritten, rekeyed, moves, removed, unenroll = [], [], [], [], []
+    totals = defaultdict(Counter)
+    daily = defaultdict(Counter)
+    for key, members in groups:
+        members = [rows[lead_id] for lead_id in sorted(members) if lead_id in rows]
+        if not members:
+            continue
+        survivor, others = dict(members[0]), members[1:]
+        for other in others:
+            survivor.update(merge_values(survivor, other))
+        # Setting the text columns re-indexes the row for search, so only
+        # survivors whose text changed get them in their UPDATE.
+        text_changed = any(survivor[c] != members[0][c] for c in TEXT_COLUMNS)
+        if survivor["status"] in (None, "new"):
+            # A duplicate that moved on (e.g. "scheduled") is the lead's real state.
+            later = sorted(others, key=lambda r: r["updated_at"] or r["created_at"] or now, reverse=True)
+            moved_on = [r["status"] for r in later if r["status"] not in (None, "new")]
+            survivor["status"] = moved_on[0] if moved_on else survivor["status"]
+        if survivor["status"] not in (None, "new"):
+            unenroll.append(survivor["id"])
+        survivor.update(lead_id=survivor["id"], contact_key=key, updated_at=now)
+        (rewritten if text_changed else rekeyed).append(survivor)
+        for other in others:
+            moves.append({"duplicate_id": other["id"], "survivor_id": survivor["id"]})
+            removed.append(other["id"])
+            totals[other["client_id"]]["leads_total"] -= 1
+            daily[(other["client_id"], (other["created_at"] or now).date())]["leads_created"] -= 1
+
+    job, lead = Job.__table__, Lead.__table__
+    if moves:
+        stmt = update(job).where(job.c.lead_id == bindparam("duplicate_id"))
+        db.session.execute(stmt.values(lead_id=bindparam("survivor_id")), moves)
+    doomed = removed + unenroll
+    for start in range(0, len(doomed), LOOKUP_CHUNK):
+        chunk = doomed[start : start + LOOKUP_CHUNK]
+        db.session.execute(delete(FollowUpState).where(FollowUpState.lead_id.in_(chunk)))
+    for start in range(0, len(removed), LOOKUP_CHUNK):
+        db.session.execute(delete(Lead).where(Lead.id.in_(removed[start : start + LOOKUP_CHUNK])))
+    # After the deletes: a duplicate may hold the key the survivor takes.
+    for columns, survivors in ((TEXT_COLUMNS + KEY_COLUMNS, rewritten), (KEY_COLUMNS, rekeyed)):
+        if survivors:
+            stmt = update(lead).where(lead.c.id == bindparam("lead_id"))
+            db.session.execute(stmt.values({c: bindparam(c) for c in columns}), survivors)
+    apply_deltas(db.session.connection(), totals, daily)
+    return len(removed)
+
+
+def _dedupe_bucket(path: str, dry_run: bool, chunk_size: int, report: dict) -> None:
+    unkeyed, duplicates = [], []
+    for (_, key), members in _read_bucket(path).items():
+        if len(members) > 1:
+            duplicates.append((key, [lead_id for lead_id, _ in members]))
+        elif not members[0][1]:
+            unkeyed.append({"lead_id": members[0][0], "key": key})
+    report["keyed"] += len(unkeyed)
+    report["groups"] += len(duplicates)
+    if dry_run:
+        report["merged"] += sum(len(members) - 1 for _, members in duplicates)
+        return
+    # Hash order is random order; id order writes neighbouring rows together.
+    unkeyed.sort(key=lambda row: row["lead_id"])
+    duplicates.sort(key=lambda group: min(group[1]))
+    lead = Lead.__table__
+    # Keying is bookkeeping, not an edit: updated_at stays as it was.
+    set_key = (
+        update(lead)
+        .where(lead.c.id == bindparam("lead_id"))
+        .values(contact_key=bindparam("key"), updated_at=lead.c.updated_at)
+    )
+    for start in range(0, len(unkeyed), chunk_size):
+        db.session.execute(set_key, unkeyed[start : start + chunk_size])
+        db.session.commit()
+
+    batch: List[Tuple[str, List[int]]] = []
+    size = 0
+    for index, group in enumerate(duplicates):
+        batch.append(group)
+        size += len(group[1])
+        if size < chunk_size and index < len(duplicates) - 1:
+            continue
+        try:
+            report["merged"] += _merge_groups(batch)
+            db.session.commit()
+        except IntegrityError:
+            # A lead with one of these keys was stored meanwhile; the next
+            # run merges these groups together with it.
+            db.session.rollback()
+            report["skipped"] += len(batch)
+            logger.warning("Skipped %s duplicate groups that changed during the dedupe run", len(batch))
+        batch, size = [], 0
+
+
+def dedupe_leads(
+    *, bucket_rows: Optional[int] = None, dry_run: bool = False, chunk_size: Optional[int] = None
+) -> Dict[str, int]:
+    """Key every lead and merge leads of a client that share a contact key.
+
+    Safe to re-run.  With ``dry_run`` only counts.  Returns ``leads``
+    (scanned), ``buckets``, ``keyed`` (keys set on leads without
+    duplicates), ``groups`` (sets of duplicates), ``merged`` (leads merged
+    away) and ``skipped`` (groups left for the next run).
+    """
+    config = current_app.config
+    bucket_rows = bucket_rows or config.get("DEDUPE_BUCKET_ROWS", 100_000)
+    chunk_size = chunk_size or config.get("DEDUPE_CHUNK_SIZE", 10000)
+    total = db.session.scalar(select(func.count(Lead.id))) or 0
+    buckets = max(1, -(-total // bucket_rows))
+    report = {"leads": 0, "buckets": buckets, "keyed": 0, "groups": 0, "merged": 0, "skipped": 0}
+    with tempfile.TemporaryDirectory(prefix="nexora-dedupe-", dir=config.get("DEDUPE_SPILL_DIR")) as spill:
+        paths = [os.path.join(spill, f"bucket-{n:05d}.tsv") for n in range(buckets)]
+        stale = _partition(paths, phone_country_code(), chunk_size, report)
+        db.session.commit()
+        if stale and not dry_run:
+            # Keys computed under other rules (or from since-edited emails)
+            # are cleared so they cannot collide with the new ones.
+            for start in range(0, len(stale), LOOKUP_CHUNK):
+                chunk = stale[start : start + LOOKUP_CHUNK]
+                db.session.execute(update(Lead).where(Lead.id.in_(chunk)).values(contact_key=None))
+            db.session.commit()
+        for path in paths:
+            _dedupe_bucket(path, dry_run, chunk_size, report)
+    logger.info("Lead dedupe: %s", report)
+    return report
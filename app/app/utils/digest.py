@@ -0,0 +1,171 @@
+"""
+Set-based daily digest engine.
+
+Rather than running several ``COUNT`` queries and a lazy load of
+``client.users`` per client, :func:`compute_digests` gathers the numbers
+for a whole batch of clients with a fixed number of grouped queries:
+
+* KPI counters from ``client_stats`` / ``client_daily_stats``;
+* automation runs and errors from ``log_entry`` grouped by client and type;
+* new leads grouped by client and source;
+* active recipients grouped by client.
+
+:func:`run_daily_digests` renders every digest of the batch and hands
+them to the outbox as a single bulk insert.  The query count per batch
+does not depend on how many clients are in it.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, func, select
+
+from .. import db
+from ..models import (
+    AutomationInstance,
+    Client,
+    ClientDailyStats,
+    ClientStats,
+    Lead,
+    LogEntry,
+    User,
+)
+from .log_sink import get_log_sink, log_unit
+from .outbox import enqueue_emails
+
+# Minutes of manual work an automation run is assumed to save.
+MINUTES_SAVED_PER_RUN = 5
+
+
+def compute_digests(client_ids: Iterable[int], day: Optional[date] = None) -> Dict[int, dict]:
+    """Return ``{client_id: metrics}`` for ``day`` (UTC, default today)."""
+    client_ids = list(client_ids)
+    if not client_ids:
+        return {}
+    day = day or datetime.utcnow().date()
+    start = datetime(day.year, day.month, day.day)
+    end = start + timedelta(days=1)
+
+    digests: Dict[int, dict] = {
+        cid: {
+            "client_name": None,
+            "leads_today": 0,
+            "jobs_today": 0,
+            "jobs_scheduled": 0,
+            "automations_running": 0,
+            "automation_runs": 0,
+            "errors": 0,
+            "leads_by_source": {},
+            "recipients": [],
+        }
+        for cid in client_ids
+    }
+
+    counters = db.session.execute(
+        select(
+            Client.id,
+            Client.name,
+            ClientStats.jobs_scheduled,
+            ClientStats.automations_running,
+            ClientDailyStats.leads_created,
+            ClientDailyStats.jobs_created,
+        )
+        .outerjoin(ClientStats, ClientStats.client_id == Client.id)
+        .outerjoin(
+            ClientDailyStats,
+            and_(ClientDailyStats.client_id == Client.id, ClientDailyStats.day == day),
+        )
+        .where(Client.id.in_(client_ids))
+    )
+    for cid, name, scheduled, running, leads, jobs in counters:
+        digest = digests[cid]
+        digest.update(
+            client_name=name,
+            jobs_scheduled=scheduled or 0,
+            automations_running=running or 0,
+            leads_today=leads or 0,
+            jobs_today=jobs or 0,
+        )
+
+    activity = db.session.execute(
+        select(LogEntry.client_id, LogEntry.entry_type, func.count())
+        .where(
+            LogEntry.client_id.in_(client_ids),
+            LogEntry.created_at >= start,
+            LogEntry.created_at < end,
+            LogEntry.automation_instance_id.isnot(None),
+        )
+        .group_by(LogEntry.client_id, LogEntry.entry_type)
+    )
+    for cid, entry_type, n in activity:
+        digests[cid]["automation_runs"] += n
+        if entry_type == "error":
+            digests[cid]["errors"] += n
+
+    sources = db.session.execute(
+        select(Lead.client_id, Lead.source, func.count())
+        .where(Lead.client_id.in_(client_ids), Lead.created_at >= start, Lead.created_at < end)
+        .group_by(Lead.client_id, Lead.source)
+    )
+    for cid, source, n in sources:
+        digests[cid]["leads_by_source"][source or "unknown"] = n
+
+    recipients = db.session.execute(
+        select(User.client_id, User.email)
+        .where(User.client_id.in_(client_ids), User.active.is_(True))
+        .order_by(User.client_id, User.id)
+    )
+    for cid, email in recipients:
+        digests[cid]["recipients"].append(email)
+    return digests
+
+
+def render_digest(metrics: dict) -> str:
+    """Render the plain-text body of one client's digest."""
+    sources = "".join(
+        f"  - {source}: {n}\n" for source, n in sorted(metrics["leads_by_source"].items())
+    ) or "  - none\n"
+    return (
+        f"Daily Digest:\n\nLeads Today: {metrics['leads_today']}\n"
+        f"Leads by Source:\n{sources}"
+        f"Jobs Created Today: {metrics['jobs_today']}\n"
+        f"Jobs Scheduled: {metrics['jobs_scheduled']}\n"
+        f"Automations Running: {metrics['automations_running']}\n"
+        f"Automation Runs Today: {metrics['automation_runs']}\n"
+        f"Errors Today: {metrics['errors']}\n"
+        f"Time Saved: {metrics['automation_runs'] * MINUTES_SAVED_PER_RUN} min (estimated)"
+    )
+
+
+def run_daily_digests(instance_ids: List[int], day: Optional[date] = None) -> int:
+    """Compute, render and queue the digests for a batch of daily digest instances.
+
+    Returns the number of digests queued.
+    """
+    instances = db.session.execute(
+        select(AutomationInstance.id, AutomationInstance.client_id).where(
+            AutomationInstance.id.in_(instance_ids), AutomationInstance.enabled.is_(True)
+        )
+    ).all()
+    digests = compute_digests({client_id for _, client_id in instances}, day)
+    sink = get_log_sink()
+    with log_unit():
+        messages = []
+        for instance_id, client_id in instances:
+            metrics = digests[client_id]
+            if not metrics["recipients"]:
+                sink.add(client_id, instance_id, "Daily digest skipped: no active recipients")
+                continue
+            messages.append(
+                {
+                    "client_id": client_id,
+                    "recipients": metrics["recipients"],
+                    "subject": "Daily Digest",
+                    "body": render_digest(metrics),
+                }
+            )
+            sink.add(client_id, instance_id, "Daily digest sent")
+        enqueue_emails(messages)
+    return len(messages)
@@ -0,0 +1,206 @@
+"""
+Streaming exports of a client's leads, jobs and logs.
+
+An export is a generator of byte chunks, so the web response and the CLI
+both write rows as the query produces them:
+
+* the rows are selected as plain column tuples (no ORM objects or
+  identity map) in ``(created_at, id)`` order, on the tenant's
+  ``(client_id, created_at)`` index;
+* the result is fetched ``EXPORT_CHUNK_SIZE`` rows at a time
+  (``yield_per``), and each chunk is encoded and handed out before the
+  next one is fetched;
+* the header row (CSV) is sent before the first fetch, so the first byte
+  goes out before the query finishes.
+
+Memory therefore stays at one chunk whatever the size of the history.
+Output is CSV or JSONL, optionally gzip-compressed, and can be limited to
+a ``created_at`` range and a status (``entry_type`` for logs).  Log
+exports start with the archived entries (see :mod:`.log_archive`), one
+segment at a time.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from flask import Response, abort, current_app, request, stream_with_context
+from sqlalchemy import select
+
+from .. import db
+from ..models import Job, Lead, LogEntry
+from .log_archive import iter_archived
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+class ExportSpec(NamedTuple):
+    model: type
+    columns: Tuple[str, ...]
+    status_column: str
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "leads": ExportSpec(
+        Lead, ("id", "name", "email", "phone", "source", "status", "created_at", "updated_at"), "status"
+    ),
+    "jobs": ExportSpec(
+        Job, ("id", "lead_id", "title", "status", "scheduled_time", "created_at", "updated_at"), "status"
+    ),
+    "logs": ExportSpec(
+        LogEntry, ("id", "automation_instance_id", "entry_type", "message", "created_at"), "entry_type"
+    ),
+}
+
+
+def parse_bound(value: Optional[str], *, end: bool = False) -> Optional[datetime]:
+    """Parse an ISO 8601 date or datetime bound.
+
+    A bare date as the ``end`` bound covers that whole day.  Raises
+    ValueError for malformed values.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value)
+    bound = datetime.combine(day, datetime.min.time())
+    return bound + timedelta(days=1) if end else bound
+
+
+def export_query(
+    kind: str,
+    client_id: int,
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+):
+    """Select the export columns of ``kind`` for one client.
+
+    ``start`` is inclusive and ``end`` exclusive.
+    """
+    spec = EXPORTS[kind]
+    model = spec.model
+    stmt = select(*(getattr(model, name) for name in spec.columns)).where(model.client_id == client_id)
+    if start is not None:
+        stmt = stmt.where(model.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(model.created_at < end)
+    if status:
+        stmt = stmt.where(getattr(model, spec.status_column) == status)
+    return stmt.order_by(model.created_at, model.id)
+
+
+def _value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_csv(columns: Tuple[str, ...], rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if v is None else _value(v) for v in row])
+    return buffer.getvalue()
+
+
+def _encode_jsonl(columns: Tuple[str, ...], rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, (_value(v) for v in row))), ensure_ascii=False) + "\n" for row in rows
+    )
+
+
+def stream_export(
+    kind: str,
+    client_id: int,
+    fmt: str = "csv",
+    *,
+    compress: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """Yield the export as byte chunks, one per fetched chunk of rows."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export {kind!r}; expected one of {', '.join(EXPORTS)}.")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+    columns = EXPORTS[kind].columns
+    stmt = export_query(kind, client_id, start=start, end=end, status=status)
+    chunk_size = chunk_size or current_app.config.get("EXPORT_CHUNK_SIZE", 1000)
+    encode = _encode_csv if fmt == "csv" else _encode_jsonl
+    # gzip container (wbits 16 + 15); each chunk is sync-flushed so the
+    # client can decompress what it has received so far.
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(text: str) -> bytes:
+        data = text.encode()
+        if compressor is None:
+            return data
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def chunks() -> Iterator[bytes]:
+        if fmt == "csv":
+            yield emit(_encode_csv(columns, [columns]))
+        if kind == "logs":
+            # Archived entries are older than the live ones (see log_archive).
+            archived = iter_archived(client_id, start, end, status)
+            while True:
+                rows = [tuple(getattr(e, name) for name in columns) for e in islice(archived, chunk_size)]
+                if not rows:
+                    break
+                yield emit(encode(columns, rows))
+        result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+        try:
+            for rows in result.partitions():
+                yield emit(encode(columns, rows))
+        finally:
+            result.close()
+        if compressor is not None:
+            yield compressor.flush()
+
+    return chunks()
+
+
+def export_filename(slug: str, kind: str, fmt: str, compress: bool = False) -> str:
+    stamp = datetime.utcnow().strftime("%Y%m%d")
+    return f"{slug}-{kind}-{stamp}.{fmt}" + (".gz" if compress else "")
+
+
+def export_response(kind: str, client) -> Response:
+    """Stream an export of ``client``'s rows, filtered by the request args.
+
+    Args: ``format`` (csv or jsonl), ``gzip`` (1 to compress), ``start``
+    and ``end`` (ISO dates or datetimes) and ``status``.
+    """
+    fmt = request.args.get("format", "csv")
+    compress = request.args.get("gzip", "").lower() in ("1", "true", "yes")
+    try:
+        chunks = stream_export(
+            kind,
+            client.id,
+            fmt,
+            compress=compress,
+            start=parse_bound(request.args.get("start")),
+            end=parse_bound(request.args.get("end"), end=True),
+            status=request.args.get("status") or None,
+        )
+    except ValueError as e:
+        abort(400, description=str(e))
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    if compress:
+        response.mimetype = "application/gzip"
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{export_filename(client.slug, kind, fmt, compress)}"'
+    )
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,178 @@
+"""
+Follow-up cadence state.
+
+Each lead with status ``new`` is enrolled in ``follow_up_state`` when it
+is inserted, with the time its first follow-up is due, if its client has
+the follow-up automation enabled (see :func:`follows_up`).  Enabling the
+automation enrolls the client's ``new`` leads that are not enrolled yet;
+disabling it leaves their rows in place until it is enabled again.  A follow-up run
+selects only rows whose ``next_due_at`` has passed (an index range on
+``(client_id, next_due_at)``). It sends the next step of the cadence and
+then either advances the row or deletes it once the cadence is finished.
+When a lead's status changes, its row is deleted by primary key in the
+same flush, which stops the sequence in O(1).
+
+The cadence is a list of day offsets from the lead's creation, taken from
+the instance config (``{"cadence_days": [3, 7, 14]}``) or the
+``FOLLOW_UP_CADENCE_DAYS`` setting.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, inspect, insert, select
+from sqlalchemy.orm import joinedload
+
+from .. import db
+from ..models import AutomationInstance, AutomationTemplate, FollowUpState, Lead
+from .automation_cache import enabled_automation
+
+DEFAULT_CADENCE_DAYS = [3, 7, 14]
+TEMPLATE_TYPE = "follow_up_sequence"
+
+
+def cadence_days(config: Optional[dict] = None) -> List[int]:
+    """Return the cadence for an automation instance config."""
+    if config and config.get("cadence_days"):
+        return sorted(int(d) for d in config["cadence_days"])
+    if has_app_context():
+        return list(current_app.config.get("FOLLOW_UP_CADENCE_DAYS", DEFAULT_CADENCE_DAYS))
+    return list(DEFAULT_CADENCE_DAYS)
+
+
+def follows_up(client_id: int) -> bool:
+    """Whether new leads of ``client_id`` are enrolled (the automation is enabled)."""
+    return enabled_automation(client_id, TEMPLATE_TYPE) is not None
+
+
+def enrollment_rows(leads: Iterable, cadence: Optional[List[int]] = None) -> List[dict]:
+    """Build ``follow_up_state`` rows for leads (objects or dicts with id/client_id/created_at)."""
+    cadence = cadence or cadence_days()
+    rows = []
+    for lead in leads:
+        get = lead.get if isinstance(lead, dict) else lambda k: getattr(lead, k)
+        created_at = get("created_at") or datetime.utcnow()
+        rows.append(
+            {
+                "lead_id": get("id"),
+                "client_id": get("client_id"),
+                "step": 0,
+                "next_due_at": created_at + timedelta(days=cadence[0]),
+            }
+        )
+    return rows
+
+
+def _status_changed(lead: Lead) -> bool:
+    hist = inspect(lead).attrs.status.history
+    return bool(hist.added) and hist.added[0] != "new"
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    stop = [obj.id for obj in session.deleted if isinstance(obj, Lead) and obj.id]
+    stop += [obj.id for obj in session.dirty if isinstance(obj, Lead) and obj.id and _status_changed(obj)]
+    if stop:
+        session.connection().execute(delete(FollowUpState).where(FollowUpState.lead_id.in_(stop)))
+
+
+def _unenrolled_rows(connection, client_id: int):
+    return connection.execute(
+        select(Lead.id, Lead.client_id, Lead.created_at)
+        .outerjoin(FollowUpState, FollowUpState.lead_id == Lead.id)
+        .where(Lead.client_id == client_id, Lead.status == "new", FollowUpState.lead_id.is_(None))
+    ).all()
+
+
+def _enabled_now(session, obj) -> bool:
+    if not isinstance(obj, AutomationInstance) or obj.enabled is False or obj.template.type != TEMPLATE_TYPE:
+        return False
+    if obj in session.new:
+        return True
+    added = inspect(obj).attrs.enabled.history.added
+    return bool(added) and added[0] is True
+
+
+def _after_flush(session, flush_context) -> None:
+    connection = session.connection()
+    new_leads = [obj for obj in session.new if isinstance(obj, Lead) and (obj.status or "new") == "new"]
+    enrolled = {client_id: follows_up(client_id) for client_id in {lead.client_id for lead in new_leads}}
+    new_leads = [lead for lead in new_leads if enrolled[lead.client_id]]
+    if new_leads:
+        connection.execute(insert(FollowUpState), enrollment_rows(new_leads))
+    for ai in [obj for obj in (*session.new, *session.dirty) if _enabled_now(session, obj)]:
+        rows = _unenrolled_rows(connection, ai.client_id)
+        if rows:
+            connection.execute(insert(FollowUpState), enrollment_rows([r._asdict() for r in rows], cadence_days(ai.config)))
+
+
+def init_app(app) -> None:
+    """Install the enrollment hooks on the shared session (once)."""
+    if not event.contains(db.session, "before_flush", _before_flush):
+        event.listen(db.session, "before_flush", _before_flush)
+    if not event.contains(db.session, "after_flush", _after_flush):
+        event.listen(db.session, "after_flush", _after_flush)
+
+
+def due_states(client_id: int, now: datetime, limit: int) -> List[FollowUpState]:
+    """Return up to ``limit`` due follow-up states for a client, oldest first."""
+    return (
+        FollowUpState.query.filter(
+            FollowUpState.client_id == client_id, FollowUpState.next_due_at <= now
+        )
+        .options(joinedload(FollowUpState.lead))
+        .order_by(FollowUpState.next_due_at, FollowUpState.lead_id)
+        .limit(limit)
+        .all()
+    )
+
+
+def advance(state: FollowUpState, cadence: List[int], now: datetime) -> bool:
+    """Record a sent follow-up; returns False (and deletes the row) when the cadence is done."""
+    state.step += 1
+    state.last_sent_at = now
+    if state.step >= len(cadence):
+        db.session.delete(state)
+        return False
+    due = state.lead.created_at + timedelta(days=cadence[state.step])
+    # Leads caught up after a backlog keep the spacing between steps
+    # instead of receiving several follow-ups on consecutive runs.
+    gap = timedelta(days=cadence[state.step] - cadence[state.step - 1])
+    state.next_due_at = max(due, now + gap)
+    return True
+
+
+def backfill(batch_size: int = 1000) -> int:
+    """Enroll existing ``new`` leads that have no follow-up state.  Returns rows added.
+
+    Only clients with the follow-up automation enabled are enrolled.
+    """
+    added = 0
+    last_id = 0
+    cadence = cadence_days()
+    enabled_clients = (
+        select(AutomationInstance.client_id)
+        .join(AutomationInstance.template)
+        .where(AutomationInstance.enabled.is_(True), AutomationTemplate.type == TEMPLATE_TYPE)
+    )
+    while True:
+        rows = db.session.execute(
+            select(Lead.id, Lead.client_id, Lead.created_at)
+            .outerjoin(FollowUpState, FollowUpState.lead_id == Lead.id)
+            .where(
+                Lead.status == "new",
+                FollowUpState.lead_id.is_(None),
+                Lead.id > last_id,
+                Lead.client_id.in_(enabled_clients),
+            )
+            .order_by(Lead.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return added
+        db.session.execute(insert(FollowUpState), enrollment_rows([r._asdict() for r in rows], cadence))
+        db.session.commit()
+        added += len(rows)
+        last_id = rows[-1].id
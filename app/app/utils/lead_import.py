@@ -0,0 +1,479 @@
+"""
+Streaming bulk lead import.
+
+Onboarding a client with years of history used to mean posting leads one
+at a time through the public form.  An import takes an uploaded CSV or
+JSONL file, stores it, and then:
+
+* reads it row by row (the file is never loaded into memory), validating
+  and normalizing each row;
+* inserts the valid rows in batches of ``IMPORT_BATCH_SIZE`` with one
+  ``executemany`` ``INSERT`` per batch;
+* commits each batch together with the import's progress
+  (``rows_processed``), so an interrupted import resumes from the first
+  uncommitted row.  Invalid rows are counted, and the first
+  ``IMPORT_MAX_ERRORS`` are kept with their row number.
+
+Bulk inserts bypass the ORM unit of work, so the batch applies the KPI
+counter deltas itself (:func:`~.counters.apply_deltas`).  It also
+enrolls follow-ups itself (:func:`~.follow_up.enrollment_rows`).  A row
+whose email already belongs to one of the client's leads (or to an
+earlier row) is merged into that lead and counted in ``rows_merged``
+(see :mod:`.dedupe`).
+
+Uploads from the admin console are queued (``pending``) and run by the
+:class:`ImportRunner` threads of the background worker, so the upload
+request returns at once and the uploader polls the import's progress.
+The CLI runs imports in the foreground.
+
+Only one process runs an import at a time: :func:`run_import` first
+claims it with a conditional ``UPDATE`` that succeeds only for a
+``pending`` or ``failed`` import, or a ``running`` one whose progress has
+not moved for ``IMPORT_CLAIM_TIMEOUT`` seconds (its runner died).
+Every committed batch bumps ``updated_at``, which serves as the
+heartbeat.
+
+Historical imports (``run_automations`` off, the default) create leads
+only: no follow-up enrollment and no lead-capture notification.  With
+``run_automations`` on, ``new`` leads are enrolled in the follow-up
+cadence.  Lead capture then runs once for the whole import, as a deferred
+batch after the last row, not once per row.
+
+Recognised columns / keys: ``name`` (or ``full_name``), ``email``
+(required), ``phone``, ``source``, ``status`` and ``created_at`` (ISO
+8601).  A missing name falls back to the email address.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, insert, or_, select, update
+
+from .. import db
+from ..models import FollowUpState, Lead, LeadImport
+from .automation_cache import enabled_automation
+from .automations import run_lead_capture_batch
+from .counters import apply_deltas
+from .dedupe import contact_key, find_leads, merge_values, phone_country_code
+from .follow_up import enrollment_rows, follows_up
+from .log_sink import log_unit
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+NAME_KEYS = ("name", "full_name", "full name")
+
+# (row number, raw row or None, parse error or None)
+RawRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+class ImportBusy(Exception):
+    """The import is completed or being run by another process."""
+
+
+def detect_format(filename: str) -> Optional[str]:
+    """Return ``"csv"`` or ``"jsonl"`` from a file name, or None."""
+    return FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def iter_rows(fh: IO[str], fmt: str) -> Iterator[RawRow]:
+    """Yield the data rows of an import file one at a time, numbered from 1."""
+    if fmt == "csv":
+        reader = csv.DictReader(fh)
+        reader.fieldnames = [(f or "").strip().lower() for f in reader.fieldnames or []]
+        for number, row in enumerate(reader, start=1):
+            yield number, row, None
+        return
+    number = 0
+    for line in fh:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "expected a JSON object"
+            continue
+        yield number, {str(k).strip().lower(): v for k, v in row.items()}, None
+
+
+def _text(row: dict, key: str, max_length: int) -> Optional[str]:
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    if len(value) > max_length:
+        raise ValueError(f"{key} is longer than {max_length} characters")
+    return value or None
+
+
+def _created_at(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"created_at is not an ISO 8601 date: {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def normalize_row(row: dict, default_source: str, now: datetime) -> dict:
+    """Validate one raw row and return the ``lead`` column values; raises ValueError."""
+    email = (_text(row, "email", 120) or "").lower()
+    if not email:
+        raise ValueError("email is required")
+    if not EMAIL_RE.match(email):
+        raise ValueError(f"invalid email: {email!r}")
+    name = next((_text(row, key, 120) for key in NAME_KEYS if row.get(key)), None) or email
+    return {
+        "name": name,
+        "email": email,
+        "phone": _text(row, "phone", 40),
+        "source": _text(row, "source", 120) or default_source,
+        "status": _text(row, "status", 40) or "new",
+        "created_at": _created_at(row.get("created_at")) or now,
+        "updated_at": now,
+    }
+
+
+def import_dir() -> str:
+    path = current_app.config.get("IMPORT_DIR") or os.path.join(current_app.instance_path, "imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def create_import(
+    client_id: int,
+    stream: IO[bytes],
+    filename: str,
+    *,
+    source: str = "import",
+    run_automations: bool = False,
+    claim: bool = False,
+) -> LeadImport:
+    """Store an uploaded file and record a pending import for it; raises ValueError.
+
+    With ``claim`` the import is recorded as ``running``, already claimed
+    by the caller (pass ``claimed=True`` to :func:`run_import`), so the
+    background runner does not pick it up first.
+    """
+    fmt = detect_format(filename)
+    if fmt is None:
+        raise ValueError("Unsupported file type; upload a .csv or .jsonl file.")
+    path = os.path.join(import_dir(), f"{uuid.uuid4().hex}.{fmt}")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out, 1024 * 1024)
+    lead_import = LeadImport(
+        client_id=client_id,
+        filename=os.path.basename(filename)[:255],
+        path=path,
+        format=fmt,
+        source=(source or "import")[:120],
+        run_automations=run_automations,
+        status="running" if claim else "pending",
+    )
+    db.session.add(lead_import)
+    db.session.commit()
+    return lead_import
+
+
+class InsertResult(NamedTuple):
+    ids: List[int]  # lead id per input row; empty unless ids were needed
+    created: List[bool]  # per input row: inserted (True) or merged (False)
+
+
+def insert_leads(
+    client_id: int, leads: List[dict], *, enroll_follow_ups: bool = True, return_ids: bool = True
+) -> InsertResult:
+    """Insert normalized leads with one executemany and do what the ORM hooks would.
+
+    A row with the contact key of an existing lead, or of an earlier row,
+    is merged into that lead instead (see :mod:`.dedupe`).  The existing
+    leads are found with one ``IN`` query on the contact-key index.
+    Applies the KPI counter deltas and, if ``enroll_follow_ups`` and the
+    client has the follow-up automation enabled, enrolls the inserted
+    ``new`` leads in the follow-up cadence, all in the current transaction.  ``ids`` is empty when neither ``return_ids``
+    nor ``enroll_follow_ups`` needs them.
+    """
+    country_code = phone_country_code()
+    for lead in leads:
+        lead["client_id"] = client_id
+        lead["contact_key"] = contact_key(lead["email"], lead.get("phone"), country_code)
+    existing = find_leads(client_id, (lead["contact_key"] for lead in leads))
+    seen: Dict[str, dict] = {}
+    new: List[dict] = []
+    merged: Dict[int, dict] = {}  # existing leads that absorbed rows, by id
+    targets: List[dict] = []  # the lead each row ends up in
+    for lead in leads:
+        key = lead["contact_key"]
+        target = existing.get(key) or seen.get(key)
+        if target is None:
+            if key:
+                seen[key] = lead
+            new.append(lead)
+            target = lead
+        else:
+            target.update(merge_values(target, lead))
+            if "id" in target:
+                merged[target["id"]] = target
+        targets.append(target)
+
+    if return_ids or enroll_follow_ups:
+        ids = db.session.scalars(insert(Lead).returning(Lead.id, sort_by_parameter_order=True), new).all()
+        for lead, lead_id in zip(new, ids):
+            lead["id"] = lead_id
+    elif new:
+        db.session.execute(insert(Lead), new)
+    if merged:
+        now = datetime.utcnow()
+        fields = ("id", "name", "phone", "source")
+        db.session.execute(update(Lead), [{**{f: row[f] for f in fields}, "updated_at": now} for row in merged.values()])
+    if enroll_follow_ups and follows_up(client_id):
+        enroll = [lead for lead in new if lead["status"] == "new"]
+        if enroll:
+            db.session.execute(insert(FollowUpState), enrollment_rows(enroll))
+    totals = defaultdict(Counter)
+    daily = defaultdict(Counter)
+    totals[client_id]["leads_total"] = len(new)
+    for lead in new:
+        daily[(client_id, lead["created_at"].date())]["leads_created"] += 1
+    apply_deltas(db.session.connection(), totals, daily)
+    return InsertResult(
+        [target["id"] for target in targets] if return_ids or enroll_follow_ups else [],
+        [target is lead for target, lead in zip(targets, leads)],
+    )
+
+
+def _batches(rows: Iterable[RawRow], size: int) -> Iterator[List[RawRow]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _import_batch(lead_import: LeadImport, batch: List[RawRow], errors: List[dict], max_errors: int) -> None:
+    now = datetime.utcnow()
+    leads = []
+    for number, row, error in batch:
+        if error is None:
+            try:
+                leads.append(normalize_row(row, lead_import.source, now))
+                continue
+            except ValueError as e:
+                error = str(e)
+        lead_import.rows_failed += 1
+        if len(errors) < max_errors:
+            errors.append({"row": number, "error": error})
+
+    created = 0
+    if leads:
+        created = sum(
+            insert_leads(
+                lead_import.client_id,
+                leads,
+                enroll_follow_ups=lead_import.run_automations,
+                return_ids=False,
+            ).created
+        )
+
+    lead_import.rows_processed += len(batch)
+    lead_import.rows_imported += created
+    lead_import.rows_merged += len(leads) - created
+    lead_import.errors = list(errors)
+
+
+def _claimable(now: datetime, claim_timeout: int, waiting=("pending", "failed")):
+    """Imports nobody is running: ``waiting``, or abandoned by a dead runner."""
+    return or_(
+        LeadImport.status.in_(waiting),
+        and_(LeadImport.status == "running", LeadImport.updated_at < now - timedelta(seconds=claim_timeout)),
+    )
+
+
+def _set_status(import_id: int, status: str, waiting=("pending", "failed")) -> bool:
+    now = datetime.utcnow()
+    claim_timeout = current_app.config.get("IMPORT_CLAIM_TIMEOUT", 300)
+    result = db.session.execute(
+        update(LeadImport)
+        .where(LeadImport.id == import_id, _claimable(now, claim_timeout, waiting))
+        .values(status=status, last_error=None, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return bool(result.rowcount)
+
+
+def claim_import(import_id: int) -> bool:
+    """Mark an import ``running`` for this process.  Returns False if it cannot be claimed."""
+    return _set_status(import_id, "running")
+
+
+def queue_import(import_id: int) -> bool:
+    """Hand a failed or abandoned import back to the background runner.
+
+    Returns False if it is completed, already queued or still running.
+    """
+    return _set_status(import_id, "pending", waiting=("failed",))
+
+
+def run_import(
+    lead_import: LeadImport,
+    batch_size: Optional[int] = None,
+    *,
+    claimed: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> LeadImport:
+    """Import (or resume importing) a stored file.  Returns the updated import.
+
+    Raises :class:`ImportBusy` if the import is completed or another
+    process is running it (unless ``claimed``, i.e. the caller already
+    holds it).  If ``stop`` is set between two batches, the import is put
+    back in the queue and returned as ``pending``.
+    """
+    if not claimed and not claim_import(lead_import.id):
+        raise ImportBusy(f"Import {lead_import.id} is {lead_import.status}.")
+    config = current_app.config
+    batch_size = batch_size or config.get("IMPORT_BATCH_SIZE", 1000)
+    max_errors = config.get("IMPORT_MAX_ERRORS", 100)
+    errors = list(lead_import.errors or [])
+    try:
+        with open(lead_import.path, newline="", encoding="utf-8-sig") as fh:
+            rows = islice(iter_rows(fh, lead_import.format), lead_import.rows_processed, None)
+            for batch in _batches(rows, batch_size):
+                _import_batch(lead_import, batch, errors, max_errors)
+                db.session.commit()
+                if stop is not None and stop.is_set():
+                    lead_import.status = "pending"
+                    db.session.commit()
+                    return lead_import
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Lead import %s failed after %s rows", lead_import.id, lead_import.rows_processed)
+        lead_import.status = "failed"
+        lead_import.last_error = f"{type(e).__name__}: {e}"
+        db.session.commit()
+        return lead_import
+
+    if lead_import.run_automations and lead_import.rows_imported:
+        ai = enabled_automation(lead_import.client_id, "lead_capture")
+        if ai:
+            with log_unit():
+                run_lead_capture_batch(ai, lead_import)
+    lead_import.status = "completed"
+    lead_import.finished_at = datetime.utcnow()
+    db.session.commit()
+    try:
+        os.remove(lead_import.path)
+    except OSError:
+        pass
+    return lead_import
+
+
+def run_next_import(stop: Optional[threading.Event] = None) -> Optional[LeadImport]:
+    """Claim and run the oldest queued (or abandoned) import.  Returns it, or None."""
+    now = datetime.utcnow()
+    claim_timeout = current_app.config.get("IMPORT_CLAIM_TIMEOUT", 300)
+    candidates = db.session.scalars(
+        select(LeadImport.id)
+        .where(_claimable(now, claim_timeout, waiting=("pending",)))
+        .order_by(LeadImport.id)
+        .limit(5)
+    ).all()
+    for import_id in candidates:
+        if _set_status(import_id, "running", waiting=("pending",)):
+            lead_import = db.session.get(LeadImport, import_id)
+            logger.info("Running lead import %s", import_id)
+            return run_import(lead_import, claimed=True, stop=stop)
+    return None
+
+
+class ImportRunner:
+    """A background thread that runs queued lead imports one at a time.
+
+    Follows the extension pattern of :class:`~.outbox.OutboxWorkerPool`:
+    instantiated once at import time, bound with :meth:`init_app` and
+    started with the other background work (see :mod:`app.worker`).  Any
+    number of processes may run one; the claim makes sure each import
+    runs in only one of them.  On :meth:`stop` the current import is
+    requeued after its current batch.
+    """
+
+    def __init__(self) -> None:
+        self.app = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.poll_interval = app.config.get("IMPORT_POLL_INTERVAL", 2.0)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lead-import-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            ran = None
+            try:
+                with self.app.app_context():
+                    ran = run_next_import(self._stop)
+            except Exception:
+                logger.exception("Lead import runner iteration failed")
+            # Keep going while there is work; otherwise poll.
+            if ran is None:
+                self._stop.wait(self.poll_interval)
+
+
+def import_status(lead_import: LeadImport) -> dict:
+    """JSON-able progress report of an import."""
+    return {
+        "id": lead_import.id,
+        "client_id": lead_import.client_id,
+        "filename": lead_import.filename,
+        "format": lead_import.format,
+        "source": lead_import.source,
+        "run_automations": lead_import.run_automations,
+        "status": lead_import.status,
+        "rows_processed": lead_import.rows_processed,
+        "rows_imported": lead_import.rows_imported,
+        "rows_merged": lead_import.rows_merged,
+        "rows_failed": lead_import.rows_failed,
+        "errors": lead_import.errors or [],
+        "last_error": lead_import.last_error,
+        "created_at": lead_import.created_at.isoformat() if lead_import.created_at else None,
+        "finished_at": lead_import.finished_at.isoformat() if lead_import.finished_at else None,
+    }
@@ -0,0 +1,190 @@
+"""
+Lease-based leader election for the background scheduler.
+
+Every process that creates the app (each Gunicorn worker, for example)
+starts the scheduler paused.  A :class:`SchedulerLeader` thread in each
+process competes for a single row in ``scheduler_lease``: the lease is
+taken or renewed with one conditional ``UPDATE`` that succeeds only if
+the caller already holds it or the current lease has expired.  The
+holder resumes its scheduler and reconciles the (database-backed) job
+store; every other process keeps its scheduler paused.
+
+The holder renews the lease every ``SCHEDULER_LEASE_HEARTBEAT`` seconds.
+If it dies, the lease expires after ``SCHEDULER_LEASE_TTL`` seconds and
+the next heartbeat of another process takes over.  A process that cannot
+renew before its own lease runs out pauses its scheduler, so two leaders
+never run jobs at the same time.  Lease times come from each process's
+clock, so hosts sharing a database must keep their clocks within a small
+fraction of the TTL.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "scheduler"
+
+
+def current_holder(name: str = LEASE_NAME) -> Optional[SchedulerLease]:
+    """Return the unexpired lease row for ``name``, if any."""
+    lease = db.session.get(SchedulerLease, name)
+    if lease is None or lease.expires_at < datetime.utcnow():
+        return None
+    return lease
+
+
+class SchedulerLeader:
+    """Keeps the scheduler running in exactly one process.
+
+    Follows the extension pattern used elsewhere in the app: instantiated
+    once at import time and bound with :meth:`init_app`.
+    """
+
+    def __init__(self, name: str = LEASE_NAME) -> None:
+        self.name = name
+        self.identity = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.app = None
+        self.scheduler = None
+        self._leading = False
+        self._valid_until = 0.0  # monotonic deadline of the lease we hold
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def init_app(self, app, scheduler) -> None:
+        self.app = app
+        self.scheduler = scheduler
+        self.ttl = app.config.get("SCHEDULER_LEASE_TTL", 15)
+        self.heartbeat = app.config.get("SCHEDULER_LEASE_HEARTBEAT", 5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading and time.monotonic() < self._valid_until
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease.  Returns True if this process holds it."""
+        now = datetime.utcnow()
+        renewed_at = time.monotonic()
+        expires_at = now + timedelta(seconds=self.ttl)
+        with self.app.app_context():
+            result = db.session.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.identity, SchedulerLease.expires_at < now),
+                )
+                .values(
+                    holder=self.identity,
+                    acquired_at=case(
+                        (SchedulerLease.holder == self.identity, SchedulerLease.acquired_at), else_=now
+                    ),
+                    heartbeat_at=now,
+                    expires_at=expires_at,
+                )
+            )
+            if result.rowcount == 0:
+                if db.session.get(SchedulerLease, self.name) is not None:
+                    db.session.rollback()
+                    return False
+                db.session.add(
+                    SchedulerLease(
+                        name=self.name,
+                        holder=self.identity,
+                        acquired_at=now,
+                        heartbeat_at=now,
+                        expires_at=expires_at,
+                    )
+                )
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another process inserted the row first.
+                db.session.rollback()
+                return False
+        self._valid_until = renewed_at + self.ttl
+        return True
+
+    def release(self) -> None:
+        """Give up the lease so another process can take over immediately."""
+        if not self._leading:
+            return
+        self._demote()
+        with self.app.app_context():
+            db.session.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.identity)
+                .values(expires_at=datetime.utcnow())
+            )
+            db.session.commit()
+
+    def start(self) -> None:
+        """Make a first attempt synchronously, then keep heartbeating in a thread."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        try:
+            self.release()
+        except Exception:
+            logger.exception("Failed to release scheduler lease")
+
+    def _beat(self) -> None:
+        try:
+            held = self.try_acquire()
+        except Exception:
+            logger.exception("Scheduler lease heartbeat failed")
+            # Keep leading on a transient error while our lease is still valid.
+            held = self.is_leader
+        try:
+            if held and not self._leading:
+                self._promote()
+            elif not held and self._leading:
+                self._demote()
+        except Exception:
+            logger.exception("Scheduler leadership change failed")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.heartbeat):
+            self._beat()
+
+    def _promote(self) -> None:
+        from .scheduler import schedule_jobs
+
+        with self.app.app_context():
+            schedule_jobs(self.scheduler)
+        self.scheduler.resume()
+        self._leading = True
+        logger.info("Scheduler leadership acquired by %s", self.identity)
+
+    def _demote(self) -> None:
+        self._leading = False
+        self.scheduler.pause()
+        logger.info("Scheduler leadership released by %s", self.identity)
@@ -0,0 +1,341 @@
+"""
+Log retention: rollups and compressed archive segments.
+
+Every automation run appends to ``log_entry``, so the table only grows.
+:func:`archive_logs` moves each client's entries older than
+``LOG_RETENTION_DAYS`` (whole UTC days) out of the table:
+
+* the day's entries are streamed into a gzip JSONL *segment* file under
+  ``LOG_ARCHIVE_DIR`` (``<client>/<yyyy>/<mm>/<yyyy-mm-dd>-<token>.jsonl.gz``),
+  which is fsynced before anything is deleted;
+* in one transaction, their per-type counts are added to
+  ``log_daily_stats``, the segment is recorded in ``log_archive_segment``
+  (the index: day, time and id range, per-type counts) and the rows are
+  removed from the search index and deleted.  If the number of deleted rows does not match the file, the
+  transaction is rolled back and the file removed.
+
+Entries that arrive for an already archived day are merged into a new
+segment file for that day on the next run.
+
+Reads go through :func:`log_page`, :func:`recent_logs` and
+:func:`log_count`, which combine the live table with the segments and
+rollups; archived rows are returned as :class:`ArchivedLogEntry` tuples
+with the same attributes the templates use.  Segments are only opened
+when a page reaches past the live rows.
+"""
+
+from __future__ import annotations
+
+import gzip
+import heapq
+import json
+import logging
+import os
+import uuid
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from .. import db
+from ..models import Client, LogArchiveSegment, LogDailyStats, LogEntry
+from .pagination import DEFAULT_PER_PAGE, MAX_PER_PAGE, decode_cursor, encode_cursor, keyset_page
+from .search import unindex_logs
+
+logger = logging.getLogger(__name__)
+
+
+class ArchivedLogEntry(NamedTuple):
+    id: int
+    client_id: int
+    automation_instance_id: Optional[int]
+    entry_type: str
+    message: str
+    created_at: datetime
+
+
+def archive_dir() -> str:
+    path = current_app.config.get("LOG_ARCHIVE_DIR") or os.path.join(current_app.instance_path, "log_archive")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def retention_cutoff(days: Optional[int] = None, now: Optional[datetime] = None) -> datetime:
+    """Start of the oldest UTC day that stays in ``log_entry``."""
+    days = current_app.config.get("LOG_RETENTION_DAYS", 30) if days is None else days
+    if days < 1:
+        raise ValueError("Log retention must be at least one day.")
+    today = (now or datetime.utcnow()).date()
+    return datetime.combine(today - timedelta(days=days), time.min)
+
+
+def _key(entry) -> tuple:
+    return entry.created_at, entry.id
+
+
+def read_segment(segment: LogArchiveSegment) -> Iterator[ArchivedLogEntry]:
+    """Yield a segment's entries, oldest first."""
+    with gzip.open(os.path.join(archive_dir(), segment.path), "rt", encoding="utf-8") as fh:
+        for line in fh:
+            row = json.loads(line)
+            yield ArchivedLogEntry(
+                id=row["id"],
+                client_id=segment.client_id,
+                automation_instance_id=row.get("automation_instance_id"),
+                entry_type=row["entry_type"],
+                message=row["message"],
+                created_at=datetime.fromisoformat(row["created_at"]),
+            )
+
+
+def _write_segment(path: str, entries: Iterable) -> Dict[str, Any]:
+    """Write ``entries`` (oldest first) to a gzip JSONL file and fsync it."""
+    stats: Dict[str, Any] = {
+        "entries": 0,
+        "type_counts": Counter(),
+        "first_at": None,
+        "last_at": None,
+        "min_id": None,
+        "max_id": None,
+    }
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            for entry in entries:
+                record = {
+                    "id": entry.id,
+                    "automation_instance_id": entry.automation_instance_id,
+                    "entry_type": entry.entry_type,
+                    "message": entry.message,
+                    "created_at": entry.created_at.isoformat(),
+                }
+                out.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+                stats["entries"] += 1
+                stats["type_counts"][entry.entry_type] += 1
+                stats["first_at"] = stats["first_at"] or entry.created_at
+                stats["last_at"] = entry.created_at
+                stats["min_id"] = entry.id if stats["min_id"] is None else min(stats["min_id"], entry.id)
+                stats["max_id"] = entry.id if stats["max_id"] is None else max(stats["max_id"], entry.id)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    stats["size_bytes"] = os.path.getsize(path)
+    return stats
+
+
+def archive_day(client_id: int, day: date) -> int:
+    """Move one client's log entries for ``day`` to its archive segment.
+
+    Returns the number of entries moved.
+    """
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    in_day = (LogEntry.client_id == client_id, LogEntry.created_at >= start, LogEntry.created_at < end)
+    new_max_id = db.session.scalar(select(func.max(LogEntry.id)).where(*in_day))
+    if new_max_id is None:
+        return 0
+    live = db.session.execute(
+        select(
+            LogEntry.id,
+            LogEntry.automation_instance_id,
+            LogEntry.entry_type,
+            LogEntry.message,
+            LogEntry.created_at,
+        )
+        .where(*in_day, LogEntry.id <= new_max_id)
+        .order_by(LogEntry.created_at, LogEntry.id)
+        .execution_options(yield_per=current_app.config.get("LOG_ARCHIVE_CHUNK_SIZE", 5000))
+    )
+    segment = db.session.scalar(
+        select(LogArchiveSegment).where(LogArchiveSegment.client_id == client_id, LogArchiveSegment.day == day)
+    )
+    previous = segment.path if segment else None
+    entries = heapq.merge(read_segment(segment), live, key=_key) if segment else live
+
+    relative = f"{client_id}/{day:%Y/%m}/{day.isoformat()}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+    path = os.path.join(archive_dir(), relative)
+    try:
+        stats = _write_segment(path, entries)
+    finally:
+        live.close()
+    moved = stats["entries"] - (segment.entries if segment else 0)
+    try:
+        unindex_logs(*in_day, LogEntry.id <= new_max_id)
+        deleted = db.session.execute(delete(LogEntry).where(*in_day, LogEntry.id <= new_max_id)).rowcount
+        if deleted != moved:
+            raise RuntimeError(
+                f"Archiving client {client_id} {day}: wrote {moved} entries but {deleted} rows matched; retrying later"
+            )
+        new_counts = Counter(stats["type_counts"])
+        if segment:
+            new_counts.subtract(segment.type_counts)
+        for entry_type, count in new_counts.items():
+            if count <= 0:
+                continue
+            rollup = db.session.get(LogDailyStats, (client_id, day, entry_type))
+            if rollup is None:
+                db.session.add(LogDailyStats(client_id=client_id, day=day, entry_type=entry_type, entries=count))
+            else:
+                rollup.entries += count
+        if segment is None:
+            segment = LogArchiveSegment(client_id=client_id, day=day)
+            db.session.add(segment)
+        segment.path = relative
+        segment.entries = stats["entries"]
+        segment.type_counts = dict(stats["type_counts"])
+        segment.first_at, segment.last_at = stats["first_at"], stats["last_at"]
+        segment.min_id, segment.max_id = stats["min_id"], stats["max_id"]
+        segment.size_bytes = stats["size_bytes"]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    if previous:
+        try:
+            os.remove(os.path.join(archive_dir(), previous))
+        except OSError:
+            logger.warning("Could not remove replaced log segment %s", previous)
+    return moved
+
+
+def _next_day(client_id: int, after: Optional[datetime], cutoff: datetime) -> Optional[date]:
+    """The next day with live entries older than ``cutoff`` (one index seek)."""
+    query = select(func.min(LogEntry.created_at)).where(LogEntry.client_id == client_id, LogEntry.created_at < cutoff)
+    if after is not None:
+        query = query.where(LogEntry.created_at >= after)
+    oldest = db.session.scalar(query)
+    return oldest.date() if oldest else None
+
+
+def archive_logs(days: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Archive every client's log entries older than the retention window.
+
+    Each client-day is archived and committed on its own; a failing day is
+    logged and left in place for the next run.  Returns counters for the
+    run (``dry_run`` only counts the entries that would move).
+    """
+    cutoff = retention_cutoff(days)
+    report = {"segments": 0, "entries": 0, "failed": 0}
+    for client_id in db.session.scalars(select(Client.id).order_by(Client.id)).all():
+        if dry_run:
+            report["entries"] += db.session.scalar(
+                select(func.count(LogEntry.id)).where(LogEntry.client_id == client_id, LogEntry.created_at < cutoff)
+            )
+            continue
+        day = _next_day(client_id, None, cutoff)
+        while day is not None:
+            try:
+                report["entries"] += archive_day(client_id, day)
+                report["segments"] += 1
+            except Exception:
+                logger.exception("Failed to archive logs of client %s for %s", client_id, day)
+                report["failed"] += 1
+            day = _next_day(client_id, datetime.combine(day + timedelta(days=1), time.min), cutoff)
+    return report
+
+
+def _archived_desc(
+    client_id: int,
+    before: Optional[tuple],
+    entry_type: Optional[str],
+    limit: int,
+    newer_than: Optional[datetime] = None,
+) -> List[ArchivedLogEntry]:
+    """Up to ``limit`` archived entries, newest first, older than ``before``."""
+    query = select(LogArchiveSegment).where(LogArchiveSegment.client_id == client_id)
+    if before is not None:
+        query = query.where(LogArchiveSegment.first_at <= before[0])
+    if newer_than is not None:
+        query = query.where(LogArchiveSegment.last_at >= newer_than)
+    found: List[ArchivedLogEntry] = []
+    for segment in db.session.scalars(query.order_by(LogArchiveSegment.day.desc())):
+        if entry_type and not segment.type_counts.get(entry_type):
+            continue
+        for entry in reversed(list(read_segment(segment))):
+            if (entry_type and entry.entry_type != entry_type) or (before is not None and _key(entry) >= before):
+                continue
+            found.append(entry)
+            if len(found) >= limit:
+                return found
+    return found
+
+
+def log_page(
+    client_id: int,
+    cursor: Optional[str] = None,
+    per_page: int = DEFAULT_PER_PAGE,
+    entry_type: Optional[str] = None,
+) -> Dict[str, Any]:
+    """One page of a client's log entries, newest first, live and archived.
+
+    Same result shape and cursors as :func:`~.pagination.keyset_page`.
+    """
+    per_page = max(min(per_page, MAX_PER_PAGE), 1)
+    query = LogEntry.query.filter_by(client_id=client_id)
+    if entry_type:
+        query = query.filter(LogEntry.entry_type == entry_type)
+    page = keyset_page(query, LogEntry, cursor, per_page)
+    items = page["items"]
+    # A full live page only needs segments that reach past its oldest row,
+    # which normally means none.
+    newer_than = items[-1].created_at if page["next_cursor"] else None
+    archived = _archived_desc(client_id, decode_cursor(cursor), entry_type, per_page + 1, newer_than)
+    if not archived:
+        return page
+    merged = sorted(list(items) + archived, key=_key, reverse=True)
+    has_next = page["next_cursor"] is not None or len(merged) > per_page
+    items = merged[:per_page]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1].created_at, items[-1].id) if has_next else None,
+        "per_page": per_page,
+        "is_first": page["is_first"],
+    }
+
+
+def recent_logs(client_id: int, limit: int = 10) -> List[Any]:
+    """The client's ``limit`` newest log entries, live or archived."""
+    return log_page(client_id, per_page=limit)["items"]
+
+
+def log_count(entry_type: Optional[str] = None, client_id: Optional[int] = None) -> int:
+    """Count log entries over the full history: live rows plus rollups."""
+    live = select(func.count(LogEntry.id))
+    archived = select(func.coalesce(func.sum(LogDailyStats.entries), 0))
+    if entry_type:
+        live = live.where(LogEntry.entry_type == entry_type)
+        archived = archived.where(LogDailyStats.entry_type == entry_type)
+    if client_id is not None:
+        live = live.where(LogEntry.client_id == client_id)
+        archived = archived.where(LogDailyStats.client_id == client_id)
+    return db.session.scalar(live) + db.session.scalar(archived)
+
+
+def iter_archived(
+    client_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    entry_type: Optional[str] = None,
+) -> Iterator[ArchivedLogEntry]:
+    """Yield a client's archived entries in ``[start, end)``, oldest first."""
+    query = select(LogArchiveSegment).where(LogArchiveSegment.client_id == client_id)
+    if start is not None:
+        query = query.where(LogArchiveSegment.last_at >= start)
+    if end is not None:
+        query = query.where(LogArchiveSegment.first_at < end)
+    segments = db.session.scalars(query.order_by(LogArchiveSegment.day)).all()
+    for segment in segments:
+        if entry_type and not segment.type_counts.get(entry_type):
+            continue
+        for entry in read_segment(segment):
+            if start is not None and entry.created_at < start:
+                continue
+            if end is not None and entry.created_at >= end:
+                continue
+            if entry_type and entry.entry_type != entry_type:
+                continue
+            yield entry
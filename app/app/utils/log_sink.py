@@ -0,0 +1,172 @@
+"""
+Buffered sink for automation log entries.
+
+Writing one ``LogEntry`` per commit made every log line an fsync on
+SQLite, so a follow-up run over thousands of stale leads committed
+thousands of times.  The sink collects rows for the current unit of work
+(one per application context, i.e. per request or per scheduled job) and
+writes them with a single bulk ``INSERT``.
+
+When the buffer reaches ``LOG_SINK_MAX_ROWS`` rows or ``LOG_SINK_MAX_AGE``
+seconds the rows are inserted into the current transaction, but not
+committed: the commit belongs to whoever owns the unit of work.  A
+:func:`log_unit` block and the application context teardown flush, which
+inserts what is left and commits, also on error paths.  Rows inserted
+into a transaction that is rolled back go back into the buffer, so log
+lines survive a failed unit of work without committing its other
+changes.
+
+A flush commits the session, which also makes any outbox rows queued
+alongside the log lines visible to the delivery workers.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, insert
+
+from .. import db
+from ..models import LogEntry
+
+logger = logging.getLogger(__name__)
+
+
+class LogSink:
+    """Collects ``LogEntry`` rows and writes them in bulk."""
+
+    def __init__(self, max_rows: int = 500, max_age: float = 5.0) -> None:
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.rows: List[Dict[str, Any]] = []
+        self.written: List[Dict[str, Any]] = []  # inserted, not yet committed
+        self.commits = 0
+        self._first_added: Optional[float] = None
+
+    def add(
+        self,
+        client_id: int,
+        automation_instance_id: Optional[int],
+        message: str,
+        entry_type: str = "info",
+    ) -> None:
+        if not self.rows:
+            self._first_added = time.monotonic()
+        self.rows.append(
+            {
+                "client_id": client_id,
+                "automation_instance_id": automation_instance_id,
+                "entry_type": entry_type,
+                "message": message,
+                "created_at": datetime.utcnow(),
+            }
+        )
+        if len(self.rows) >= self.max_rows or time.monotonic() - self._first_added >= self.max_age:
+            self.write()
+
+    def write(self) -> int:
+        """Bulk insert the buffered rows into the current transaction.  Returns the number written."""
+        if not self.rows:
+            return 0
+        rows, self.rows = self.rows, []
+        self._first_added = None
+        db.session.execute(insert(LogEntry), rows)
+        self.written.extend(rows)
+        return len(rows)
+
+    def flush(self) -> int:
+        """Write the buffered rows and commit.  Returns the number of rows committed."""
+        if not self.rows and not self.written:
+            return 0
+        count = len(self.written) + self.write()
+        db.session.commit()
+        self.commits += 1
+        return count
+
+    def committed(self) -> None:
+        self.written = []
+
+    def rolled_back(self) -> None:
+        # The rows were discarded with the transaction; buffer them again.
+        if self.written:
+            if not self.rows:
+                self._first_added = time.monotonic()
+            self.rows[:0], self.written = self.written, []
+
+
+def get_log_sink() -> LogSink:
+    """Return the sink for the current application context, creating it on demand."""
+    sink = g.get("_log_sink")
+    if sink is None:
+        sink = LogSink(
+            max_rows=current_app.config.get("LOG_SINK_MAX_ROWS", 500),
+            max_age=current_app.config.get("LOG_SINK_MAX_AGE", 5.0),
+        )
+        g._log_sink = sink
+    return sink
+
+
+def flush_logs(exc: Optional[BaseException] = None) -> int:
+    """Flush the current context's sink.
+
+    When ``exc`` is given the unit of work failed: its uncommitted changes
+    are rolled back first so that only the buffered log lines are written.
+    """
+    if not has_app_context():
+        return 0
+    sink = g.get("_log_sink")
+    if sink is None or not (sink.rows or sink.written):
+        return 0
+    if exc is not None:
+        db.session.rollback()
+    try:
+        return sink.flush()
+    except Exception:
+        logger.exception("Failed to flush %d buffered log entries", len(sink.rows))
+        db.session.rollback()
+        return 0
+
+
+@contextmanager
+def log_unit() -> Iterator[LogSink]:
+    """Scope a unit of work; buffered logs are flushed on exit, even on error."""
+    sink = get_log_sink()
+    try:
+        yield sink
+    except BaseException as exc:
+        flush_logs(exc)
+        raise
+    else:
+        flush_logs()
+
+
+def _current_sink() -> Optional[LogSink]:
+    return g.get("_log_sink") if has_app_context() else None
+
+
+def _after_commit(session) -> None:
+    sink = _current_sink()
+    if sink is not None:
+        sink.committed()
+
+
+def _after_rollback(session) -> None:
+    sink = _current_sink()
+    if sink is not None:
+        sink.rolled_back()
+
+
+def init_app(app) -> None:
+    """Flush any buffered log entries when a request or job context ends."""
+    for name, fn in (("after_commit", _after_commit), ("after_rollback", _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
+
+    @app.teardown_appcontext
+    def _flush_log_sink(exc: Optional[BaseException]) -> None:
+        flush_logs(exc)
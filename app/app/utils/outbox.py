@@ -0,0 +1,233 @@
+"""
+Durable email outbox for Nexora.
+
+Automations no longer call :func:`send_email` inside the HTTP request.
+Instead they enqueue an ``EmailOutbox`` row as part of their own
+transaction and return immediately.  A pool of background worker
+threads claims pending rows in batches, hands them to the transport in
+``app/utils/email.py`` and records the enqueue-to-delivery latency of
+every message.  Failed deliveries are retried with a linear backoff
+until ``OUTBOX_MAX_ATTEMPTS`` is reached.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, insert, or_, select, update
+
+from .. import db
+from ..models import EmailOutbox
+from .email import send_email
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(
+    to: List[str] | str, subject: str, body: str, client_id: Optional[int] = None
+) -> Optional[EmailOutbox]:
+    """Queue an email for background delivery.
+
+    The row is added to the current session but not committed; it becomes
+    visible to the workers when the caller's unit of work commits.  Returns
+    ``None`` when there are no recipients.
+    """
+    recipients = to if isinstance(to, list) else [to]
+    recipients = [r for r in recipients if r]
+    if not recipients:
+        return None
+    message = EmailOutbox(
+        client_id=client_id,
+        recipients=recipients,
+        subject=subject,
+        body=body,
+        status="pending",
+        attempts=0,
+    )
+    db.session.add(message)
+    return message
+
+
+def enqueue_emails(messages: List[dict]) -> int:
+    """Queue many emails with one bulk insert.
+
+    Each message is a dict with ``recipients``, ``subject``, ``body`` and
+    optionally ``client_id``.  Like :func:`enqueue_email`, nothing is
+    committed.  Returns the number of messages queued.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "client_id": m.get("client_id"),
+            "recipients": m["recipients"],
+            "subject": m["subject"],
+            "body": m["body"],
+            "status": "pending",
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+        }
+        for m in messages
+        if m.get("recipients")
+    ]
+    if rows:
+        db.session.execute(insert(EmailOutbox), rows)
+    return len(rows)
+
+
+def _claimable(now: datetime, claim_timeout: int):
+    """Rows that are due, or were claimed by a worker that never finished."""
+    return or_(
+        and_(EmailOutbox.status == "pending", EmailOutbox.available_at <= now),
+        and_(
+            EmailOutbox.status == "sending",
+            EmailOutbox.claimed_at < now - timedelta(seconds=claim_timeout),
+        ),
+    )
+
+
+def claim_batch(batch_size: int, claim_timeout: int = 300) -> List[EmailOutbox]:
+    """Atomically claim up to ``batch_size`` due messages for this worker.
+
+    The claim is a single ``UPDATE`` tagged with a random token, so
+    concurrent workers (threads or processes) never deliver the same row.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due_ids = (
+        select(EmailOutbox.id)
+        .where(_claimable(now, claim_timeout))
+        .order_by(EmailOutbox.id)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due_ids), _claimable(now, claim_timeout))
+        .values(status="sending", claim_token=token, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if not result.rowcount:
+        return []
+    return EmailOutbox.query.filter_by(claim_token=token).order_by(EmailOutbox.id).all()
+
+
+def deliver_batch(messages: List[EmailOutbox], max_attempts: int = 5, retry_backoff: int = 30) -> int:
+    """Send each claimed message and record the outcome.  Returns the number delivered."""
+    delivered = 0
+    latencies = []
+    for message in messages:
+        try:
+            send_email(message.recipients, message.subject, message.body)
+        except Exception as exc:  # transport errors must not kill the worker
+            message.attempts = (message.attempts or 0) + 1
+            message.last_error = str(exc)
+            message.claim_token = None
+            if message.attempts >= max_attempts:
+                message.status = "failed"
+                logger.error("Outbox message %s failed permanently: %s", message.id, exc)
+            else:
+                message.status = "pending"
+                message.available_at = datetime.utcnow() + timedelta(seconds=retry_backoff * message.attempts)
+            continue
+        now = datetime.utcnow()
+        message.status = "sent"
+        message.attempts = (message.attempts or 0) + 1
+        message.claim_token = None
+        message.delivered_at = now
+        message.latency_ms = int((now - message.created_at).total_seconds() * 1000)
+        latencies.append(message.latency_ms)
+        delivered += 1
+    db.session.commit()
+    if messages:
+        logger.info(
+            "Outbox delivered %d/%d message(s), avg latency %.0f ms",
+            delivered,
+            len(messages),
+            sum(latencies) / len(latencies) if latencies else 0,
+        )
+    return delivered
+
+
+def drain_outbox(batch_size: int = 50, max_batches: Optional[int] = None, **options) -> int:
+    """Synchronously deliver queued messages until the queue is empty.
+
+    Useful for tests and one-off CLI runs where no worker pool is running.
+    """
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        messages = claim_batch(batch_size, options.get("claim_timeout", 300))
+        if not messages:
+            break
+        total += deliver_batch(
+            messages, options.get("max_attempts", 5), options.get("retry_backoff", 30)
+        )
+        batches += 1
+    return total
+
+
+class OutboxWorkerPool:
+    """A fixed-size pool of threads that drain the email outbox.
+
+    Mirrors the extension pattern used elsewhere in the app: the pool is
+    instantiated once at import time and bound to an application with
+    :meth:`init_app`.  Concurrency, batch size and polling interval are
+    read from ``OUTBOX_*`` configuration values.
+    """
+
+    def __init__(self) -> None:
+        self.app = None
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+
+    def init_app(self, app) -> None:
+        self.app = app
+        self.workers = app.config.get("OUTBOX_WORKERS", 2)
+        self.batch_size = app.config.get("OUTBOX_BATCH_SIZE", 50)
+        self.poll_interval = app.config.get("OUTBOX_POLL_INTERVAL", 1.0)
+        self.max_attempts = app.config.get("OUTBOX_MAX_ATTEMPTS", 5)
+        self.retry_backoff = app.config.get("OUTBOX_RETRY_BACKOFF", 30)
+        self.claim_timeout = app.config.get("OUTBOX_CLAIM_TIMEOUT", 300)
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self) -> None:
+        if self.running or not self.workers:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"outbox-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("Started %d outbox worker(s)", self.workers)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    messages = claim_batch(self.batch_size, self.claim_timeout)
+                    claimed = len(messages)
+                    if messages:
+                        deliver_batch(messages, self.max_attempts, self.retry_backoff)
+            except Exception:
+                logger.exception("Outbox worker iteration failed")
+            # Keep draining while batches come back full; otherwise poll.
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
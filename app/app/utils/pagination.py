@@ -0,0 +1,79 @@
+"""
+Keyset (cursor) pagination helpers.
+
+List views order rows by ``(created_at, id)`` descending and continue
+from the last row of the previous page, rather than using ``OFFSET`` or
+loading the whole tenant history.  The position is carried in the URL
+as an opaque, URL-safe cursor token, so a given link always returns the
+same page.  Because every page is an index range scan, fetching page N
+costs the same as fetching page 1.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from flask import request, url_for
+from sqlalchemy import or_
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Decode a cursor token; malformed tokens are treated as "first page"."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def keyset_page(query, model, cursor: Optional[str] = None, per_page: int = DEFAULT_PER_PAGE) -> Dict[str, Any]:
+    """Return one page of ``query`` ordered newest first.
+
+    ``model`` must have ``created_at`` and ``id`` columns.  The result has
+    ``items``, ``next_cursor`` (``None`` on the last page) and ``per_page``.
+    """
+    per_page = max(min(per_page, MAX_PER_PAGE), 1)
+    position = decode_cursor(cursor)
+    if position:
+        created_at, row_id = position
+        # The redundant ``created_at <=`` bound lets the database turn the
+        # predicate into an index range instead of filtering every newer row.
+        query = query.filter(
+            model.created_at <= created_at,
+            or_(model.created_at < created_at, model.id < row_id),
+        )
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1].created_at, rows[-1].id) if has_next else None,
+        "per_page": per_page,
+        "is_first": position is None,
+    }
+
+
+def page_url(param: str = "cursor", cursor: Optional[str] = None) -> str:
+    """URL of the current view with ``param`` set to ``cursor`` (other args kept)."""
+    args = request.args.to_dict()
+    if cursor:
+        args[param] = cursor
+    else:
+        args.pop(param, None)
+    # A query arg named like a view arg (``?client_id=`` on
+    # ``/clients/<client_id>``) must not override the route.
+    return url_for(request.endpoint, **{**args, **(request.view_args or {})})
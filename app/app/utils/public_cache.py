@@ -0,0 +1,81 @@
+"""
+Hot-path caches for the public lead form.
+
+``/lead/<slug>`` is the busiest anonymous page.  Serving it used to
+mean a client lookup by slug and a full template render on every GET.
+Two caches now cover it:
+
+* :func:`client_snapshot` maps a slug to a small, immutable
+  :data:`ClientSnapshot` (id, slug, name).  Unknown slugs are cached as
+  ``None``, so junk traffic does not reach the database either.
+* :func:`form_page` keeps the rendered page for an anonymous visitor,
+  split around the CSRF token.  Each request only joins the two halves
+  around its own token.
+
+Both live in one :class:`~.versioned_cache.VersionedCache` on the
+``client_cache_version`` row.  Creating, editing or deleting a client
+drops every entry in every process within
+``PUBLIC_FORM_CACHE_CHECK_INTERVAL`` seconds, and entries expire after
+``PUBLIC_FORM_CACHE_TTL`` seconds regardless.
+
+The cached page is only valid for what it was rendered for: a GET by an
+anonymous visitor with no flashed messages.  The view renders normally
+in every other case (POST, validation errors, flashes, logged-in users).
+"""
+
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Callable, Optional
+
+from flask import current_app, session
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import select
+
+from .. import db
+from ..models import Client
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = "client_cache_version"
+
+# What the public form needs from a client; safe to share across requests.
+ClientSnapshot = namedtuple("ClientSnapshot", ["id", "slug", "name"])
+
+public_form_cache = VersionedCache("public_form", VERSION_KEY, (Client,), config_prefix="PUBLIC_FORM_CACHE")
+
+
+def _load_client(slug: str) -> Optional[ClientSnapshot]:
+    row = db.session.execute(select(Client.id, Client.slug, Client.name).where(Client.slug == slug)).first()
+    return ClientSnapshot(*row) if row else None
+
+
+def client_snapshot(slug: str) -> Optional[ClientSnapshot]:
+    """Return the client with this slug, or None if there is none."""
+    return public_form_cache.get(("client", slug), lambda: _load_client(slug))
+
+
+def can_use_cached_page() -> bool:
+    """True if the current request would render the same page as any anonymous GET."""
+    return "_user_id" not in session and not session.get("_flashes")
+
+
+def form_page(slug: str, render: Callable[[], str]) -> str:
+    """Return the anonymous lead form page for ``slug`` with this request's CSRF token.
+
+    ``render`` renders the page for the current request; it is only
+    called on a cache miss.
+    """
+    token = generate_csrf() if current_app.config.get("WTF_CSRF_ENABLED", True) else ""
+
+    def _render_shell():
+        page = render()
+        if not token:
+            return (page,)
+        parts = page.split(token)
+        # A page without exactly one token cannot be reused safely.
+        return tuple(parts) if len(parts) == 2 else None
+
+    shell = public_form_cache.get(("page", slug), _render_shell)
+    if shell is None:
+        return render()
+    return token.join(shell)
@@ -0,0 +1,105 @@
+"""
+Query-plan regression checks for tenant-scoped hot queries.
+
+Every hot query filters by ``client_id`` and then by ``created_at`` or
+``status``.  :data:`HOT_QUERIES` lists representative statements for each
+of them; :func:`check_query_plans` runs ``EXPLAIN QUERY PLAN`` on SQLite
+and reports any query that falls back to a full table scan or to a
+temporary B-tree for sorting.  ``tests/test_query_plans.py`` runs it in the
+test suite; ``flask nexora check-query-plans`` runs it against a live
+database and exits non-zero on a regression.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func, or_, select
+
+from .. import db
+from ..models import AutomationInstance, AutomationTemplate, Job, Lead, LogEntry
+
+HOT_TABLES = ("lead", "job", "log_entry", "automation_instance")
+
+
+def _hot_queries() -> Dict[str, object]:
+    now = datetime.utcnow()
+    cursor_at = now - timedelta(hours=1)
+    return {
+        "leads list": select(Lead)
+        .where(Lead.client_id == 1)
+        .order_by(Lead.created_at.desc(), Lead.id.desc())
+        .limit(51),
+        "leads list (cursor)": select(Lead)
+        .where(
+            Lead.client_id == 1,
+            Lead.created_at <= cursor_at,
+            or_(Lead.created_at < cursor_at, Lead.id < 100),
+        )
+        .order_by(Lead.created_at.desc(), Lead.id.desc())
+        .limit(51),
+        "leads by status": select(Lead)
+        .where(Lead.client_id == 1, Lead.status == "new")
+        .order_by(Lead.created_at.desc(), Lead.id.desc())
+        .limit(51),
+        "leads today": select(func.count(Lead.id)).where(
+            Lead.client_id == 1, Lead.created_at >= now.replace(hour=0, minute=0)
+        ),
+        "lead by contact key": select(Lead).where(Lead.client_id == 1, Lead.contact_key == "jo@example.com"),
+        "stale leads": select(Lead).where(
+            Lead.client_id == 1, Lead.status == "new", Lead.created_at < now - timedelta(days=3)
+        ),
+        "jobs list": select(Job)
+        .where(Job.client_id == 1)
+        .order_by(Job.created_at.desc(), Job.id.desc())
+        .limit(51),
+        "jobs scheduled": select(func.count(Job.id)).where(Job.client_id == 1, Job.status == "scheduled"),
+        "jobs of lead": select(Job.id).where(Job.lead_id == 1),
+        "logs list": select(LogEntry)
+        .where(LogEntry.client_id == 1)
+        .order_by(LogEntry.created_at.desc(), LogEntry.id.desc())
+        .limit(51),
+        "error log count": select(func.count(LogEntry.id)).where(LogEntry.entry_type == "error"),
+        "enabled automation lookup": select(AutomationInstance)
+        .join(AutomationInstance.template)
+        .where(
+            AutomationInstance.client_id == 1,
+            AutomationInstance.enabled.is_(True),
+            AutomationTemplate.type == "lead_capture",
+        ),
+    }
+
+
+def explain(statement) -> List[str]:
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for ``statement``."""
+    compiled = statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in (compiled.positiontup or ()))
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string, params).all()
+    return [row[-1] for row in rows]
+
+
+def _problems(plan: List[str]) -> List[str]:
+    found = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in HOT_TABLES and "INDEX" not in detail:
+            found.append(f"full table scan: {detail}")
+        elif detail.startswith("USE TEMP B-TREE"):
+            found.append(f"unindexed sort: {detail}")
+    return found
+
+
+def check_query_plans() -> List[Tuple[str, List[str], List[str]]]:
+    """Explain every hot query.  Returns ``(name, plan, problems)`` tuples.
+
+    Only SQLite is supported; other backends return an empty list.
+    """
+    if db.engine.dialect.name != "sqlite":
+        return []
+    results = []
+    for name, statement in _hot_queries().items():
+        plan = explain(statement)
+        results.append((name, plan, _problems(plan)))
+    return results
@@ -1,49 +1,303 @@
 """
 Scheduler utilities for Nexora.
 
-This module configures APScheduler jobs based on the enabled
-automations for each client.  It is invoked by the application
-factory during start‑up.
+This module configures APScheduler jobs for periodic automations.  It is
+invoked by the application factory during start‑up.
+
+Periodic automations run fan-in style: there is exactly one scheduled job
+per automation type (follow-up sequence, daily digest) rather than one
+per client.  When it fires, :func:`run_periodic_batch` loads the enabled
+instances of that type in id-ordered chunks and runs them on a bounded
+thread pool, isolating per-tenant failures and logging per-chunk timing.
+Because the due set is resolved at run time, toggling an automation or
+creating a client needs no scheduler changes.
+
+:data:`MAINTENANCE_JOBS` are housekeeping tasks (purging expired
+idempotency keys, archiving old log entries, adding new log entries to
+the search index) scheduled the same way.
+
+:func:`reconcile_jobs` keeps the scheduler's job set in line with
+:data:`PERIODIC_AUTOMATIONS` and :data:`MAINTENANCE_JOBS`, adding,
+removing or modifying only jobs that differ (including removing legacy
+per-instance jobs).
+
+Jobs are kept in the database (``apscheduler_jobs``) so they survive
+restarts, and only the process holding the scheduler lease runs them
+(see :mod:`app.utils.leader`).
 """
 
-from datetime import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import select
+
+from .. import db
+from ..models import AutomationInstance, AutomationTemplate
+from .automations import _log, run_follow_up_sequence, run_daily_digest, run_integration, run_integrations
+from .digest import run_daily_digests
+from .log_archive import archive_logs
+from .search import index_pending
+from .webhooks import purge_idempotency_keys
+
+logger = logging.getLogger(__name__)
+
+# Periodic automation types: handler and cron fields (UTC).
+PERIODIC_AUTOMATIONS = {
+    "follow_up_sequence": (run_follow_up_sequence, {"hour": 0, "minute": 30}),
+    "daily_digest": (run_daily_digest, {"hour": 1, "minute": 0}),
+}
+# Types whose work is set-based: the handler takes a whole chunk of
+# instance ids.  If a chunk fails, its instances are retried one by one
+# with the per-instance handler so a single bad tenant is isolated.
+CHUNK_HANDLERS = {
+    "daily_digest": run_daily_digests,
+}
+# Housekeeping jobs: function (no arguments) and cron fields (UTC).
+MAINTENANCE_JOBS: Dict[str, Tuple[Callable[[], object], dict]] = {
+    "purge_idempotency_keys": (purge_idempotency_keys, {"minute": 15}),
+    "archive_logs": (archive_logs, {"hour": 2, "minute": 0}),
+    "index_search": (index_pending, {"minute": "*"}),
+}
+JOB_PREFIX = "periodic_"
+MAINTENANCE_PREFIX = "maintenance_"
+# Prefixes of jobs managed by this module, including the legacy
+# per-instance jobs ("follow_up_<client>_<instance>", "daily_digest_...").
+_MANAGED_PREFIXES = (JOB_PREFIX, MAINTENANCE_PREFIX, "follow_up_", "daily_digest_")
+
+_app = None
+
+
+def init_app(app) -> None:
+    """Remember the application so scheduled jobs can push an app context."""
+    global _app
+    _app = app
+
+
+def configure_scheduler(scheduler: BackgroundScheduler, app) -> None:
+    """Configure the job store and job defaults.  Must run before the scheduler starts.
+
+    With ``SCHEDULER_JOBSTORE = "database"`` jobs are persisted in the
+    application database; ``"memory"`` keeps them in-process.  A missed
+    run (e.g. while leadership moves to another process) is still run
+    once within ``SCHEDULER_MISFIRE_GRACE`` seconds.
+    """
+    jobstores = {}
+    if app.config.get("SCHEDULER_JOBSTORE", "database") == "database":
+        jobstores["default"] = SQLAlchemyJobStore(engine=db.engine, tablename="apscheduler_jobs")
+    scheduler.configure(
+        timezone="UTC",
+        jobstores=jobstores,
+        job_defaults={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": app.config.get("SCHEDULER_MISFIRE_GRACE", 3600),
+        },
+    )
+
+
+def _due_instance_chunks(template_type: str, chunk_size: int):
+    """Yield lists of enabled instance ids of ``template_type``, keyset-paginated by id."""
+    last_id = 0
+    while True:
+        with _app.app_context():
+            ids = db.session.scalars(
+                select(AutomationInstance.id)
+                .join(AutomationInstance.template)
+                .where(
+                    AutomationInstance.enabled.is_(True),
+                    AutomationTemplate.type == template_type,
+                    AutomationInstance.id > last_id,
+                )
+                .order_by(AutomationInstance.id)
+                .limit(chunk_size)
+            ).all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def _run_instance(template_type: str, instance_id: int) -> bool:
+    """Run one tenant's instance in its own app context.  Returns False on failure."""
+    handler, _ = PERIODIC_AUTOMATIONS[template_type]
+    with _app.app_context():
+        ai = db.session.get(AutomationInstance, instance_id)
+        if ai is None or not ai.enabled:
+            return True
+        client_id = ai.client_id
+        try:
+            handler(ai)
+            run_integration(ai, {"trigger": template_type}, "scheduled run")
+            return True
+        except Exception as exc:
+            logger.exception("%s failed for instance %s", template_type, instance_id)
+            db.session.rollback()
+            _log(client_id, instance_id, f"{template_type} failed: {exc}", "error")
+            return False
+
+
+def _run_chunk(template_type: str, chunk: List[int]) -> int:
+    """Run a set-based handler over a chunk.  Returns the number of failed instances."""
+    with _app.app_context():
+        try:
+            CHUNK_HANDLERS[template_type](chunk)
+        except Exception:
+            logger.exception(
+                "%s chunk failed; retrying %d instance(s) individually", template_type, len(chunk)
+            )
+            db.session.rollback()
+        else:
+            # Integrations run per instance; a failure is logged, not retried.
+            instances = db.session.scalars(
+                select(AutomationInstance).where(AutomationInstance.id.in_(chunk))
+            ).all()
+            run_integrations(instances, {"trigger": template_type}, "scheduled run")
+            return 0
+    return [_run_instance(template_type, instance_id) for instance_id in chunk].count(False)
 
-from ..models import AutomationInstance
-from .automations import run_follow_up_sequence, run_daily_digest
+
+def _holds_lease() -> bool:
+    leader = getattr(_app, "scheduler_leader", None)
+    return leader is None or not leader.running or leader.is_leader
+
+
+def run_periodic_batch(template_type: str) -> Dict[str, int]:
+    """Scheduler entry point: run every enabled instance of ``template_type``.
+
+    Instances are loaded in chunks of ``SCHEDULER_BATCH_CHUNK`` and executed
+    on a pool of ``SCHEDULER_BATCH_WORKERS`` threads, or handed to a
+    set-based chunk handler (see :data:`CHUNK_HANDLERS`) in one call.  A
+    failing tenant is logged (and recorded as an error ``LogEntry``)
+    without affecting others.
+    """
+    totals = {"instances": 0, "failed": 0, "chunks": 0}
+    if not _holds_lease():
+        logger.warning("Skipping %s batch: this process does not hold the scheduler lease", template_type)
+        return totals
+    workers = _app.config.get("SCHEDULER_BATCH_WORKERS", 4)
+    chunk_size = _app.config.get("SCHEDULER_BATCH_CHUNK", 200)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{template_type}-batch") as pool:
+        for chunk in _due_instance_chunks(template_type, chunk_size):
+            chunk_started = time.perf_counter()
+            if template_type in CHUNK_HANDLERS:
+                failed = _run_chunk(template_type, chunk)
+            else:
+                results: List[bool] = list(pool.map(lambda i: _run_instance(template_type, i), chunk))
+                failed = results.count(False)
+            totals["chunks"] += 1
+            totals["instances"] += len(chunk)
+            totals["failed"] += failed
+            logger.info(
+                "%s chunk %d: %d instance(s), %d failed, %.1f ms",
+                template_type,
+                totals["chunks"],
+                len(chunk),
+                failed,
+                (time.perf_counter() - chunk_started) * 1000,
+            )
+    logger.info(
+        "%s batch finished: %d instance(s) in %d chunk(s), %d failed, %.1f ms",
+        template_type,
+        totals["instances"],
+        totals["chunks"],
+        totals["failed"],
+        (time.perf_counter() - started) * 1000,
+    )
+    return totals
+
+
+def run_maintenance(name: str) -> None:
+    """Scheduler entry point for a :data:`MAINTENANCE_JOBS` task."""
+    if not _holds_lease():
+        logger.warning("Skipping %s: this process does not hold the scheduler lease", name)
+        return
+    func, _ = MAINTENANCE_JOBS[name]
+    started = time.perf_counter()
+    with _app.app_context():
+        try:
+            result = func()
+        except Exception:
+            logger.exception("Maintenance job %s failed", name)
+            db.session.rollback()
+            return
+    logger.info("Maintenance job %s finished in %.1f ms: %s", name, (time.perf_counter() - started) * 1000, result)
+
+
+def desired_jobs() -> Dict[str, Tuple[Callable, str, dict]]:
+    """Return ``{job_id: (function, argument, cron_fields)}``.
+
+    One job per periodic automation type and one per maintenance task.
+    """
+    jobs = {
+        f"{JOB_PREFIX}{template_type}": (run_periodic_batch, template_type, cron)
+        for template_type, (_, cron) in PERIODIC_AUTOMATIONS.items()
+    }
+    jobs.update(
+        {
+            f"{MAINTENANCE_PREFIX}{name}": (run_maintenance, name, cron)
+            for name, (_, cron) in MAINTENANCE_JOBS.items()
+        }
+    )
+    return jobs
+
+
+def _add_job(scheduler: BackgroundScheduler, job_id: str, func: Callable, arg: str, cron: dict) -> None:
+    scheduler.add_job(
+        func,
+        trigger=CronTrigger(**cron),
+        args=[arg],
+        id=job_id,
+        replace_existing=True,
+    )
+
+
+def reconcile_jobs(scheduler: BackgroundScheduler) -> Tuple[int, int, int]:
+    """Bring the scheduler's jobs in line with :func:`desired_jobs`.
+
+    Only jobs with a managed id prefix are touched; other jobs are left
+    alone.  Returns ``(added, removed, modified)``.
+    """
+    started = time.perf_counter()
+    desired = desired_jobs()
+    current = {job.id: job for job in scheduler.get_jobs() if job.id.startswith(_MANAGED_PREFIXES)}
+
+    removed = 0
+    for job_id in current.keys() - desired.keys():
+        scheduler.remove_job(job_id)
+        removed += 1
+
+    added = modified = 0
+    for job_id, (func, arg, cron) in desired.items():
+        job = current.get(job_id)
+        if job is None:
+            _add_job(scheduler, job_id, func, arg, cron)
+            added += 1
+        elif job.func is not func or list(job.args) != [arg] or str(job.trigger) != str(CronTrigger(**cron)):
+            _add_job(scheduler, job_id, func, arg, cron)
+            modified += 1
+
+    logger.info(
+        "Scheduler reconciled in %.1f ms: %d added, %d removed, %d modified, %d total",
+        (time.perf_counter() - started) * 1000,
+        added,
+        removed,
+        modified,
+        len(desired),
+    )
+    return added, removed, modified
 
 
 def schedule_jobs(scheduler: BackgroundScheduler) -> None:
-    """Iterate over enabled automation instances and schedule appropriate jobs.
+    """Schedule one fan-in job per periodic automation type.
 
     Only automations that require periodic execution (follow‑up sequence
     and daily digest) are scheduled.  Trigger‑based automations are
     invoked from within the application when relevant events occur.
     """
-    # Remove existing jobs to avoid duplicates
-    for job in scheduler.get_jobs():
-        scheduler.remove_job(job.id)
-
-    instances = AutomationInstance.query.filter_by(enabled=True).all()
-    for ai in instances:
-        if ai.template.type == "follow_up_sequence":
-            job_id = f"follow_up_{ai.client_id}_{ai.id}"
-            # Run daily at 00:30 UTC
-            scheduler.add_job(
-                run_follow_up_sequence,
-                trigger=CronTrigger(hour=0, minute=30),
-                args=[ai],
-                id=job_id,
-                replace_existing=True,
-            )
-        elif ai.template.type == "daily_digest":
-            job_id = f"daily_digest_{ai.client_id}_{ai.id}"
-            # Run daily at 01:00 UTC
-            scheduler.add_job(
-                run_daily_digest,
-                trigger=CronTrigger(hour=1, minute=0),
-                args=[ai],
-                id=job_id,
-                replace_existing=True,
-            )
\ No newline at end of file
+    reconcile_jobs(scheduler)
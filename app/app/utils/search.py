@@ -0,0 +1,364 @@
+"""
+Full-text search over leads and automation logs.
+
+On SQLite with FTS5, :func:`install_search_indexes` (run by bootstrap)
+creates two external-content FTS5 tables:
+
+* ``lead_fts`` over ``lead.name``, ``email``, ``phone`` and ``source``,
+  kept in sync by triggers;
+* ``log_entry_fts`` over ``log_entry.message``.  Tokenizing every message
+  inside the insert made bulk log writes several times slower, so log
+  entries (which are never updated) are indexed after the fact instead:
+  :func:`index_pending` adds the rows above a high-water mark stored in
+  ``app_meta``, in chunks, and the worker runs it every minute.  New log
+  entries therefore become searchable within about a minute.
+  :func:`unindex_logs` removes archived entries from the index.
+
+Both also index ``client_id``, so a tenant's search is a single MATCH
+(``client_id : "7" AND ...``) rather than a scan of every tenant's hits.
+The index stores only tokens and the columns they occur in
+(``detail=column``), plus prefix indexes for two- and three-character
+prefixes; the text is read from the base tables.
+
+:func:`search` requires every word of the query (``jo smi`` finds lead
+"John Smith", ``acme`` finds "john@acme.com", ``4567`` finds
+"555-123-4567"; see :func:`match_expression`), orders hits newest first
+(``sort="recent"``, the default for logs) or by BM25 among the newest
+``SEARCH_RANK_WINDOW`` hits (``sort="rank"``, the default for leads), and
+returns one page.  Where FTS5 is not available
+it falls back to ``LIKE`` substring matching with the same result
+shape.  Archived log entries (see :mod:`.log_archive`) are not indexed.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, column, func, insert, literal, or_, select, table, text, update
+from sqlalchemy.orm import selectinload
+
+from .. import db
+from ..models import AppMeta, Lead, LogEntry
+from .pagination import MAX_PER_PAGE
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 8
+SORTS = ("rank", "recent")
+
+
+class SearchIndex(NamedTuple):
+    model: type
+    fts_table: str
+    columns: Tuple[str, ...]
+    weights: Tuple[float, ...]  # BM25 weight per column
+    default_sort: str
+    prefix_last: bool  # match the last word as a prefix (typeahead)
+    triggers: bool  # kept in sync by triggers; otherwise by index_pending()
+
+
+SEARCH_INDEXES: Dict[str, SearchIndex] = {
+    "leads": SearchIndex(
+        Lead, "lead_fts", ("name", "email", "phone", "source"), (10.0, 8.0, 6.0, 1.0), "rank", True, True
+    ),
+    "logs": SearchIndex(LogEntry, "log_entry_fts", ("message",), (1.0,), "recent", False, False),
+}
+MARK_PREFIX = "search_indexed:"  # app_meta key prefix of the high-water marks
+TRIGGER_SUFFIXES = ("_ai", "_ad", "_au")
+
+
+def _ddl(index: SearchIndex) -> List[Tuple[str, str]]:
+    """``(name, statement)`` pairs creating the FTS table and its triggers, if any."""
+    table = index.model.__tablename__
+    fts = index.fts_table
+    cols = ("client_id",) + index.columns
+    names = ", ".join(cols)
+    new = ", ".join(f"new.{c}" for c in cols)
+    old = ", ".join(f"old.{c}" for c in cols)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert_new = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    options = f"content='{table}', content_rowid='id', detail=column, prefix='2 3'"
+    create = (fts, f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, {options})")
+    if not index.triggers:
+        return [create]
+    return [
+        create,
+        (f"{fts}_ai", f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END"),
+        (f"{fts}_ad", f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END"),
+        (
+            f"{fts}_au",
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN {delete_old} {insert_new} END",
+        ),
+    ]
+
+
+def schema_signature() -> str:
+    """The search DDL, folded into the bootstrap fingerprint."""
+    return "\n".join(stmt for index in SEARCH_INDEXES.values() for _, stmt in _ddl(index))
+
+
+def _fts5_compiled(connection) -> bool:
+    options = connection.exec_driver_sql("PRAGMA compile_options").scalars().all()
+    return "ENABLE_FTS5" in options
+
+
+def _get_mark(connection, index: SearchIndex) -> Optional[int]:
+    value = connection.execute(
+        select(AppMeta.value).where(AppMeta.key == MARK_PREFIX + index.fts_table)
+    ).scalar()
+    return None if value is None else int(value)
+
+
+def _set_mark(connection, index: SearchIndex, value: int) -> None:
+    """Record that every row up to id ``value`` is indexed."""
+    key = MARK_PREFIX + index.fts_table
+    now = datetime.utcnow()
+    updated = connection.execute(
+        update(AppMeta).where(AppMeta.key == key).values(value=str(value), updated_at=now)
+    ).rowcount
+    if not updated:
+        connection.execute(insert(AppMeta).values(key=key, value=str(value), updated_at=now))
+
+
+def _max_id(connection, index: SearchIndex) -> int:
+    return connection.execute(select(func.max(index.model.id))).scalar() or 0
+
+
+def _rebuild(connection, index: SearchIndex) -> None:
+    connection.exec_driver_sql(f"INSERT INTO {index.fts_table}({index.fts_table}) VALUES ('rebuild')")
+    if not index.triggers:
+        _set_mark(connection, index, _max_id(connection, index))
+
+
+def install_search_indexes(connection) -> List[str]:
+    """Create missing FTS tables and triggers and index existing rows.
+
+    Drops the triggers of indexes that are no longer trigger-maintained
+    (their index is complete, so the high-water mark starts at the
+    current last row).  Does nothing on other databases or without FTS5.
+    Returns the names of the tables (re)built.
+    """
+    if connection.dialect.name != "sqlite" or not _fts5_compiled(connection):
+        return []
+    existing = set(
+        connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')").scalars()
+    )
+    created = []
+    for index in SEARCH_INDEXES.values():
+        fts = index.fts_table
+        if not index.triggers:
+            obsolete = [fts + suffix for suffix in TRIGGER_SUFFIXES if fts + suffix in existing]
+            for name in obsolete:
+                connection.exec_driver_sql(f"DROP TRIGGER {name}")
+            if obsolete and fts in existing:
+                _set_mark(connection, index, _max_id(connection, index))
+        for name, stmt in _ddl(index):
+            if name not in existing:
+                connection.exec_driver_sql(stmt)
+        if fts not in existing or (not index.triggers and _get_mark(connection, index) is None):
+            logger.info("Building search index %s", fts)
+            _rebuild(connection, index)
+            created.append(fts)
+    _available.clear()
+    return created
+
+
+def rebuild_search_indexes() -> List[str]:
+    """Re-index every row from the base tables.  Returns the tables rebuilt."""
+    if not fts_available():
+        return []
+    connection = db.session.connection()
+    for index in SEARCH_INDEXES.values():
+        _rebuild(connection, index)
+    db.session.commit()
+    return [index.fts_table for index in SEARCH_INDEXES.values()]
+
+
+def index_pending(chunk_size: Optional[int] = None) -> Dict[str, int]:
+    """Add rows above the high-water mark to the indexes not kept by triggers.
+
+    Each chunk of ``SEARCH_INDEX_CHUNK_SIZE`` rows is indexed and the mark
+    advanced in one transaction; the mark only moves if it still has the
+    value the chunk started from, so concurrent runs cannot index a row
+    twice.  SQLite commits writes in id order, so no row is skipped.
+    Returns the number of rows indexed per FTS table.
+    """
+    report: Dict[str, int] = {}
+    if not fts_available():
+        return report
+    chunk_size = chunk_size or current_app.config.get("SEARCH_INDEX_CHUNK_SIZE", 5000)
+    for index in SEARCH_INDEXES.values():
+        if index.triggers:
+            continue
+        table, fts = index.model.__tablename__, index.fts_table
+        key = MARK_PREFIX + fts
+        names = ", ".join(("client_id",) + index.columns)
+        report[fts] = 0
+        while True:
+            connection = db.session.connection()
+            mark = _get_mark(connection, index) or 0
+            upto = connection.exec_driver_sql(
+                f"SELECT max(id) FROM (SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)",
+                (mark, chunk_size),
+            ).scalar()
+            if upto is None:
+                db.session.rollback()
+                break
+            moved = connection.execute(
+                update(AppMeta)
+                .where(AppMeta.key == key, AppMeta.value == str(mark))
+                .values(value=str(upto), updated_at=datetime.utcnow())
+            ).rowcount
+            if not moved:
+                db.session.rollback()  # another process got there first
+                break
+            added = connection.exec_driver_sql(
+                f"INSERT INTO {fts}(rowid, {names}) SELECT id, {names} FROM {table} WHERE id > ? AND id <= ?",
+                (mark, upto),
+            ).rowcount
+            db.session.commit()
+            report[fts] += added
+    return report
+
+
+def unindex_logs(*where) -> None:
+    """Remove the log entries matching ``where`` from the log index.
+
+    Call before deleting them: an external-content FTS table needs the
+    old values to remove a row.  Rows above the high-water mark were never
+    indexed and are left alone.  Runs in the caller's transaction.
+    """
+    if not fts_available():
+        return
+    index = SEARCH_INDEXES["logs"]
+    connection = db.session.connection()
+    mark = _get_mark(connection, index) or 0
+    names = ("client_id",) + index.columns
+    fts = table(index.fts_table, *(column(name) for name in (index.fts_table, "rowid") + names))
+    rows = select(literal("delete"), LogEntry.id, *(getattr(LogEntry, name) for name in names)).where(
+        *where, LogEntry.id <= mark
+    )
+    connection.execute(insert(fts).from_select([index.fts_table, "rowid", *names], rows))
+
+
+_available: Dict[str, bool] = {}
+
+
+def fts_available() -> bool:
+    """Whether the FTS tables exist in this database (checked once per process)."""
+    url = str(db.engine.url)
+    if url not in _available:
+        names = {index.fts_table for index in SEARCH_INDEXES.values()}
+        found = set()
+        if db.engine.dialect.name == "sqlite":
+            found = set(db.session.scalars(text("SELECT name FROM sqlite_master WHERE type = 'table'")))
+        _available[url] = names <= found
+    return _available[url]
+
+
+def search_terms(query: str) -> List[str]:
+    """The words of a search box query, lowercased, at most :data:`MAX_TERMS`.
+
+    Words are split the way the FTS tokenizer splits text (on anything but
+    letters and digits), so each term is a single token.
+    """
+    return re.findall(r"[^\W_]+", (query or "").lower())[:MAX_TERMS]
+
+
+def match_expression(index: SearchIndex, terms: List[str], client_id: Optional[int] = None) -> str:
+    """FTS5 MATCH expression requiring every term in the indexed columns.
+
+    Terms of up to three characters (served by the prefix indexes) and,
+    for leads, the last term (still being typed) match as prefixes; other
+    terms match whole words.  A longer prefix makes FTS5 load every
+    posting of every matching word before returning the first row, which
+    for a common word in the log table means millions of rows.
+    """
+    last = len(terms) - 1 if index.prefix_last else -1
+    words = " ".join(f'"{term}"*' if i == last or len(term) <= 3 else f'"{term}"' for i, term in enumerate(terms))
+    expr = f"{{{' '.join(index.columns)}}} : ({words})"
+    if client_id is not None:
+        expr = f'client_id : "{int(client_id)}" AND {expr}'
+    return expr
+
+
+def _fts_ids(index: SearchIndex, terms, client_id, sort, limit, offset) -> List[int]:
+    fts = index.fts_table
+    params = {"match": match_expression(index, terms, client_id), "limit": limit, "offset": offset}
+    if sort == "recent":
+        stmt = f"SELECT rowid FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT :limit OFFSET :offset"
+    else:
+        # Rank the newest SEARCH_RANK_WINDOW matches rather than every match:
+        # FTS5 returns them in rowid order and stops, so a common word does
+        # not mean scoring millions of rows.
+        weights = ", ".join(str(w) for w in (0.0,) + index.weights)
+        stmt = (
+            f"SELECT rowid FROM (SELECT rowid, bm25({fts}, {weights}) AS score FROM {fts} "
+            f"WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT :window) "
+            "ORDER BY score, rowid DESC LIMIT :limit OFFSET :offset"
+        )
+        params["window"] = current_app.config.get("SEARCH_RANK_WINDOW", 1000)
+    return list(db.session.scalars(text(stmt), params))
+
+
+def _like_ids(index: SearchIndex, terms, client_id, limit, offset) -> List[int]:
+    model = index.model
+    columns = [getattr(model, name) for name in index.columns]
+    stmt = select(model.id).where(
+        and_(*(or_(*(column.ilike(f"%{term}%") for column in columns)) for term in terms))
+    )
+    if client_id is not None:
+        stmt = stmt.where(model.client_id == client_id)
+    stmt = stmt.order_by(model.created_at.desc(), model.id.desc()).limit(limit).offset(offset)
+    return list(db.session.scalars(stmt))
+
+
+def search(
+    kind: str,
+    query: str,
+    *,
+    client_id: Optional[int] = None,
+    page: int = 1,
+    per_page: int = 20,
+    sort: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Return one page of ``kind`` ("leads" or "logs") matching ``query``.
+
+    The result has ``items`` (model instances in ``sort`` order), ``page``,
+    ``per_page``, ``has_next``, ``sort`` and ``engine`` (``"fts5"`` or
+    ``"like"``).  ``client_id`` limits it to one tenant.  ``sort``
+    defaults to best match for leads and newest first for logs.
+    """
+    index = SEARCH_INDEXES[kind]
+    page = max(page, 1)
+    per_page = max(min(per_page, MAX_PER_PAGE), 1)
+    sort = sort if sort in SORTS else index.default_sort
+    terms = search_terms(query)
+    engine = "fts5" if fts_available() else "like"
+    ids: List[int] = []
+    if terms:
+        offset = (page - 1) * per_page
+        if engine == "fts5":
+            ids = _fts_ids(index, terms, client_id, sort, per_page + 1, offset)
+        else:
+            ids = _like_ids(index, terms, client_id, per_page + 1, offset)
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    rows = {}
+    if ids:
+        model = index.model
+        stmt = select(model).where(model.id.in_(ids)).options(selectinload(model.client))
+        rows = {row.id: row for row in db.session.scalars(stmt)}
+    return {
+        "items": [rows[i] for i in ids if i in rows],
+        "page": page,
+        "per_page": per_page,
+        "has_next": has_next,
+        "sort": sort,
+        "engine": engine,
+        "terms": terms,
+    }
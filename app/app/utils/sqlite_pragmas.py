@@ -0,0 +1,45 @@
+"""
+SQLite connection settings.
+
+With SQLite's default rollback journal, a commit blocks readers and syncs
+the database file twice.  ``SQLITE_JOURNAL_MODE = "WAL"`` lets readers
+run alongside the single writer, and a commit becomes an append to the
+write-ahead log.  ``SQLITE_SYNCHRONOUS = "NORMAL"`` then only syncs at
+checkpoints.  That is still safe against application crashes; a power
+loss may lose the last commits but does not corrupt the database.
+``SQLITE_BUSY_TIMEOUT`` (milliseconds) makes writers in different
+processes wait for each other instead of failing with "database is
+locked".
+
+The pragmas are applied to every new connection; other databases are
+left alone.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event
+
+from .. import db
+
+
+def init_app(app) -> None:
+    """Apply the configured pragmas to each new SQLite connection of the app's engine."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = [
+        ("journal_mode", app.config.get("SQLITE_JOURNAL_MODE")),
+        ("synchronous", app.config.get("SQLITE_SYNCHRONOUS")),
+        ("busy_timeout", app.config.get("SQLITE_BUSY_TIMEOUT")),
+    ]
+    pragmas = [(name, value) for name, value in pragmas if value not in (None, "")]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
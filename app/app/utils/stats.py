@@ -0,0 +1,102 @@
+"""
+Aggregate statistics for the admin console.
+
+The admin dashboard used to issue two ``COUNT`` queries and a lazy load
+of ``client.users`` for every client (3N+2 queries).  This module
+computes lead, job and user counts for all clients with grouped
+aggregate subqueries joined to ``client``, so a page of stats costs one
+query plus one for the total, regardless of the number of tenants.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from sqlalchemy import func, select
+
+from .. import db
+from ..models import Client, Job, Lead, User
+
+
+def _count_by_client(model):
+    return (
+        select(model.client_id, func.count().label("n"))
+        .where(model.client_id.isnot(None))
+        .group_by(model.client_id)
+        .subquery()
+    )
+
+
+def _stats_query():
+    leads = _count_by_client(Lead)
+    jobs = _count_by_client(Job)
+    users = _count_by_client(User)
+    columns = {
+        "name": Client.name,
+        "slug": Client.slug,
+        "created": Client.created_at,
+        "leads": func.coalesce(leads.c.n, 0),
+        "jobs": func.coalesce(jobs.c.n, 0),
+        "users": func.coalesce(users.c.n, 0),
+    }
+    query = (
+        select(
+            Client,
+            columns["leads"].label("leads"),
+            columns["jobs"].label("jobs"),
+            columns["users"].label("users"),
+        )
+        .outerjoin(leads, leads.c.client_id == Client.id)
+        .outerjoin(jobs, jobs.c.client_id == Client.id)
+        .outerjoin(users, users.c.client_id == Client.id)
+    )
+    return query, columns
+
+
+SORT_COLUMNS = ("name", "slug", "created", "leads", "jobs", "users")
+
+
+def client_stats(
+    page: int = 1, per_page: int = 50, sort: str = "name", direction: str = "asc"
+) -> Dict[str, Any]:
+    """Return one page of per-client stats.
+
+    Each item is a dict with ``client``, ``leads``, ``jobs`` and ``users``
+    keys.  ``sort`` may be any of :data:`SORT_COLUMNS`; unknown values fall
+    back to ``name``.
+    """
+    page = max(page, 1)
+    per_page = max(min(per_page, 500), 1)
+    if sort not in SORT_COLUMNS:
+        sort = "name"
+    direction = "desc" if direction == "desc" else "asc"
+
+    query, columns = _stats_query()
+    order = columns[sort].desc() if direction == "desc" else columns[sort].asc()
+    rows = db.session.execute(
+        query.order_by(order, Client.id).limit(per_page).offset((page - 1) * per_page)
+    ).all()
+    total = db.session.scalar(select(func.count(Client.id)))
+    return {
+        "items": [
+            {"client": row.Client, "leads": row.leads, "jobs": row.jobs, "users": row.users}
+            for row in rows
+        ],
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": max((total + per_page - 1) // per_page, 1),
+        "sort": sort,
+        "direction": direction,
+    }
+
+
+def client_stats_for(client_id: int) -> Dict[str, int]:
+    """Return lead, job and user counts for a single client in one query."""
+    counts = {
+        "leads": select(func.count(Lead.id)).where(Lead.client_id == client_id).scalar_subquery(),
+        "jobs": select(func.count(Job.id)).where(Job.client_id == client_id).scalar_subquery(),
+        "users": select(func.count(User.id)).where(User.client_id == client_id).scalar_subquery(),
+    }
+    row = db.session.execute(select(*(q.label(k) for k, q in counts.items()))).one()
+    return {"leads": row.leads, "jobs": row.jobs, "users": row.users}
@@ -0,0 +1,121 @@
+"""
+Cached user loading for Flask-Login.
+
+The ``user_loader`` used to fetch the ``User`` row on every authenticated
+request, and client pages then lazily loaded ``current_user.client`` as
+well.  :func:`load_user` now returns a :class:`SessionUser`, a read-only
+snapshot of the user and their client, from a per-process
+:class:`~.versioned_cache.VersionedCache` keyed by user id.  A cache hit
+costs no query.
+
+Invalidation has two layers:
+
+* any change to a user or client bumps the ``user_cache_version`` row, so
+  every process drops its snapshots within ``USER_CACHE_CHECK_INTERVAL``
+  seconds (immediately in the process that made the change), and entries
+  expire after ``USER_CACHE_TTL`` seconds regardless;
+* ``User.auth_version`` is bumped when the password, role, client or
+  active flag changes, and stored in the session at login.  A session
+  whose stamp no longer matches is treated as logged out, as is any
+  session of a deactivated user.
+
+Code that needs to modify the user or client must load the model
+(``db.session.get``); the snapshot is not attached to a session.
+"""
+
+from __future__ import annotations
+
+from collections import namedtuple
+from typing import Optional
+
+from flask import session
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, select
+
+from .. import db
+from ..models import Client, User
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = "user_cache_version"
+SESSION_KEY = "_auth_version"
+# Changing any of these invalidates the user's existing sessions.
+AUTH_FIELDS = ("password_hash", "role", "client_id", "active")
+
+CachedClient = namedtuple("CachedClient", ["id", "name", "slug", "dashboard_layout"])
+
+user_cache = VersionedCache("user", VERSION_KEY, (User, Client), config_prefix="USER_CACHE")
+
+
+class SessionUser(UserMixin):
+    """What request handlers and templates read from ``current_user``."""
+
+    def __init__(self, id, email, role, client_id, active, auth_version, client=None) -> None:
+        self.id = id
+        self.email = email
+        self.role = role
+        self.client_id = client_id
+        self.active = active
+        self.auth_version = auth_version
+        self.client: Optional[CachedClient] = client
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.active)
+
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+    def is_client_user(self) -> bool:
+        return self.role == "client"
+
+    def __repr__(self) -> str:
+        return f"<SessionUser {self.email} role={self.role}>"
+
+
+def _load(user_id: int) -> Optional[SessionUser]:
+    row = db.session.execute(
+        select(
+            User.id,
+            User.email,
+            User.role,
+            User.client_id,
+            User.active,
+            User.auth_version,
+            Client.name,
+            Client.slug,
+            Client.dashboard_layout,
+        )
+        .outerjoin(Client, Client.id == User.client_id)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    client = CachedClient(row.client_id, row.name, row.slug, row.dashboard_layout) if row.client_id else None
+    return SessionUser(row.id, row.email, row.role, row.client_id, row.active, row.auth_version, client)
+
+
+def load_user(user_id: str) -> Optional[SessionUser]:
+    """Flask-Login ``user_loader``: the cached user, if the session is still valid for it."""
+    user = user_cache.get(int(user_id), lambda: _load(int(user_id)))
+    if user is None or not user.active or session.get(SESSION_KEY) != user.auth_version:
+        return None
+    return user
+
+
+def stamp_session(user: User) -> None:
+    """Record the user's ``auth_version`` in the session; call after ``login_user``."""
+    session[SESSION_KEY] = user.auth_version
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in AUTH_FIELDS):
+                obj.auth_version = (obj.auth_version or 0) + 1
+
+
+def init_app(app) -> None:
+    """Install the ``auth_version`` hook on the shared session (once)."""
+    if not event.contains(db.session, "before_flush", _before_flush):
+        event.listen(db.session, "before_flush", _before_flush)
@@ -0,0 +1,154 @@
+"""
+Per-process caches invalidated through version rows.
+
+A :class:`VersionedCache` is an LRU mapping with an optional TTL.  Each
+cache names the models it depends on and a key in ``app_meta``.  Any
+flush that inserts, deletes or changes a column of one of those models
+writes a new version to that row in the same transaction, and the
+writing process drops the cache on commit.  Other processes compare the row with the
+version they last saw.  They do this at most once per
+``<PREFIX>_CHECK_INTERVAL`` seconds and at most once per request, and
+clear their entries when it changed.  So a change made anywhere is
+visible everywhere within the check interval.
+
+Settings are read from the app config with the cache's prefix:
+``<PREFIX>_CHECK_INTERVAL`` (default 1.0), ``<PREFIX>_MAX_ENTRIES``
+(default 10000) and ``<PREFIX>_TTL`` (seconds, default none).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, insert, select, update
+
+from .. import db
+from ..models import AppMeta
+
+_MISSING = object()
+_caches: List["VersionedCache"] = []
+
+
+class VersionedCache:
+    """LRU/TTL cache whose entries are dropped when its version row changes."""
+
+    def __init__(self, name: str, version_key: str, models: Tuple[type, ...], config_prefix: str) -> None:
+        self.name = name
+        self.version_key = version_key
+        self.models = models
+        self.config_prefix = config_prefix
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+        _caches.append(self)
+
+    def _setting(self, name: str, default):
+        return current_app.config.get(f"{self.config_prefix}_{name}", default)
+
+    def _check_version(self) -> None:
+        memo = f"_cache_version_{self.name}"
+        if has_app_context() and memo in g:
+            return
+        if time.monotonic() - self._checked_at >= self._setting("CHECK_INTERVAL", 1.0):
+            version = db.session.scalar(select(AppMeta.value).where(AppMeta.key == self.version_key))
+            with self._lock:
+                if version != self._version:
+                    self._entries.clear()
+                    self._version = version
+                    self.invalidations += 1
+                self._checked_at = time.monotonic()
+        setattr(g, memo, True)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key``, calling ``loader`` on a miss."""
+        self._check_version()
+        now = time.monotonic()
+        with self._lock:
+            stored_at, value = self._entries.get(key, (0.0, _MISSING))
+            ttl = self._setting("TTL", None)
+            if value is not _MISSING and (ttl is None or now - stored_at < ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._setting("MAX_ENTRIES", 10000):
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self) -> None:
+        """Drop every entry and re-read the version row on the next lookup."""
+        with self._lock:
+            self._entries.clear()
+            self._checked_at = 0.0
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters of every cache in this process."""
+    return {cache.name: cache.stats() for cache in _caches}
+
+
+def _after_flush(session, flush_context) -> None:
+    # An object is in ``session.dirty`` when only a backref collection
+    # changed (adding a Lead dirties its Client); that is not a change.
+    changed = [
+        *session.new,
+        *session.deleted,
+        *(obj for obj in session.dirty if session.is_modified(obj, include_collections=False)),
+    ]
+    stale = [cache for cache in _caches if any(isinstance(obj, cache.models) for obj in changed)]
+    if not stale:
+        return
+    connection = session.connection()
+    dirty = session.info.setdefault("stale_caches", set())
+    for cache in stale:
+        version = uuid.uuid4().hex
+        result = connection.execute(
+            update(AppMeta).where(AppMeta.key == cache.version_key).values(value=version)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(AppMeta).values(key=cache.version_key, value=version))
+        dirty.add(cache.name)
+
+
+def _after_commit(session) -> None:
+    stale = session.info.pop("stale_caches", None)
+    for cache in _caches:
+        if stale and cache.name in stale:
+            cache.invalidate()
+
+
+def _after_rollback(session) -> None:
+    session.info.pop("stale_caches", None)
+
+
+def version_keys() -> List[str]:
+    return [cache.version_key for cache in _caches]
+
+
+def init_app(app) -> None:
+    """Install the version-bump hooks on the shared session (once)."""
+    for name, fn in (("after_flush", _after_flush), ("after_commit", _after_commit), ("after_rollback", _after_rollback)):
+        if not event.contains(db.session, name, fn):
+            event.listen(db.session, name, fn)
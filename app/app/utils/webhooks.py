@@ -0,0 +1,119 @@
+"""
+Request signing and idempotency for the machine-to-machine API.
+
+**Signing.**  Each client gets one or more ``IntegrationCredential`` rows
+with ``service="webhook"``; the ``token`` is a shared secret.  Callers
+send::
+
+    X-Nexora-Timestamp: <unix seconds>
+    X-Nexora-Signature: sha256=<hex HMAC-SHA256(secret, "<timestamp>." + raw body)>
+
+:func:`verify_signature` accepts the request if the signature matches any
+of the client's secrets (so secrets can be rotated without downtime)
+and the timestamp is within ``WEBHOOK_MAX_SKEW`` seconds.  Secrets are
+served from a :class:`~.versioned_cache.VersionedCache` on
+``IntegrationCredential``.
+
+**Idempotency.**  A request may carry an ``Idempotency-Key`` header.  The
+response of the first request with a key is stored in ``idempotency_key``
+in the same transaction as its effects.  A later request with the same
+key and body gets the stored response back without doing anything.  The
+same key with a different body is rejected.  Keys expire after
+``WEBHOOK_IDEMPOTENCY_TTL`` seconds and are purged by a scheduler
+maintenance job (:func:`purge_idempotency_keys`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from .. import db
+from ..models import IdempotencyKey, IntegrationCredential
+from .versioned_cache import VersionedCache
+
+VERSION_KEY = "webhook_cache_version"
+SERVICE = "webhook"
+TIMESTAMP_HEADER = "X-Nexora-Timestamp"
+SIGNATURE_HEADER = "X-Nexora-Signature"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+secret_cache = VersionedCache("webhook", VERSION_KEY, (IntegrationCredential,), config_prefix="WEBHOOK_CACHE")
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Return the ``X-Nexora-Signature`` value for a request body."""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def _load_secrets(client_id: int) -> Tuple[str, ...]:
+    return tuple(
+        db.session.scalars(
+            select(IntegrationCredential.token).where(
+                IntegrationCredential.client_id == client_id,
+                IntegrationCredential.service == SERVICE,
+                IntegrationCredential.token.is_not(None),
+            )
+        ).all()
+    )
+
+
+def verify_signature(client_id: int, headers, body: bytes) -> Optional[str]:
+    """Check a request's signature.  Returns None if valid, else the reason."""
+    timestamp = headers.get(TIMESTAMP_HEADER, "")
+    signature = headers.get(SIGNATURE_HEADER, "")
+    if not timestamp or not signature:
+        return f"missing {TIMESTAMP_HEADER} or {SIGNATURE_HEADER} header"
+    try:
+        skew = abs(time.time() - int(timestamp))
+    except ValueError:
+        return f"invalid {TIMESTAMP_HEADER}"
+    if skew > current_app.config.get("WEBHOOK_MAX_SKEW", 300):
+        return "request timestamp outside the allowed window"
+    secrets = secret_cache.get(client_id, lambda: _load_secrets(client_id))
+    if not any(hmac.compare_digest(sign(secret, timestamp, body), signature) for secret in secrets):
+        return "invalid signature"
+    return None
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def find_idempotent_response(client_id: int, key: str) -> Optional[IdempotencyKey]:
+    """Return the live stored response for ``key``; expired ones are deleted."""
+    stored = db.session.get(IdempotencyKey, (client_id, key))
+    if stored is None:
+        return None
+    ttl = current_app.config.get("WEBHOOK_IDEMPOTENCY_TTL", 86400)
+    if stored.created_at < datetime.utcnow() - timedelta(seconds=ttl):
+        db.session.delete(stored)
+        db.session.flush()
+        return None
+    return stored
+
+
+def store_idempotent_response(client_id: int, key: str, request_hash: str, status_code: int, response: dict) -> None:
+    """Record the response for ``key`` in the current transaction."""
+    db.session.add(
+        IdempotencyKey(
+            client_id=client_id, key=key, request_hash=request_hash, status_code=status_code, response=response
+        )
+    )
+
+
+def purge_idempotency_keys() -> int:
+    """Delete expired idempotency keys.  Returns the number removed."""
+    ttl = current_app.config.get("WEBHOOK_IDEMPOTENCY_TTL", 86400)
+    result = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=ttl))
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,104 @@
+"""
+Health and status of background work.
+
+:func:`background_status` reports what the web and worker processes share
+through the database, so it gives the same answer from any process:
+
+* outbox depth by status, how many pending messages are due, and the
+  age of the oldest due message;
+* in-flight work: messages claimed by a worker (``sending``) and the age
+  of the oldest claim;
+* the scheduler lease holder and its heartbeat;
+* the scheduled jobs and their next run times.
+
+It also includes this process's cache counters.
+
+It backs ``flask nexora status`` and the admin ``/admin/status`` view.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from flask import current_app
+from sqlalchemy import column, func, select, table
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import db
+from ..models import EmailOutbox
+from .leader import current_holder
+from .versioned_cache import cache_stats
+
+
+def _age_seconds(since: Optional[datetime], now: datetime) -> Optional[float]:
+    return round((now - since).total_seconds(), 1) if since else None
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _scheduled_jobs() -> List[dict]:
+    scheduler = getattr(current_app, "scheduler", None)
+    if scheduler is not None and scheduler.running:
+        return [
+            {"id": job.id, "next_run_time": _isoformat(job.next_run_time)}
+            for job in scheduler.get_jobs()
+        ]
+    if current_app.config.get("SCHEDULER_JOBSTORE", "database") != "database":
+        return []
+    jobs_t = table("apscheduler_jobs", column("id"), column("next_run_time"))
+    try:
+        rows = db.session.execute(select(jobs_t.c.id, jobs_t.c.next_run_time).order_by(jobs_t.c.id)).all()
+    except SQLAlchemyError:
+        # The job store table is created when a worker first starts.
+        db.session.rollback()
+        return []
+    return [
+        {
+            "id": job_id,
+            "next_run_time": _isoformat(datetime.fromtimestamp(ts, timezone.utc)) if ts else None,
+        }
+        for job_id, ts in rows
+    ]
+
+
+def background_status() -> dict:
+    """Return outbox depth, in-flight work and scheduler state as a JSON-able dict."""
+    now = datetime.utcnow()
+    depth = dict(
+        db.session.execute(select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)).all()
+    )
+    due, oldest_due = db.session.execute(
+        select(func.count(), func.min(EmailOutbox.available_at)).where(
+            EmailOutbox.status == "pending", EmailOutbox.available_at <= now
+        )
+    ).one()
+    oldest_claim = db.session.scalar(
+        select(func.min(EmailOutbox.claimed_at)).where(EmailOutbox.status == "sending")
+    )
+    lease = current_holder()
+    return {
+        "healthy": lease is not None,
+        "outbox": {
+            "pending": depth.get("pending", 0),
+            "due": due,
+            "sending": depth.get("sending", 0),
+            "failed": depth.get("failed", 0),
+            "sent": depth.get("sent", 0),
+            "oldest_due_age_s": _age_seconds(oldest_due, now),
+        },
+        "in_flight": {
+            "outbox_sending": depth.get("sending", 0),
+            "oldest_claim_age_s": _age_seconds(oldest_claim, now),
+        },
+        "scheduler": {
+            "leader": lease.holder if lease else None,
+            "leader_since": _isoformat(lease.acquired_at) if lease else None,
+            "heartbeat_age_s": _age_seconds(lease.heartbeat_at, now) if lease else None,
+            "lease_expires_at": _isoformat(lease.expires_at) if lease else None,
+            "jobs": _scheduled_jobs(),
+        },
+        "process": {"caches": cache_stats()},
+    }
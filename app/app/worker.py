@@ -0,0 +1,72 @@
+"""
+Background worker lifecycle for Nexora.
+
+Background work is the scheduler (behind the scheduler lease), the
+email outbox delivery threads and the lead import runner.  Web processes only start it when
+``RUN_BACKGROUND_IN_WEB`` is set.  Otherwise it runs in a dedicated
+worker process, started with ``flask nexora worker`` or ``python
+worker.py``, so web workers stay free of background threads and each
+side can be scaled on its own.  Starting it also spawns the supervised
+automation pool's processes (see :mod:`app.automations.supervisor`), if
+one is configured; stopping it shuts the pool down.
+
+The extensions are the singletons bound by the application factory and
+attached to the app as ``app.scheduler``, ``app.scheduler_leader``,
+``app.outbox_workers`` and ``app.import_runner``.
+"""
+
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+
+from .automations import supervisor
+
+logger = logging.getLogger(__name__)
+
+
+def start_background(app) -> None:
+    """Start the scheduler (paused until this process holds the lease), outbox workers, import runner and automation pool."""
+    from .utils.scheduler import configure_scheduler
+
+    with app.app_context():
+        if not app.scheduler.running:
+            configure_scheduler(app.scheduler, app)
+            app.scheduler.start(paused=True)
+        app.scheduler_leader.start()
+    app.outbox_workers.start()
+    app.import_runner.start()
+    pool = supervisor.default_pool()
+    if pool is not None:
+        pool.start()
+
+
+def stop_background(app) -> None:
+    """Stop the import runner and outbox workers, release the scheduler lease and shut the scheduler and automation pool down."""
+    app.import_runner.stop()
+    app.outbox_workers.stop()
+    app.scheduler_leader.stop()
+    if app.scheduler.running:
+        app.scheduler.shutdown(wait=True)
+    supervisor.shutdown()
+
+
+def run_worker(app) -> None:
+    """Run background work in the foreground until SIGINT or SIGTERM."""
+    stopping = threading.Event()
+
+    def _request_stop(signum, frame):
+        logger.info("Worker received signal %s; shutting down", signum)
+        stopping.set()
+
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+    start_background(app)
+    logger.info(
+        "Worker started: %d outbox worker(s), scheduler lease id %s",
+        app.outbox_workers.workers,
+        app.scheduler_leader.identity,
+    )
+    stopping.wait()
+    stop_background(app)
@@ -0,0 +1,140 @@
+"""
+Microbenchmark: automation dispatch cost per ``run_automation`` call.
+
+Compares the per-call dispatch the runner used before the registry
+(``importlib.import_module``, ``inspect.signature`` and every candidate
+argument built on each call) with :func:`app.automations.runner.run_automation`,
+which resolves a slug once and caches an adapter.  Both run the same
+automation bodies, and their results are checked to be identical first.
+
+Run from the ``app`` directory::
+
+    python benchmarks/dispatch.py [--calls 20000] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import inspect
+import os
+import sys
+import timeit
+import types
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.automations.runner import ClientRef, register_automation, run_automation  # noqa: E402
+
+
+def legacy_run_automation(
+    module_path: str, slug: str, *, client: Any, payload: Optional[Dict[str, Any]] = None, credentials=None
+) -> Dict[str, Any]:
+    """The pre-registry dispatch, kept verbatim apart from the module lookup."""
+    payload = payload or {}
+    credentials = credentials or {}
+    try:
+        mod = importlib.import_module(module_path)
+    except Exception as e:
+        return {"ok": False, "slug": slug, "error": f"Import failed: {e}", "module": module_path}
+    if not hasattr(mod, "run"):
+        return {"ok": False, "slug": slug, "error": "Module missing run() function", "module": module_path}
+    try:
+        candidate_kwargs = {
+            "client_name": getattr(client, "name", None),
+            "client_slug": getattr(client, "slug", None),
+            "payload": payload,
+            "credentials": credentials,
+            "lead_name": payload.get("lead_name") or payload.get("name") or payload.get("full_name"),
+            "lead_email": payload.get("lead_email") or payload.get("email"),
+            "lead_phone": payload.get("lead_phone") or payload.get("phone"),
+            "source": payload.get("source") or payload.get("lead_source"),
+            "job_title": payload.get("job_title") or payload.get("job") or payload.get("service") or payload.get("title"),
+            "job_id": payload.get("job_id"),
+        }
+        allowed = set(inspect.signature(mod.run).parameters.keys())
+        result = mod.run(**{k: v for k, v in candidate_kwargs.items() if k in allowed})
+        if isinstance(result, dict):
+            result.setdefault("ok", True)
+            result.setdefault("slug", slug)
+            return result
+        return {"ok": True, "slug": slug, "result": result}
+    except Exception as e:
+        return {"ok": False, "slug": slug, "error": str(e) or type(e).__name__}
+
+
+def _noop(*, lead_name=None, lead_email=None, source=None):
+    return {}
+
+
+def _wide(
+    *, client_name=None, client_slug=None, lead_name=None, lead_email=None, lead_phone=None,
+    source=None, payload=None, credentials=None, job_title=None, job_id=None,
+):
+    return {"lead": lead_name, "email": lead_email, "source": source, "job": job_title, "client": client_slug}
+
+
+def _booking(*, client_name=None, lead_name=None, lead_email=None, job_title=None, payload=None):
+    slots = [f"{day} {hour:02d}:00" for day in ("Mon", "Tue", "Wed") for hour in range(9, 17)]
+    requested = (payload or {}).get("preferred", "")
+    return {
+        "message": f"{client_name}: booking {job_title or 'appointment'} for {lead_name} <{lead_email}>",
+        "slot": next((slot for slot in slots if slot.startswith(requested)), slots[0]),
+    }
+
+
+AUTOMATIONS = {"bench-noop": _noop, "bench-wide": _wide, "bench-booking": _booking}
+PAYLOADS = [
+    {"name": "Ann", "email": "ann@example.com", "source": "ad"},
+    {"lead_name": "Bob", "phone": "555", "service": "hvac", "job_id": 3, "preferred": "Tue"},
+    {},
+]
+
+
+def install() -> Dict[str, str]:
+    """Register each benchmark automation as a module for both dispatchers."""
+    modules = {}
+    for slug, func in AUTOMATIONS.items():
+        module = types.ModuleType(f"_bench_{slug.replace('-', '_')}")
+        module.run = func
+        sys.modules[module.__name__] = module
+        register_automation(slug, module.__name__)
+        modules[slug] = module.__name__
+    return modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    modules = install()
+    client = ClientRef("Acme", "acme")
+    for slug, module_path in modules.items():
+        for payload in PAYLOADS:
+            old = legacy_run_automation(module_path, slug, client=client, payload=dict(payload))
+            new = run_automation(slug, client=client, payload=dict(payload))
+            assert old == new, (slug, payload, old, new)
+
+    print(f"{'automation':15s} {'legacy us/call':>15s} {'registry us/call':>17s}")
+    for slug, module_path in modules.items():
+        payload = PAYLOADS[0]
+        legacy = min(
+            timeit.repeat(
+                lambda: legacy_run_automation(module_path, slug, client=client, payload=payload),
+                number=args.calls,
+                repeat=args.repeat,
+            )
+        )
+        registry = min(
+            timeit.repeat(
+                lambda: run_automation(slug, client=client, payload=payload), number=args.calls, repeat=args.repeat
+            )
+        )
+        print(f"{slug:15s} {legacy / args.calls * 1e6:15.2f} {registry / args.calls * 1e6:17.2f}")
+
+
+if __name__ == "__main__":
+    main()
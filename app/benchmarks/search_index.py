@@ -0,0 +1,99 @@
+"""
+Benchmark: log ingestion with trigger-maintained vs incremental search indexing.
+
+Inserts ``--rows`` log entries (default 10 million) in committed batches
+of ``--batch`` rows, as the log sink writes them, into a scratch SQLite
+database.  ``incremental`` is the shipped setup: ``log_entry`` has no
+FTS triggers and :func:`app.utils.search.index_pending` catches the
+index up afterwards.  ``triggers`` adds the per-row FTS5 triggers that
+maintained ``log_entry_fts`` before.  Both report insert time; the
+incremental run also reports the catch-up time and checks that search
+finds the last row.
+
+Run from the ``app`` directory::
+
+    python benchmarks/search_index.py [--rows 10000000] [--batch 500] [--mode both]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Client, LogEntry, Portfolio  # noqa: E402
+from app.utils.search import SEARCH_INDEXES, _ddl, index_pending, search  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def run(mode: str, path: str, rows: int, batch: int) -> None:
+    config = type(
+        "SearchBenchmarkConfig",
+        (Config,),
+        {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "RUN_BACKGROUND_IN_WEB": False, "TESTING": True},
+    )
+    app = create_app(config)
+    with app.app_context():
+        client = Client(name="Bench", slug="bench", portfolio=Portfolio.query.first())
+        db.session.add(client)
+        db.session.commit()
+        if mode == "triggers":
+            logs = SEARCH_INDEXES["logs"]
+            for name, statement in _ddl(logs._replace(triggers=True)):
+                if name != logs.fts_table:
+                    db.session.execute(db.text(statement))
+            db.session.commit()
+
+        now = datetime.utcnow()
+        started = time.perf_counter()
+        for first in range(0, rows, batch):
+            db.session.execute(
+                insert(LogEntry),
+                [
+                    {
+                        "client_id": client.id,
+                        "entry_type": "info",
+                        "message": f"Follow-up email {n} sent to lead{n % 5000}@example.com via SMTP",
+                        "created_at": now,
+                    }
+                    for n in range(first, min(first + batch, rows))
+                ],
+            )
+            db.session.commit()
+        print(f"{mode:11s} insert {rows:,} rows: {time.perf_counter() - started:8.1f} s")
+
+        if mode == "incremental":
+            started = time.perf_counter()
+            indexed = index_pending()
+            print(f"{mode:11s} index_pending {indexed}: {time.perf_counter() - started:8.1f} s")
+        found = search("logs", f"email {rows - 1}", client_id=client.id)["items"]
+        assert [entry.message.split()[2] for entry in found] == [str(rows - 1)], found
+        db.engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--mode", choices=("incremental", "triggers", "both"), default="both")
+    parser.add_argument("--dir", help="Directory for the scratch databases (default: a temporary directory).")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    modes = ("triggers", "incremental") if args.mode == "both" else (args.mode,)
+    with tempfile.TemporaryDirectory(dir=args.dir) as scratch:
+        for mode in modes:
+            run(mode, os.path.join(scratch, f"{mode}.db"), args.rows, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,20 +19,163 @@ class Config:
         "DATABASE_URL", f"sqlite:///{os.path.abspath('nexora.db')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite only: write-ahead logging lets web requests read while another
+    # process writes (see app/utils/sqlite_pragmas.py).  Leave empty to keep
+    # SQLite's defaults.
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))  # milliseconds
+
+    # ``create_app`` only checks the bootstrap fingerprint stored in the
+    # database.  When it is stale (fresh database or new schema/seed
+    # version) the app bootstraps itself unless this is disabled, in which
+    # case run ``flask nexora bootstrap`` as a release step.
+    BOOTSTRAP_ON_STARTUP = os.environ.get("BOOTSTRAP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+    # Budgets for create_app, enforced by ``flask nexora startup-benchmark``
+    # and tests/test_startup.py: on an empty database (cold, includes the
+    # bootstrap) and on a bootstrapped one (warm).
+    STARTUP_COLD_BUDGET_MS = float(os.environ.get("STARTUP_COLD_BUDGET_MS", 1000))
+    STARTUP_WARM_BUDGET_MS = float(os.environ.get("STARTUP_WARM_BUDGET_MS", 50))
+
+    # Enabled-automation lookups are cached per process.  Changes made by
+    # other processes are picked up within this many seconds
+    # (see app/utils/automation_cache.py).
+    AUTOMATION_CACHE_CHECK_INTERVAL = float(os.environ.get("AUTOMATION_CACHE_CHECK_INTERVAL", 1.0))
+    AUTOMATION_CACHE_MAX_ENTRIES = int(os.environ.get("AUTOMATION_CACHE_MAX_ENTRIES", 50000))
+    # Public lead form: client-by-slug lookups and the rendered page for
+    # anonymous visitors (see app/utils/public_cache.py).
+    PUBLIC_FORM_CACHE_CHECK_INTERVAL = float(os.environ.get("PUBLIC_FORM_CACHE_CHECK_INTERVAL", 1.0))
+    PUBLIC_FORM_CACHE_MAX_ENTRIES = int(os.environ.get("PUBLIC_FORM_CACHE_MAX_ENTRIES", 20000))
+    PUBLIC_FORM_CACHE_TTL = float(os.environ.get("PUBLIC_FORM_CACHE_TTL", 300))  # seconds
+    # Logged-in users and their client are loaded from a per-process cache
+    # (see app/utils/user_cache.py).
+    USER_CACHE_CHECK_INTERVAL = float(os.environ.get("USER_CACHE_CHECK_INTERVAL", 1.0))
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 20000))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))  # seconds
+
+    # Runner automations configured on an instance ({"integration": slug})
+    # run inline by default.  With AUTOMATION_EXECUTOR = "supervised" they
+    # run in a pool of AUTOMATION_WORKERS processes per web/worker process
+    # (see app/automations/supervisor.py): each run is killed after
+    # AUTOMATION_TIMEOUT seconds, or its entry in AUTOMATION_TIMEOUTS
+    # ("slug=seconds,slug=seconds"); workers are capped at
+    # AUTOMATION_MEMORY_LIMIT_MB (0 = no limit) and replaced after
+    # AUTOMATION_MAX_TASKS_PER_WORKER runs.
+    AUTOMATION_EXECUTOR = os.environ.get("AUTOMATION_EXECUTOR", "inline")
+    AUTOMATION_WORKERS = int(os.environ.get("AUTOMATION_WORKERS", 2))
+    AUTOMATION_TIMEOUT = float(os.environ.get("AUTOMATION_TIMEOUT", 30))  # seconds
+    AUTOMATION_TIMEOUTS = {
+        slug.strip(): float(seconds)
+        for slug, _, seconds in (
+            item.partition("=") for item in os.environ.get("AUTOMATION_TIMEOUTS", "").split(",") if item.strip()
+        )
+    }
+    AUTOMATION_MEMORY_LIMIT_MB = int(os.environ.get("AUTOMATION_MEMORY_LIMIT_MB", 0))
+    AUTOMATION_MAX_TASKS_PER_WORKER = int(os.environ.get("AUTOMATION_MAX_TASKS_PER_WORKER", 100))
+
+    # Background work (scheduler and outbox delivery) runs in the worker
+    # process started with ``flask nexora worker``.  Set this to also run it
+    # inside web processes, e.g. for a single-process deployment.
+    RUN_BACKGROUND_IN_WEB = os.environ.get("RUN_BACKGROUND_IN_WEB", "false").lower() in ("1", "true", "yes")
 
     # APScheduler configuration. The API is enabled so jobs can be inspected if needed.
     SCHEDULER_API_ENABLED = True
+    # Periodic automations run as one batch job per type; instances are
+    # processed in chunks on a bounded thread pool.
+    SCHEDULER_BATCH_WORKERS = int(os.environ.get("SCHEDULER_BATCH_WORKERS", 4))
+    SCHEDULER_BATCH_CHUNK = int(os.environ.get("SCHEDULER_BATCH_CHUNK", 200))
+    # Jobs are stored in the database and run only by the process that
+    # holds the scheduler lease (one per deployment, whatever the number
+    # of Gunicorn workers).  Use "memory" to keep jobs in-process.
+    SCHEDULER_JOBSTORE = os.environ.get("SCHEDULER_JOBSTORE", "database")
+    SCHEDULER_LEASE_TTL = int(os.environ.get("SCHEDULER_LEASE_TTL", 15))  # seconds
+    SCHEDULER_LEASE_HEARTBEAT = int(os.environ.get("SCHEDULER_LEASE_HEARTBEAT", 5))  # seconds
+    SCHEDULER_MISFIRE_GRACE = int(os.environ.get("SCHEDULER_MISFIRE_GRACE", 3600))  # seconds
 
     # Default mail sender (used by stub email utility). Real email integration can
     # override these values with an SMTP configuration.
     MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER", "no-reply@nexora.local")
 
+    # Email outbox.  Automations enqueue messages and a pool of background
+    # worker threads delivers them in batches.  Set OUTBOX_WORKERS=0 to
+    # disable the pool (messages then stay queued until drained).
+    OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", 2))
+    OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 50))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 1.0))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5))
+    OUTBOX_RETRY_BACKOFF = int(os.environ.get("OUTBOX_RETRY_BACKOFF", 30))  # seconds
+    OUTBOX_CLAIM_TIMEOUT = int(os.environ.get("OUTBOX_CLAIM_TIMEOUT", 300))  # seconds
+
+    # Follow-up sequence cadence: days after lead creation at which each
+    # follow-up is sent.  Instances may override it with config["cadence_days"].
+    FOLLOW_UP_CADENCE_DAYS = [
+        int(d) for d in os.environ.get("FOLLOW_UP_CADENCE_DAYS", "3,7,14").split(",")
+    ]
+    FOLLOW_UP_BATCH_SIZE = int(os.environ.get("FOLLOW_UP_BATCH_SIZE", 500))
+
+    # Bulk lead imports (see app/utils/lead_import.py).  Uploaded files are
+    # kept in IMPORT_DIR (default: <instance path>/imports) until the
+    # import completes, so interrupted imports can be resumed.
+    IMPORT_DIR = os.environ.get("IMPORT_DIR")
+    IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+    IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 100))
+    # Uploaded imports are queued and run by the background worker, which
+    # polls for them every IMPORT_POLL_INTERVAL seconds.  A running import
+    # whose progress has not moved for IMPORT_CLAIM_TIMEOUT is considered
+    # abandoned and is claimed again.
+    IMPORT_POLL_INTERVAL = float(os.environ.get("IMPORT_POLL_INTERVAL", 2.0))
+    IMPORT_CLAIM_TIMEOUT = int(os.environ.get("IMPORT_CLAIM_TIMEOUT", 300))  # seconds
+
+    # Lead deduplication (see app/utils/dedupe.py).  Phone numbers without
+    # a country code get DEFAULT_PHONE_COUNTRY_CODE.  `flask nexora
+    # dedupe-leads` spills DEDUPE_BUCKET_ROWS leads per bucket file to
+    # DEDUPE_SPILL_DIR (default: the system temp directory).
+    DEFAULT_PHONE_COUNTRY_CODE = os.environ.get("DEFAULT_PHONE_COUNTRY_CODE", "1")
+    DEDUPE_BUCKET_ROWS = int(os.environ.get("DEDUPE_BUCKET_ROWS", 100000))
+    DEDUPE_CHUNK_SIZE = int(os.environ.get("DEDUPE_CHUNK_SIZE", 10000))
+    DEDUPE_SPILL_DIR = os.environ.get("DEDUPE_SPILL_DIR")
+
+    # Streaming exports (see app/utils/export.py): rows fetched and encoded
+    # per chunk, so memory stays flat however long the history is.
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 1000))
+
+    # Full-text search (see app/utils/search.py): "best match" ranks the
+    # newest SEARCH_RANK_WINDOW hits; "newest" pages through all of them.
+    SEARCH_RANK_WINDOW = int(os.environ.get("SEARCH_RANK_WINDOW", 1000))
+    # New log entries are added to the search index by the worker every
+    # minute, this many rows per transaction.
+    SEARCH_INDEX_CHUNK_SIZE = int(os.environ.get("SEARCH_INDEX_CHUNK_SIZE", 5000))
+
+    # Lead ingestion API (POST /api/v1/clients/<slug>/leads; see
+    # app/utils/webhooks.py).  Requests are signed with the client's
+    # "webhook" integration credential.
+    WEBHOOK_MAX_SKEW = int(os.environ.get("WEBHOOK_MAX_SKEW", 300))  # seconds
+    WEBHOOK_MAX_BATCH = int(os.environ.get("WEBHOOK_MAX_BATCH", 500))
+    WEBHOOK_MAX_BODY = int(os.environ.get("WEBHOOK_MAX_BODY", 1024 * 1024))  # bytes
+    WEBHOOK_IDEMPOTENCY_TTL = int(os.environ.get("WEBHOOK_IDEMPOTENCY_TTL", 86400))  # seconds
+    WEBHOOK_CACHE_CHECK_INTERVAL = float(os.environ.get("WEBHOOK_CACHE_CHECK_INTERVAL", 1.0))
+
+    # Log retention (see app/utils/log_archive.py): whole UTC days older
+    # than LOG_RETENTION_DAYS are moved nightly from log_entry to gzip
+    # segments in LOG_ARCHIVE_DIR (default: <instance path>/log_archive).
+    LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", 30))
+    LOG_ARCHIVE_DIR = os.environ.get("LOG_ARCHIVE_DIR")
+    LOG_ARCHIVE_CHUNK_SIZE = int(os.environ.get("LOG_ARCHIVE_CHUNK_SIZE", 5000))
+
+    # Automation log entries are buffered per request/job and bulk inserted
+    # once either threshold is reached (and always at teardown).
+    LOG_SINK_MAX_ROWS = int(os.environ.get("LOG_SINK_MAX_ROWS", 500))
+    LOG_SINK_MAX_AGE = float(os.environ.get("LOG_SINK_MAX_AGE", 5.0))  # seconds
+
 
 class TestConfig(Config):
     """Configuration suitable for testing."""
 
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # Tests drain the outbox synchronously via utils.outbox.drain_outbox().
+    OUTBOX_WORKERS = 0
+    SCHEDULER_JOBSTORE = "memory"
 
 # DEV ONLY: disable CSRF if needed for local troubleshooting
 WTF_CSRF_ENABLED = True
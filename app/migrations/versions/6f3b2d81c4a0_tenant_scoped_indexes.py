@@ -0,0 +1,47 @@
+"""Add composite indexes for tenant-scoped hot queries
+
+Revision ID: 6f3b2d81c4a0
+Revises:
+Create Date: 2026-10-17 09:12:00.000000
+
+The schema itself is created by ``db.create_all()``, which only adds
+indexes when it creates a table.  This revision adds the indexes to
+databases whose tables already exist and is a no-op for fresh ones.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f3b2d81c4a0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_user_client_id", "user", ["client_id"]),
+    ("ix_automation_instance_client_enabled", "automation_instance", ["client_id", "enabled"]),
+    ("ix_lead_client_created", "lead", ["client_id", "created_at"]),
+    ("ix_lead_client_status_created", "lead", ["client_id", "status", "created_at"]),
+    ("ix_job_client_created", "job", ["client_id", "created_at"]),
+    ("ix_job_client_status_created", "job", ["client_id", "status", "created_at"]),
+    ("ix_log_entry_client_created", "log_entry", ["client_id", "created_at"]),
+    ("ix_log_entry_entry_type", "log_entry", ["entry_type"]),
+]
+
+
+def _existing(table):
+    return {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        if name in _existing(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,36 @@
+"""Add user.auth_version
+
+Revision ID: 9c41e7a2d5b3
+Revises: 6f3b2d81c4a0
+Create Date: 2026-10-17 15:40:00.000000
+
+``auth_version`` is bumped whenever a user's password, role, client or
+active flag changes; sessions stamped with an older version are logged
+out.  ``db.create_all()`` adds it for fresh databases; this revision adds
+it to existing ``user`` tables.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41e7a2d5b3'
+down_revision = '6f3b2d81c4a0'
+branch_labels = None
+depends_on = None
+
+
+def _columns():
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("user")}
+
+
+def upgrade():
+    if "auth_version" not in _columns():
+        with op.batch_alter_table("user") as batch_op:
+            batch_op.add_column(sa.Column("auth_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    if "auth_version" in _columns():
+        with op.batch_alter_table("user") as batch_op:
+            batch_op.drop_column("auth_version")
@@ -0,0 +1,59 @@
+"""Add lead.contact_key for deduplication
+
+Revision ID: b7d4e1f09a36
+Revises: 9c41e7a2d5b3
+Create Date: 2026-10-17 21:05:00.000000
+
+Adds ``lead.contact_key`` with a unique ``(client_id, contact_key)``
+index, an index on ``job.lead_id`` (used when merging leads) and
+``lead_import.rows_merged``.  Existing leads keep a NULL key, which the
+unique index allows any number of times; ``flask nexora dedupe-leads``
+sets their keys and merges the duplicates among them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e1f09a36'
+down_revision = '9c41e7a2d5b3'
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _columns(table):
+    return {column["name"] for column in _inspector().get_columns(table)}
+
+
+def _indexes(table):
+    return {ix["name"] for ix in _inspector().get_indexes(table)}
+
+
+def upgrade():
+    if "contact_key" not in _columns("lead"):
+        with op.batch_alter_table("lead") as batch_op:
+            batch_op.add_column(sa.Column("contact_key", sa.String(length=120), nullable=True))
+    if "ix_lead_client_contact_key" not in _indexes("lead"):
+        op.create_index("ix_lead_client_contact_key", "lead", ["client_id", "contact_key"], unique=True)
+    if "ix_job_lead_id" not in _indexes("job"):
+        op.create_index("ix_job_lead_id", "job", ["lead_id"])
+    if _inspector().has_table("lead_import") and "rows_merged" not in _columns("lead_import"):
+        with op.batch_alter_table("lead_import") as batch_op:
+            batch_op.add_column(sa.Column("rows_merged", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    if _inspector().has_table("lead_import") and "rows_merged" in _columns("lead_import"):
+        with op.batch_alter_table("lead_import") as batch_op:
+            batch_op.drop_column("rows_merged")
+    if "ix_job_lead_id" in _indexes("job"):
+        op.drop_index("ix_job_lead_id", table_name="job")
+    if "ix_lead_client_contact_key" in _indexes("lead"):
+        op.drop_index("ix_lead_client_contact_key", table_name="lead")
+    if "contact_key" in _columns("lead"):
+        with op.batch_alter_table("lead") as batch_op:
+            batch_op.drop_column("contact_key")
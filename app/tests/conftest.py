@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app("config.TestConfig")
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["IMPORT_DIR"] = str(tmp_path / "imports")
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from app import db
+from app.models import AutomationInstance, AutomationTemplate, Client, FollowUpState, Lead, Portfolio
+from app.utils.lead_import import insert_leads
+
+
+def make_client(slug, follow_up=None):
+    client = Client(name=slug.title(), slug=slug, portfolio=Portfolio.query.first())
+    db.session.add(client)
+    if follow_up is not None:
+        template = AutomationTemplate.query.filter_by(type="follow_up_sequence").first()
+        db.session.add(AutomationInstance(client=client, template=template, enabled=follow_up))
+    db.session.commit()
+    return client
+
+
+def enrolled(client):
+    return FollowUpState.query.filter_by(client_id=client.id).count()
+
+
+def test_leads_are_enrolled_only_with_follow_ups_enabled(app):
+    on = make_client("on", follow_up=True)
+    off = make_client("off", follow_up=False)
+    none = make_client("none")
+    for client in (on, off, none):
+        db.session.add(Lead(client=client, name="Jo", email=f"jo@{client.slug}.example.com"))
+        lead = {"name": "Al", "email": f"al@{client.slug}.example.com", "phone": None, "source": "api"}
+        insert_leads(client.id, [{**lead, "status": "new", "created_at": datetime.utcnow()}])
+    db.session.commit()
+    assert (enrolled(on), enrolled(off), enrolled(none)) == (2, 0, 0)
+
+
+def test_enabling_follow_ups_enrolls_waiting_leads(app):
+    client = make_client("acme", follow_up=False)
+    db.session.add_all(
+        [
+            Lead(client=client, name="New", email="new@example.com"),
+            Lead(client=client, name="Won", email="won@example.com", status="converted"),
+        ]
+    )
+    db.session.commit()
+    assert enrolled(client) == 0
+
+    ai = AutomationInstance.query.filter_by(client_id=client.id).one()
+    ai.enabled = True
+    db.session.commit()
+    assert [state.lead.name for state in FollowUpState.query.filter_by(client_id=client.id)] == ["New"]
+
+    ai.enabled = False
+    db.session.commit()
+    ai.enabled = True
+    db.session.commit()
+    assert enrolled(client) == 1
@@ -0,0 +1,91 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Client, Lead, LeadImport, Portfolio
+from app.utils.lead_import import ImportBusy, claim_import, create_import, queue_import, run_import, run_next_import
+
+
+@pytest.fixture
+def client_id(app):
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    return client.id
+
+
+def upload(client_id, rows=2):
+    data = "name,email\n" + "".join(f"Lead {i},lead{i}@example.com\n" for i in range(rows))
+    return create_import(client_id, io.BytesIO(data.encode()), "leads.csv")
+
+
+def test_run_import_claims_the_import(client_id):
+    lead_import = run_import(upload(client_id))
+    assert lead_import.status == "completed"
+    assert lead_import.rows_imported == 2
+    with pytest.raises(ImportBusy):
+        run_import(lead_import)
+    assert Lead.query.count() == 2
+
+
+def test_running_import_is_not_run_twice(client_id):
+    lead_import = upload(client_id)
+    assert claim_import(lead_import.id)
+    assert not claim_import(lead_import.id)
+    with pytest.raises(ImportBusy):
+        run_import(lead_import)
+    assert Lead.query.count() == 0
+
+
+def test_stale_running_import_is_reclaimed(app, client_id):
+    lead_import = upload(client_id)
+    assert claim_import(lead_import.id)
+    stale = datetime.utcnow() - timedelta(seconds=app.config["IMPORT_CLAIM_TIMEOUT"] + 1)
+    db.session.execute(LeadImport.__table__.update().values(updated_at=stale))
+    db.session.commit()
+    assert run_import(lead_import).status == "completed"
+    assert Lead.query.count() == 2
+
+
+def login_admin(app):
+    client = app.test_client()
+    response = client.post("/login", data={"email": "admin@example.com", "password": "changeme"})
+    assert response.status_code == 302
+    return client
+
+
+def test_upload_is_queued_for_the_background_runner(app, client_id):
+    client = login_admin(app)
+    data = {"file": (io.BytesIO(b"name,email\nAnn,ann@example.com\n"), "leads.csv")}
+    response = client.post(
+        f"/admin/clients/{client_id}/imports",
+        data=data,
+        headers={"Accept": "application/json"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 202
+    assert response.json["status"] == "pending"
+    assert client.get(response.json["status_url"]).json["status"] == "pending"
+    assert Lead.query.count() == 0
+
+    lead_import = run_next_import()
+    assert lead_import.status == "completed"
+    assert run_next_import() is None
+    assert client.get(response.json["status_url"]).json["rows_imported"] == 1
+
+
+def test_resume_requeues_only_failed_imports(app, client_id):
+    client = login_admin(app)
+    lead_import = upload(client_id)
+    response = client.post(f"/admin/imports/{lead_import.id}/resume", headers={"Accept": "application/json"})
+    assert response.status_code == 409  # already queued
+
+    assert claim_import(lead_import.id)
+    db.session.execute(LeadImport.__table__.update().values(status="failed"))
+    db.session.commit()
+    response = client.post(f"/admin/imports/{lead_import.id}/resume", headers={"Accept": "application/json"})
+    assert response.status_code == 202
+    assert not queue_import(lead_import.id)
+    assert run_next_import().status == "completed"
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from app import db
+from app.models import AutomationInstance, AutomationTemplate, Client, FollowUpState, Lead, LogEntry, Portfolio
+from app.utils.automations import _log, run_follow_up_sequence
+from app.utils.follow_up import enrollment_rows
+from app.utils.log_sink import flush_logs
+
+
+def make_client():
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    return client
+
+
+def count_commits():
+    commits = [0]
+
+    def _count(session):
+        commits[0] += 1
+
+    event.listen(db.session, "after_commit", _count)
+    return commits, lambda: event.remove(db.session, "after_commit", _count)
+
+
+def test_threshold_write_does_not_commit_the_unit_of_work(app):
+    app.config["LOG_SINK_MAX_ROWS"] = 2
+    client = make_client()
+    db.session.add(Lead(client_id=client.id, name="Jo", email="jo@example.com"))
+    for i in range(3):
+        _log(client.id, None, f"step {i}")
+    assert LogEntry.query.count() == 2  # inserted into the open transaction
+    db.session.rollback()  # the handler failed
+    flush_logs()
+    assert Lead.query.count() == 0
+    assert [entry.message for entry in LogEntry.query.order_by(LogEntry.id)] == ["step 0", "step 1", "step 2"]
+
+
+def test_follow_up_run_commits_once(app):
+    """Benchmark: commits per automation run, with more log lines than LOG_SINK_MAX_ROWS."""
+    leads = 3 * app.config["LOG_SINK_MAX_ROWS"] // 2
+    client = make_client()
+    template = AutomationTemplate.query.filter_by(type="follow_up_sequence").first()
+    ai = AutomationInstance(client=client, template=template, enabled=True)
+    db.session.add(ai)
+    created_at = datetime.utcnow() - timedelta(days=4)
+    rows = [
+        {"client_id": client.id, "name": f"Lead {i}", "email": f"lead{i}@example.com", "created_at": created_at}
+        for i in range(leads)
+    ]
+    db.session.execute(insert(Lead), rows)
+    db.session.execute(FollowUpState.__table__.delete())
+    db.session.execute(insert(FollowUpState), enrollment_rows(Lead.query.all()))
+    db.session.commit()
+
+    commits, stop = count_commits()
+    try:
+        run_follow_up_sequence(ai)
+    finally:
+        stop()
+    assert commits[0] == 1
+    assert LogEntry.query.filter(LogEntry.message.like("Follow‑up email 1/%")).count() == leads
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.client.routes import JOB_FORM_LEAD_CHOICES
+from app.models import Client, Job, Lead, Portfolio, User
+from app.utils.pagination import page_url
+
+
+def test_page_url_keeps_view_args_over_query_args(app):
+    with app.test_request_context("/admin/clients/3?client_id=x&leads_cursor=old&lead_status=new"):
+        url = page_url("leads_cursor", "next")
+    assert url.startswith("/admin/clients/3?")
+    assert "leads_cursor=next" in url and "lead_status=new" in url
+
+
+def make_client(slug):
+    client = Client(name=slug.title(), slug=slug, portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    return client
+
+
+def login_client_user(app, client):
+    user = User(email=f"owner@{client.slug}.example.com", role="client", client=client)
+    user.set_password("pw")
+    db.session.add(user)
+    db.session.commit()
+    http = app.test_client()
+    assert http.post("/login", data={"email": user.email, "password": "pw"}).status_code == 302
+    return http
+
+
+def test_job_can_use_a_lead_outside_the_dropdown(app):
+    client = make_client("acme")
+    other = make_client("other")
+    now = datetime.utcnow()
+    old = Lead(client=client, name="Old", email="old@example.com", created_at=now - timedelta(days=365))
+    foreign = Lead(client=other, name="Foreign", email="foreign@example.com")
+    db.session.add_all(
+        [old, foreign]
+        + [
+            Lead(client=client, name=f"Lead {i}", email=f"lead{i}@example.com", created_at=now - timedelta(minutes=i))
+            for i in range(JOB_FORM_LEAD_CHOICES)
+        ]
+    )
+    db.session.commit()
+    http = login_client_user(app, client)
+
+    assert http.post("/jobs", data={"title": "Old lead job", "lead_id": old.id}).status_code == 302
+    assert Job.query.filter_by(title="Old lead job").one().lead_id == old.id
+
+    assert http.post("/jobs", data={"title": "Foreign job", "lead_id": foreign.id}).status_code == 200
+    assert Job.query.filter_by(title="Foreign job").count() == 0
@@ -0,0 +1,14 @@
+from app.utils.query_plans import _problems, check_query_plans
+
+
+def test_hot_queries_use_indexes(app):
+    results = check_query_plans()
+    assert results, "query plan checks only run on SQLite"
+    regressions = {name: problems for name, _, problems in results if problems}
+    assert regressions == {}
+
+
+def test_full_table_scan_is_reported():
+    assert _problems(["SCAN lead"]) == ["full table scan: SCAN lead"]
+    assert _problems(["USE TEMP B-TREE FOR ORDER BY"]) == ["unindexed sort: USE TEMP B-TREE FOR ORDER BY"]
+    assert _problems(["SEARCH lead USING INDEX ix_lead_client_created (client_id=?)"]) == []
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from app import db
+from app.models import Client, LogEntry, Portfolio
+from app.utils.log_archive import archive_logs
+from app.utils.search import fts_available, index_pending, search
+
+
+def add_logs(client_id, messages, created_at=None):
+    created_at = created_at or datetime.utcnow()
+    db.session.execute(
+        insert(LogEntry),
+        [{"client_id": client_id, "entry_type": "info", "message": m, "created_at": created_at} for m in messages],
+    )
+    db.session.commit()
+
+
+def test_log_entries_are_indexed_after_the_fact(app):
+    assert fts_available()
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    triggers = db.session.scalars(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all()
+    assert not [name for name in triggers if name.startswith("log_entry_fts")]
+
+    add_logs(client.id, [f"SMTP timeout {i}" for i in range(5)])
+    assert search("logs", "smtp", client_id=client.id)["items"] == []
+    assert index_pending(chunk_size=2) == {"log_entry_fts": 5}
+    assert index_pending() == {"log_entry_fts": 0}
+    assert len(search("logs", "smtp", client_id=client.id)["items"]) == 5
+
+
+def test_archived_log_entries_leave_the_index(app):
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    old = datetime.utcnow() - timedelta(days=app.config["LOG_RETENTION_DAYS"] + 5)
+    add_logs(client.id, ["ancient zebra"] * 3, created_at=old)
+    index_pending()
+    add_logs(client.id, ["ancient zebra"], created_at=old)  # not indexed yet
+    app.config["LOG_ARCHIVE_DIR"] = app.config["IMPORT_DIR"] + "-archive"
+    assert archive_logs()["entries"] == 4
+    assert search("logs", "zebra")["items"] == []
+    db.session.execute(text("INSERT INTO log_entry_fts(log_entry_fts, rank) VALUES ('integrity-check', 1)"))
+
+
+def test_rows_past_the_high_water_mark_are_searchable_after_index_pending(app):
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    add_logs(client.id, ["quota warning"] * 3)
+    index_pending()
+    indexed = {entry.id for entry in search("logs", "quota", client_id=client.id)["items"]}
+    assert len(indexed) == 3
+
+    add_logs(client.id, ["quota warning"] * 2)
+    late = {entry.id for entry in LogEntry.query.filter(LogEntry.id > max(indexed))}
+    assert len(late) == 2
+    assert {entry.id for entry in search("logs", "quota", client_id=client.id)["items"]} == indexed
+
+    assert index_pending() == {"log_entry_fts": 2}
+    assert {entry.id for entry in search("logs", "quota", client_id=client.id)["items"]} == indexed | late
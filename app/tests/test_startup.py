@@ -0,0 +1,10 @@
+from app import create_app
+from app.utils.bootstrap import measure_startup
+
+
+def test_startup_stays_within_budget(app):
+    result = measure_startup(create_app, app.config, runs=3)
+    # A bootstrapped database only costs the fingerprint check.
+    assert result["warm_statements"] == 1
+    assert result["cold_ms"] <= app.config["STARTUP_COLD_BUDGET_MS"], result
+    assert result["warm_ms"] <= app.config["STARTUP_WARM_BUDGET_MS"], result
@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Client, Job, Lead, Portfolio, User
+from app.utils.stats import client_stats, client_stats_for
+
+
+def add_clients(n, leads_each=2):
+    portfolio = Portfolio.query.first()
+    start = Client.query.count()
+    for i in range(start, start + n):
+        client = Client(name=f"Client {i}", slug=f"client-{i}", portfolio=portfolio)
+        db.session.add(client)
+        # Never logs in, so skip the (slow) password hashing.
+        db.session.add(User(email=f"user{i}@example.com", role="client", client=client, password_hash="!"))
+        for j in range(leads_each):
+            lead = Lead(client=client, name=f"Lead {i}.{j}", email=f"lead{i}.{j}@example.com", source="form")
+            db.session.add(lead)
+            db.session.add(Job(client=client, lead=lead, title=f"Job {i}.{j}"))
+    db.session.commit()
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+
+
+def dashboard_statements(client):
+    db.session.expire_all()
+    with count_statements() as statements:
+        response = client.get("/admin/")
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_client_stats_counts(app):
+    add_clients(3, leads_each=2)
+    stats = client_stats(sort="name")
+    assert stats["total"] == 3
+    assert [(s["client"].name, s["leads"], s["jobs"], s["users"]) for s in stats["items"]] == [
+        ("Client 0", 2, 2, 1),
+        ("Client 1", 2, 2, 1),
+        ("Client 2", 2, 2, 1),
+    ]
+    client = Client.query.filter_by(slug="client-1").one()
+    assert client_stats_for(client.id) == {"leads": 2, "jobs": 2, "users": 1}
+
+
+@pytest.mark.parametrize("sort", ["name", "leads", "users"])
+def test_client_stats_query_count_is_constant(app, sort):
+    add_clients(2)
+    with count_statements() as small:
+        client_stats(sort=sort)
+    add_clients(20)
+    with count_statements() as large:
+        stats = client_stats(sort=sort)
+    assert len(stats["items"]) == 22
+    assert len(large) == len(small) == 2
+
+
+def test_admin_dashboard_query_count_does_not_depend_on_clients(app):
+    client = app.test_client()
+    response = client.post("/login", data={"email": "admin@example.com", "password": "changeme"})
+    assert response.status_code == 302
+    add_clients(2)
+    client.get("/admin/")  # warm per-process caches
+    small = dashboard_statements(client)
+    add_clients(20)
+    large = dashboard_statements(client)
+    assert large == small
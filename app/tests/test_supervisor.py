@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from app import db
+from app.automations import supervisor
+from app.automations.runner import register_automation
+from app.models import AutomationInstance, AutomationTemplate, Client, LogEntry, Portfolio
+from app.utils.log_sink import flush_logs
+
+
+def hang(**kwargs):
+    time.sleep(60)
+
+
+def echo(payload):
+    return {"email": payload["email"]}
+
+
+@pytest.fixture
+def lead_capture(app):
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    template = AutomationTemplate.query.filter_by(type="lead_capture").first()
+    db.session.add(AutomationInstance(client=client, template=template, enabled=True, config={}))
+    db.session.commit()
+    return AutomationInstance.query.filter_by(client_id=client.id).first()
+
+
+def use_integration(ai, slug):
+    ai.config = {"integration": slug}
+    db.session.commit()
+
+
+def submit_lead(app):
+    response = app.test_client().post("/lead/acme", data={"name": "Jo", "email": "jo@example.com", "phone": "555"})
+    flush_logs()  # the request shares the test's app context, so its logs are still buffered
+    return response
+
+
+def test_integration_runs_inline_by_default(app, lead_capture):
+    register_automation("test-echo", echo)
+    use_integration(lead_capture, "test-echo")
+    assert supervisor.default_pool() is None
+    assert submit_lead(app).status_code == 302
+    assert LogEntry.query.filter_by(message="Integration test-echo executed for lead 1").count() == 1
+
+
+def test_hanging_integration_is_cut_off_in_supervised_mode(app, lead_capture):
+    register_automation("test-hang", hang)
+    use_integration(lead_capture, "test-hang")
+    app.config.update(AUTOMATION_EXECUTOR="supervised", AUTOMATION_TIMEOUTS={"test-hang": 1.0})
+    supervisor.init_app(app)
+    try:
+        started = time.monotonic()
+        assert submit_lead(app).status_code == 302
+        assert time.monotonic() - started < 10
+    finally:
+        supervisor.shutdown()
+    error = LogEntry.query.filter_by(entry_type="error").one()
+    assert error.message == "Integration test-hang failed for lead 1: timeout"
@@ -0,0 +1,27 @@
+from sqlalchemy import select
+
+from app import db
+from app.models import AppMeta, Client, Lead, Portfolio, User
+from app.utils.versioned_cache import version_keys
+
+
+def versions():
+    return dict(db.session.execute(select(AppMeta.key, AppMeta.value).where(AppMeta.key.in_(version_keys()))).all())
+
+
+def test_child_rows_do_not_invalidate_client_caches(app):
+    client = Client(name="Acme", slug="acme", portfolio=Portfolio.query.first())
+    db.session.add(client)
+    db.session.commit()
+    before = versions()
+
+    db.session.add(Lead(client=client, name="Jo", email="jo@example.com"))
+    db.session.add(User(client=client, email="jo@acme.example.com", role="client", password_hash="!"))
+    db.session.commit()
+    after = versions()
+    assert {key for key in before if after.get(key) != before[key]} == {"user_cache_version"}
+
+    client.name = "Acme Ltd"
+    db.session.commit()
+    changed = {key for key in after if versions().get(key) != after[key]}
+    assert {"client_cache_version", "user_cache_version"} <= changed
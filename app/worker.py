@@ -0,0 +1,18 @@
+"""
+Run the Nexora background worker.
+
+This script creates the Flask application via the factory and runs the
+scheduler and email outbox workers in the foreground until it receives
+SIGINT or SIGTERM.  Run it alongside the web processes, e.g.::
+
+    python worker.py
+
+It is equivalent to ``flask nexora worker``.
+"""
+
+from app import create_app
+from app.worker import run_worker
+
+
+if __name__ == "__main__":
+    run_worker(create_app())